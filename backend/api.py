@@ -21,12 +21,17 @@ from fastapi.staticfiles import StaticFiles
 from pydantic import BaseModel
 
 from backend.providers.azure import AzureFreeQuotaExceededError
-from backend.queue import BatchQueue
-from backend.cad import ODA_OUTPUT_VERSIONS, analyze_source, dwg_unavailable_short, odafc_available, odafc_status, output_path_for
-from backend.translator import CADChineseTranslator, CONFIG_PATH, load_yaml_data, output_prefix, resource_path
+from backend.providers.endpoints import deepl_usage_endpoint
+from backend.checkpoint import checkpoint_path, discard_checkpoint
+from backend.key_pool import KeyPool, QuotaDeferredError, key_fingerprint
+from backend.manifest import manifest_path
+from backend.queue import ACTIVE, PRIORITIES, QUEUE_LIMITS, QUEUE_POLICY, BatchQueue
+from backend.cad import ODA_OUTPUT_VERSIONS, ODA_WORKERS, WORK_DXF_CACHE_LIMIT_MB, DwgPrefetch, binary_work_dxf, oda_pool, output_targets, work_dxf_cache, analyze_source, dwg_unavailable_short, odafc_available, odafc_status, output_path_for
+from backend.translator import APP_VERSION, CADChineseTranslator, CONFIG_PATH, glossary_fingerprint, load_yaml_data, output_prefix, resource_path
 from backend.licensing import LICENSE_ENFORCEMENT_ENABLED, SUPPORT_ALIPAY_QR_URL, SUPPORT_WECHAT_QR_URL, LicenseManager
-from backend.language_assets import LanguageAssets
-from backend.storage import atomic_write_bytes, atomic_write_json, quarantine_corrupt_file
+from backend.language_assets import AZURE_F0_MONTHLY_CHARACTER_LIMIT, LanguageAssets
+from backend.output_cache import OUTPUT_CACHE_LIMIT_MB, OutputCache, cache_key
+from backend.storage import atomic_write_bytes, atomic_write_json, file_fingerprint, quarantine_corrupt_file
 
 
 def _frontend_dist() -> Path:
@@ -105,6 +110,25 @@ def builtin_terms() -> list[dict]:
     return entries
 
 
+def batch_modes(task: dict) -> list[str]:
+    """The task's translation mode followed by any extra fan-out modes sharing its source language."""
+    return list(dict.fromkeys([task["translation_mode"], *(task.get("translation_modes") or [])]))
+
+
+def batch_output_name(task: dict, mode: str, version: str, target_count: int) -> str:
+    name = f"{output_prefix(mode)}_{Path(task['input_file']).stem}"
+    return f"{name}_{version}" if version and target_count > 1 else name
+
+
+def target_extension(task: dict, output_format: str) -> str:
+    return os.path.splitext(task["input_file"])[1] if output_format == "source" else f".{output_format}"
+
+
+def output_slot(task: dict, mode: str, target_index: int) -> str:
+    """Reservation slot of one output: empty for the task's primary output, else ``<mode>:<target>``."""
+    return "" if mode == task["translation_mode"] and not target_index else f"{mode}:{target_index}"
+
+
 class ConfigBody(BaseModel):
     deepl_key: str = ""
     provider: str = "deepl"
@@ -112,6 +136,8 @@ class ConfigBody(BaseModel):
     azure_region: str = ""
     output_dir: str = ""
     project_package_path: Optional[str] = None
+    deepl_keys: Optional[list[str]] = None
+    azure_keys: Optional[list[str]] = None
 
 
 class TranslateBody(BaseModel):
@@ -129,14 +155,32 @@ class TranslateBody(BaseModel):
 
 class BatchBody(BaseModel):
     files: list[str]
+    priority: str = "normal"
+
+
+class QueueLimitsBody(BaseModel):
+    workers: Optional[int] = None
+    max_running: Optional[int] = None
+    per_key: Optional[int] = None
+    per_provider: Optional[dict[str, int]] = None
+
+
+class QueuePolicyBody(BaseModel):
+    policy: Optional[str] = None
+    fairness: Optional[int] = None
 
 
 class BatchStartBody(BaseModel):
     output_dir: str = ""
     translation_mode: str = "zh_to_fr"
+    # Several modes with one source language are extracted once and written as separate outputs.
+    translation_modes: list[str] = []
     translate_blocks: bool = False
-    output_format: str = "source"
-    output_version: str = ""
+    # False re-resolves every text instead of reusing the previous revision's manifest translations.
+    incremental: bool = True
+    # Lists request several outputs (e.g. DXF plus DWG ACAD2013 and ACAD2018) from one translated drawing.
+    output_format: str | list[str] = "source"
+    output_version: str | list[str] = ""
     deepl_key: str = ""
     provider: str = "deepl"
     azure_key: str = ""
@@ -182,7 +226,19 @@ class TranslationService:
         self.language_assets = LanguageAssets()
         self.dropped_files_dir = Path(CONFIG_PATH).parent / "cad_translator_dropped_files"
         self.dropped_files_dir.mkdir(exist_ok=True)
-        self.batch = BatchQueue(self._run_batch, self.emit_log, lambda task: self.load_config().get(f"{task.get('provider', 'deepl')}_key", ""))
+        self._key_pools: dict[str, KeyPool] = {}
+        self._quota_reserved: dict[str, int] = {}
+        self.output_cache = OutputCache()
+        self.dwg_prefetch = DwgPrefetch()
+        self.batch = BatchQueue(self._run_batch, self.emit_log, lambda task: self.load_config().get(f"{task.get('provider', 'deepl')}_key", ""), lambda task: self.key_pool(task.get("provider", "deepl")))
+        try:
+            self.batch.set_limits(**{name: value for name, value in self.load_config()["queue_limits"].items() if name in QUEUE_LIMITS})
+        except (TypeError, ValueError) as exc:
+            self.emit_log(f"⚠ 队列并发设置无效，已使用默认值: {exc}")
+        try:
+            self.batch.set_policy(**{name: value for name, value in self.load_config()["queue_policy"].items() if name in QUEUE_POLICY})
+        except (TypeError, ValueError) as exc:
+            self.emit_log(f"⚠ 队列调度策略无效，已使用默认值: {exc}")
         self.cleanup_dropped_files()
         threading.Thread(target=preload_support_qrcodes, daemon=True).start()
 
@@ -216,25 +272,219 @@ class TranslationService:
         key = task.get("_key") or config.get(f"{provider}_key", "")
         if not key:
             raise RuntimeError(f"请配置 {'Azure Translator' if provider == 'azure' else 'DeepL'} API Key 后继续队列")
-        fmt = task.get("output_format", "source")
-        ext = os.path.splitext(task["input_file"])[1] if fmt == "source" else f".{fmt}"
-        name = f"{output_prefix(task['translation_mode'])}_{Path(task['input_file']).stem}"
-        output = self.reserve_output(task, name, ext)
+        modes = batch_modes(task)
+        targets = output_targets(task.get("output_format", "source"), task.get("output_version", ""))
+        outputs = {mode: [self.reserve_output(task, batch_output_name(task, mode, version, len(targets)), target_extension(task, fmt), output_slot(task, mode, index)) for index, (fmt, version) in enumerate(targets)] for mode in modes}
+        project_package_path = task.get("project_package_path") or config.get("project_package_path", "")
+        self.output_cache.limit_bytes = int(config.get("output_cache_limit_mb", OUTPUT_CACHE_LIMIT_MB)) << 20
+        work_dxf_cache.limit_bytes = int(config.get("work_dxf_cache_limit_mb", WORK_DXF_CACHE_LIMIT_MB)) << 20
+        oda_pool.resize(int(config.get("oda_workers", ODA_WORKERS)))
+        self.batch.stages.set_limit("convert", oda_pool.size)
+        # Hashed once per task: every mode and target's cache key and every translator reuse them.
+        fingerprint = file_fingerprint(task["input_file"])
+        basis = self.translation_basis(provider, project_package_path)
+        output_keys, translators = {}, {}
+        for mode in modes:
+            output_keys[mode] = [self.output_cache_key(task, fmt, fingerprint, basis, mode, version) for fmt, version in targets]
+            cached = [self.output_cache.lookup(output_key) for output_key in output_keys[mode]]
+            if all(cached):
+                for cached_output, output in zip(cached, outputs[mode]):
+                    self.output_cache.publish(cached_output, output)
+                log("♻ 缓存命中 (cache hit)：源文件与翻译设置均未变化，直接复用上次输出" + (f" ({mode})" if len(modes) > 1 else ""))
+            else:
+                translators[mode] = self._batch_translator(task, mode, provider, key, config, project_package_path, log, fingerprint, basis)
+        if len(modes) > 1 or len(targets) > 1:
+            with self.batch.lock:
+                task["outputs"] = [output for mode in modes for output in outputs[mode]]
+        primary_output = outputs[modes[0]][0]
+        if not translators:
+            discard_checkpoint(task["id"])
+            return primary_output
+        # A single target keeps passing a plain path; several targets are finalized from one work DXF.
+        outputs = {mode: paths if len(targets) > 1 else paths[0] for mode, paths in outputs.items()}
+        fmt = [fmt for fmt, _ in targets] if len(targets) > 1 else targets[0][0]
+        version = [version for _, version in targets] if len(targets) > 1 else targets[0][1]
+        translator = next(iter(translators.values()))
+        try:
+            if task.get("estimate"):
+                self.reserve_quota(task, provider, task["estimate"])
+            prepared_input = ""
+            if task["input_file"].lower().endswith(".dwg"):
+                with self.batch.lock:
+                    pending = [candidate for candidate in self.batch.tasks if candidate["status"] in ACTIVE and candidate is not task]
+                # Binary work DXFs for tasks whose every output goes back through ODA.
+                binary = {candidate["input_file"] for candidate in pending if binary_work_dxf(output_targets(candidate.get("output_format", "source"), candidate.get("output_version", "")))}
+                # Queued DWGs convert in the background; this task converts its own unless a run already has it.
+                self.dwg_prefetch.prepare([candidate["input_file"] for candidate in pending], log, binary)
+                prepared_input = self.dwg_prefetch.take(task["input_file"], binary_work_dxf(targets), cancel_event)
+            if len(translators) == 1:
+                mode = next(iter(translators))
+                translator.translate_cad_file(task["input_file"], outputs[mode], mode, task["translate_blocks"], fmt, version, resume_event, cancel_event, prepared_input)
+            else:
+                jobs = {mode: (mode_translator, outputs[mode]) for mode, mode_translator in translators.items()}
+                translator.translate_cad_file_modes(task["input_file"], jobs, task["translate_blocks"], fmt, version, resume_event, cancel_event, prepared_input)
+        finally:
+            with self._lock:
+                for reservation in [reservation for reservation in self._quota_reserved if reservation.split(":", 1)[0] == task["id"]]:
+                    self._quota_reserved.pop(reservation)
+        with self.batch.lock:
+            task["timings"] = translator.timings
+            if translator.incremental_summary:
+                task["incremental"] = translator.incremental_summary
+        for mode in translators:
+            for output_key, output in zip(output_keys[mode], [outputs[mode]] if len(targets) == 1 else outputs[mode]):
+                try:
+                    self.output_cache.store(output_key, output)
+                except OSError as exc:
+                    log(f"⚠ 输出缓存写入失败: {exc}")
+        return primary_output
+
+    def _batch_translator(self, task: dict, mode: str, provider: str, key: str, config: dict, project_package_path: str, log, fingerprint: str, basis: str) -> CADChineseTranslator:
+        """A translator for one mode of a batch task; extra fan-out modes get their own checkpoint and quota reservation."""
+        extra = mode != task["translation_mode"]
         translator = CADChineseTranslator(log_callback=log)
-        translator.configure_language_assets(task.get("project_package_path") or config.get("project_package_path", ""))
+        translator.configure_language_assets(project_package_path)
         if provider == "azure":
             translator.configure_azure(key, task.get("azure_region") or config.get("azure_region", ""))
         else:
             translator.deepl_api_key = key
             if not translator.deepl_translator:
                 raise RuntimeError("DeepL 初始化失败，请检查 API Key")
-        translator.translate_cad_file(task["input_file"], output, task["translation_mode"], task["translate_blocks"], fmt, task.get("output_version", ""), resume_event, cancel_event)
-        return output
+        translator.configure_key_pool(self.key_pool(provider), key)
+        # The primary mode of a preflighted DXF was reserved from ``task["estimate"]`` already.
+        if extra or not task.get("estimate"):
+            translator.quota_gate = lambda estimate: self.reserve_quota(task, provider, estimate, mode if extra else "")
+        translator.quota_spent = lambda characters: self.release_quota(task, characters, mode if extra else "")
+        translator.pipeline_stage = task.get("_stage")
+        translator.checkpoint_path = checkpoint_path(f"{task['id']}-{mode}" if extra else task["id"])
+        translator.manifest_path = manifest_path(task["input_file"], mode, task["translate_blocks"]) if task.get("incremental_translation", True) else None
+        translator.manifest_basis = basis
+        translator.source_fingerprint = fingerprint
+        return translator
+
+    def output_cache_key(self, task: dict, fmt: str, fingerprint: str, basis: str, mode: str = "", version: str = "") -> str:
+        """Everything that can change a finished drawing besides provider drift.
+
+        ``fingerprint`` is the input's ``file_fingerprint`` and ``basis`` its ``translation_basis``.
+        """
+        return cache_key({
+            "input": fingerprint,
+            "mode": mode or task["translation_mode"],
+            "blocks": bool(task["translate_blocks"]),
+            "format": fmt,
+            "version": version,
+            "basis": basis,
+        })
+
+    def translation_basis(self, provider: str, project_package_path: str) -> str:
+        """Fingerprint of the glossaries, project terms and memory edits a translation depends on."""
+        return cache_key({
+            "provider": provider,
+            "glossaries": glossary_fingerprint(),
+            "project": file_fingerprint(project_package_path) if project_package_path and os.path.isfile(project_package_path) else "",
+            "assets": self.language_assets.revision(),
+            "app": APP_VERSION,
+        })
+
+    def reserve_quota(self, task: dict, provider: str, estimate: dict, mode: str = "") -> None:
+        """Admit a drawing only when its whole provider estimate fits the unreserved quota.
+
+        Extra fan-out modes reserve under ``<task id>:<mode>`` next to the task's own estimate.
+        """
+        reservation = f"{task['id']}:{mode}" if mode else task["id"]
+        if not mode:
+            with self.batch.lock:
+                task["estimate"] = estimate
+        remaining = self.key_pool(provider).remaining_total()
+        with self._lock:
+            reserved = sum(characters for other, characters in self._quota_reserved.items() if other != reservation)
+            if remaining is not None and estimate["characters"] > remaining - reserved:
+                raise QuotaDeferredError(f"本月剩余额度不足：本图约需 {estimate['characters']} 字符，可用 {max(0, remaining - reserved)} 字符，已整图延后")
+            self._quota_reserved[reservation] = estimate["characters"]
+
+    def release_quota(self, task: dict, characters: int, mode: str = "") -> None:
+        """Shrink a reservation by characters already billed; the key pool counts them as spent from then on."""
+        reservation = f"{task['id']}:{mode}" if mode else task["id"]
+        with self._lock:
+            if reservation in self._quota_reserved:
+                self._quota_reserved[reservation] = max(0, self._quota_reserved[reservation] - characters)
+
+    def preflight_batch(self) -> None:
+        """Estimate queued DXF files before their turn; DWG files are estimated after conversion."""
+        config = self.load_config()
+        for task in self.batch.snapshot()["tasks"]:
+            if task["status"] != "queued" or task.get("estimate") or not task["input_file"].lower().endswith(".dxf"):
+                continue
+            translator = CADChineseTranslator(log_callback=lambda *_args, **_kwargs: None)
+            translator.configure_language_assets(task.get("project_package_path") or config.get("project_package_path", ""))
+            try:
+                estimate = translator.estimate_cad_file(task["input_file"], task["translation_mode"], task["translate_blocks"])
+            except Exception as exc:
+                self.emit_log(f"[{Path(task['input_file']).name}] 预估失败: {exc}")
+                continue
+            with self.batch.lock:
+                current = self.batch._task(task["id"])
+                if current and not current.get("estimate"):
+                    current["estimate"] = estimate
+            self.batch.refresh_cost(task["id"])
+
+    @staticmethod
+    def provider_keys(config: dict, provider: str) -> list[str]:
+        """The selected key first, then the optional ``<provider>_keys`` pool."""
+        keys = [config.get(f"{provider}_key", ""), *(config.get(f"{provider}_keys") or [])]
+        return list(dict.fromkeys(key.strip() for key in keys if isinstance(key, str) and key.strip()))
+
+    def key_pool(self, provider: str) -> KeyPool:
+        """Shared per-provider pool; quota is refreshed lazily from local and remote usage."""
+        with self._lock:
+            pool = self._key_pools.get(provider)
+            created = pool is None
+            if created:
+                pool = self._key_pools[provider] = KeyPool(provider, self.provider_keys(self.load_config(), provider), self.batch.limits["per_key"])
+        if created:
+            self._apply_key_capacity()
+        pool.refresh_quota(lambda key: self.key_remaining(provider, key))
+        return pool
+
+    def _apply_key_capacity(self) -> dict:
+        """Let the queue's automatic running limit follow the key pools' capacity."""
+        with self._lock:
+            pools = list(self._key_pools.values())
+        return self.batch.set_limits(capacity=max((pool.capacity() for pool in pools), default=0))
 
-    def reserve_output(self, task: dict, name: str, ext: str) -> str:
-        """Reserve a distinct output path before concurrent work starts."""
-        if task.get("_output_path"):
-            return task["_output_path"]
+    def key_remaining(self, provider: str, key: str) -> Optional[int]:
+        """Remaining monthly characters of ``key``, or None when its provider plan sets no known limit.
+
+        Azure keys are gated only when configured as F0 (``azure_tier``) or after they reported
+        the F0 ``403001`` quota error this month; paid tiers have no cap to check locally.
+        """
+        if provider == "azure":
+            usage = self.language_assets.key_usage("azure").get(key_fingerprint(key), {})
+            if usage.get("quota_exceeded"):
+                return 0
+            if str(self.load_config().get("azure_tier", "")).upper() != "F0":
+                return None
+            return max(0, AZURE_F0_MONTHLY_CHARACTER_LIMIT - usage.get("characters", 0))
+        usage = self.deepl_usage(key)
+        if not usage["available"] or not usage["limit"]:
+            return None
+        return max(0, usage["limit"] - usage["characters"])
+
+    def batch_snapshot(self) -> dict:
+        snapshot = self.batch.snapshot()
+        with self._lock:
+            pools = dict(self._key_pools)
+            reserved = sum(self._quota_reserved.values())
+        estimated = sum(task["estimate"]["characters"] for task in snapshot["tasks"] if task["status"] in ACTIVE and task.get("estimate"))
+        quota = {provider: {"remaining": pool.remaining_total(), "reserved": reserved, "estimated": estimated} for provider, pool in pools.items()}
+        return {**snapshot, "key_pools": {provider: pool.snapshot() for provider, pool in pools.items()}, "quota": quota}
+
+    def reserve_output(self, task: dict, name: str, ext: str, slot: str = "") -> str:
+        """Reserve a distinct output path before concurrent work starts; ``slot`` names an extra fan-out output."""
+        reserved = task.setdefault("_output_paths", {}) if slot else task
+        slot = slot or "_output_path"
+        if reserved.get(slot):
+            return reserved[slot]
         base = os.path.join(task["output_dir"], name + ext)
         candidate = base
         with self._output_lock:
@@ -245,7 +495,7 @@ class TranslationService:
                 candidate = os.path.join(task["output_dir"], f"{name}_{task['id'][:8]}_{suffix}{ext}")
                 suffix += 1
             self._reserved_outputs.add(candidate)
-        task["_output_path"] = candidate
+        reserved[slot] = candidate
         return candidate
 
     def subscribe(self) -> queue.Queue:
@@ -279,8 +529,16 @@ class TranslationService:
             content = "\n".join(self._logs)
         Path(file_path).write_text(content, encoding="utf-8-sig")
 
+    def retain_prefetched(self):
+        """Drop the prefetched work DXFs of DWGs whose tasks left the queue."""
+        with self.batch.lock:
+            paths = [task["input_file"] for task in self.batch.tasks if task["status"] in ACTIVE]
+        self.dwg_prefetch.retain(paths)
+
     def shutdown(self):
         self.batch.shutdown()
+        self.dwg_prefetch.clear()
+        oda_pool.shutdown()
 
     def set_status(self, status: str, message: str = ""):
         with self._lock:
@@ -306,7 +564,7 @@ class TranslationService:
         path.mkdir(parents=True, exist_ok=True)
         return str(path)
 
-    def save_config(self, deepl_key: str, output_dir: str = "", provider: str = "deepl", azure_key: str = "", azure_region: str = "", project_package_path: Optional[str] = None):
+    def save_config(self, deepl_key: str, output_dir: str = "", provider: str = "deepl", azure_key: str = "", azure_region: str = "", project_package_path: Optional[str] = None, deepl_keys: Optional[list[str]] = None, azure_keys: Optional[list[str]] = None):
         config = self.load_config()
         config["deepl_key"] = deepl_key.strip()
         config["provider"] = provider
@@ -314,10 +572,19 @@ class TranslationService:
         config["azure_region"] = azure_region.strip()
         if project_package_path is not None:
             config["project_package_path"] = project_package_path.strip()
+        if deepl_keys is not None:
+            config["deepl_keys"] = [key.strip() for key in deepl_keys if key.strip()]
+        if azure_keys is not None:
+            config["azure_keys"] = [key.strip() for key in azure_keys if key.strip()]
         if output_dir:
             config["output_dir"] = output_dir
         config.setdefault("output_dir", self.default_output_dir())
         atomic_write_json(CONFIG_PATH, config)
+        with self._lock:
+            pools = dict(self._key_pools)
+        for provider, pool in pools.items():
+            pool.update_keys(self.provider_keys(config, provider))
+        self._apply_key_capacity()
 
     def load_config(self) -> dict:
         if os.path.exists(CONFIG_PATH):
@@ -333,14 +600,43 @@ class TranslationService:
             config.setdefault("azure_key", "")
             config.setdefault("azure_region", "")
             config.setdefault("project_package_path", "")
+            config.setdefault("deepl_keys", [])
+            config.setdefault("azure_keys", [])
+            config.setdefault("azure_tier", "")
+            config.setdefault("output_cache_limit_mb", OUTPUT_CACHE_LIMIT_MB)
+            config.setdefault("oda_workers", ODA_WORKERS)
+            config.setdefault("work_dxf_cache_limit_mb", WORK_DXF_CACHE_LIMIT_MB)
+            config.setdefault("queue_limits", {})
+            config.setdefault("queue_policy", {})
             return config
-        return {"deepl_key": "", "provider": "deepl", "azure_key": "", "azure_region": "", "output_dir": self.default_output_dir(), "project_package_path": ""}
+        return {"deepl_key": "", "provider": "deepl", "azure_key": "", "azure_region": "", "output_dir": self.default_output_dir(), "project_package_path": "", "deepl_keys": [], "azure_keys": [], "azure_tier": "", "output_cache_limit_mb": OUTPUT_CACHE_LIMIT_MB, "oda_workers": ODA_WORKERS, "work_dxf_cache_limit_mb": WORK_DXF_CACHE_LIMIT_MB, "queue_limits": {}, "queue_policy": {}}
+
+    def set_queue_limits(self, limits: dict) -> dict:
+        """Apply concurrency limits to the running queue and keep them for the next start."""
+        snapshot = self.batch.set_limits(**limits)
+        with self._lock:
+            pools = list(self._key_pools.values())
+        for pool in pools:
+            pool.task_limit = snapshot["per_key"]
+        snapshot = self._apply_key_capacity()
+        config = self.load_config()
+        config["queue_limits"] = {name: snapshot[name] for name in QUEUE_LIMITS}
+        atomic_write_json(CONFIG_PATH, config)
+        return snapshot
+
+    def set_queue_policy(self, policy: dict) -> dict:
+        """Change how queued files are ordered and keep the choice for the next start."""
+        snapshot = self.batch.set_policy(**policy)
+        config = self.load_config()
+        config["queue_policy"] = snapshot
+        atomic_write_json(CONFIG_PATH, config)
+        return snapshot
 
     @staticmethod
     def deepl_usage(key: str) -> dict:
         if not key.strip():
             return {"available": False, "message": "未配置 DeepL Key"}
-        endpoint = "https://api-free.deepl.com/v2/usage" if key.strip().endswith(":fx") else "https://api.deepl.com/v2/usage"
+        endpoint = deepl_usage_endpoint(key)
         request = urllib.request.Request(endpoint, headers={"Authorization": f"DeepL-Auth-Key {key.strip()}"})
         try:
             with urllib.request.urlopen(request, timeout=10) as response:
@@ -490,7 +786,7 @@ def get_config():
 
 @app.post("/api/config")
 def post_config(body: ConfigBody):
-    service.save_config(body.deepl_key, body.output_dir, body.provider, body.azure_key, body.azure_region, body.project_package_path)
+    service.save_config(body.deepl_key, body.output_dir, body.provider, body.azure_key, body.azure_region, body.project_package_path, body.deepl_keys, body.azure_keys)
     return {"ok": True}
 
 
@@ -572,8 +868,9 @@ def get_system_theme():
 
 
 @app.get("/api/odafc-status")
-def get_odafc_status():
-    return odafc_status()
+def get_odafc_status(refresh: bool = False):
+    # ``?refresh=true`` searches the ODA install locations again, e.g. after installing ODA.
+    return odafc_status(refresh)
 
 
 @app.post("/api/translate")
@@ -584,7 +881,7 @@ def start_translate(body: TranslateBody):
 
 @app.get("/api/batch")
 def get_batch():
-    return service.batch.snapshot()
+    return service.batch_snapshot()
 
 
 @app.post("/api/logs/clear")
@@ -600,7 +897,9 @@ def add_batch(body: BatchBody):
     for path in body.files:
         if not os.path.isfile(path) or not path.lower().endswith((".dxf", ".dwg")):
             raise HTTPException(status_code=400, detail=f"无效 CAD 文件: {path}")
-    return service.batch.add(body.files)
+    if body.priority not in PRIORITIES:
+        raise HTTPException(status_code=400, detail="不支持的优先级")
+    return service.batch.add(body.files, body.priority)
 
 
 @app.post("/api/batch/drop")
@@ -614,24 +913,34 @@ async def drop_batch(files: list[UploadFile] = File(...)):
 def start_batch(body: BatchStartBody):
     output_dir = body.output_dir or service.load_config().get("output_dir") or service.default_output_dir()
     os.makedirs(output_dir, exist_ok=True)
-    if body.translation_mode not in {"zh_to_fr", "fr_to_zh", "zh_to_en", "en_to_zh"}:
+    if body.translation_modes:
+        body.translation_mode = body.translation_modes[0]
+    if any(mode not in {"zh_to_fr", "fr_to_zh", "zh_to_en", "en_to_zh"} for mode in [body.translation_mode, *body.translation_modes]):
         raise HTTPException(status_code=400, detail="不支持的翻译方向")
+    if len({mode.split("_to_", 1)[0] for mode in [body.translation_mode, *body.translation_modes]}) > 1:
+        raise HTTPException(status_code=400, detail="同时输出多种语言时，源语言必须相同")
     if body.provider not in {"deepl", "azure"}:
         raise HTTPException(status_code=400, detail="不支持的翻译服务")
-    if body.output_format not in {"source", "dxf", "dwg"}:
+    try:
+        targets = output_targets(body.output_format, body.output_version)
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+    if any(fmt not in {"source", "dxf", "dwg"} for fmt, _ in targets):
         raise HTTPException(status_code=400, detail="不支持的输出格式")
-    if body.output_version not in {"", *ODA_OUTPUT_VERSIONS}:
+    if any(version not in {"", *ODA_OUTPUT_VERSIONS} for _, version in targets):
         raise HTTPException(status_code=400, detail="不支持的输出版本")
     if not (body.azure_key if body.provider == "azure" else body.deepl_key).strip():
         raise HTTPException(status_code=400, detail=f"请配置 {'Azure Translator' if body.provider == 'azure' else 'DeepL'} API Key")
-    for task in service.batch.snapshot()["tasks"]:
-        if task["status"] in {"queued", "retrying", "cancelled", "failed"} and (task["input_file"].lower().endswith(".dwg") or body.output_format == "dwg") and not odafc_available():
-            raise HTTPException(status_code=400, detail=dwg_unavailable_short())
+    pending = [task for task in service.batch.snapshot()["tasks"] if task["status"] in {"queued", "retrying", "cancelled", "failed"}]
+    if any(task["input_file"].lower().endswith(".dwg") or any(fmt == "dwg" for fmt, _ in targets) for task in pending) and not odafc_available():
+        raise HTTPException(status_code=400, detail=dwg_unavailable_short())
     service.save_config(body.deepl_key, output_dir, body.provider, body.azure_key, body.azure_region, body.project_package_path)
     settings = body.model_dump()
     settings["output_dir"] = output_dir
     settings["api_key"] = body.azure_key if body.provider == "azure" else body.deepl_key
-    return service.batch.start(settings)
+    snapshot = service.batch.start(settings)
+    threading.Thread(target=service.preflight_batch, daemon=True).start()
+    return snapshot
 
 
 @app.post("/api/batch/pause")
@@ -641,20 +950,26 @@ def pause_batch(paused: bool = True):
 
 @app.post("/api/batch/stop")
 def stop_batch():
-    return service.batch.stop()
+    snapshot = service.batch.stop()
+    service.retain_prefetched()
+    return snapshot
 
 
 @app.post("/api/batch/clear")
 def clear_batch():
     try:
-        return service.batch.clear()
+        snapshot = service.batch.clear()
     except RuntimeError as exc:
         raise HTTPException(status_code=409, detail=str(exc))
+    service.retain_prefetched()
+    return snapshot
 
 
 @app.post("/api/batch/{task_id}/remove")
 def remove_batch_task(task_id: str):
-    return service.batch.remove(task_id)
+    snapshot = service.batch.remove(task_id)
+    service.retain_prefetched()
+    return snapshot
 
 
 @app.post("/api/batch/{task_id}/retry")
@@ -662,6 +977,39 @@ def retry_batch_task(task_id: str):
     return service.batch.retry(task_id)
 
 
+@app.post("/api/batch/{task_id}/priority")
+def set_batch_task_priority(task_id: str, priority: str):
+    if priority not in PRIORITIES:
+        raise HTTPException(status_code=400, detail="不支持的优先级")
+    return service.batch.set_priority(task_id, priority)
+
+
+@app.get("/api/batch/limits")
+def get_batch_limits():
+    return service.batch.limits_snapshot()
+
+
+@app.post("/api/batch/limits")
+def set_batch_limits(body: QueueLimitsBody):
+    try:
+        return service.set_queue_limits(body.model_dump(exclude_none=True))
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+
+
+@app.get("/api/batch/policy")
+def get_batch_policy():
+    return dict(service.batch.policy)
+
+
+@app.post("/api/batch/policy")
+def set_batch_policy(body: QueuePolicyBody):
+    try:
+        return service.set_queue_policy(body.model_dump(exclude_none=True))
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+
+
 @app.get("/api/logs/stream")
 async def stream_logs():
     q = service.subscribe()
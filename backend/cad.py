@@ -9,15 +9,23 @@ import subprocess
 import sys
 import tempfile
 import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import ExitStack, contextmanager
 from dataclasses import dataclass
+from functools import lru_cache
 from pathlib import Path
-from typing import Callable, Optional
+from typing import Callable, Container, Optional
 
-from backend.storage import atomic_output_path
+from backend.output_cache import OutputCache, cache_key
+from backend.pipeline import PIPELINE_DEPTH
+from backend.storage import atomic_output_path, file_fingerprint
 
 # ODA File Converter accepts its own ``ACAD*`` identifiers, not ezdxf's
 # ``R2010`` DXF-version label.  This value is passed to ODA directly.
 WORK_DXF_VERSION = "ACAD2010"
+# Output formats ODA accepts, with the suffixes it may give the converted file (DXB is binary DXF).
+ODA_OUTPUT_SUFFIXES = {"DXF": {"DXF"}, "DWG": {"DWG"}, "DXB": {"DXB", "DXF"}}
 ODA_OUTPUT_VERSIONS = ("ACAD9", "ACAD10", "ACAD12", "ACAD13", "ACAD14", "ACAD2000", "ACAD2004", "ACAD2007", "ACAD2010", "ACAD2013", "ACAD2018")
 
 # Windows 安装包推荐目录结构（与主程序 exe 同级）：
@@ -48,10 +56,37 @@ ACAD_SIG_TO_ODA: dict[str, str] = {
     "AC1032": "ACAD2018",
 }
 
+# While another ODA conversion runs, requests arriving within this window share one ODA run.
+BULK_WINDOW_SECONDS = 0.5
+# Concurrent ODA processes; each runs in private temp folders (and on Linux its own Xvfb display).
+ODA_WORKERS = 2
+# Binary work DXFs are given up after this many DWGs in a row whose DXB export failed
+# while the ASCII export of the same file succeeded.
+BINARY_WORK_DXF_FAILURE_LIMIT = 3
+# Work DXFs of already converted DWGs, keyed by DWG content and WORK_DXF_VERSION.
+WORK_DXF_CACHE_DIR = Path.home() / ".cad_translator_work_dxf_cache"
+WORK_DXF_CACHE_LIMIT_MB = 4096
+
 LogFn = Optional[Callable[[str], None]]
 _odafc_configured = False
 _oda_mount_lock = threading.Lock()
 _oda_mount_dir: Optional[Path] = None
+_oda_discovery_lock = threading.Lock()
+_oda_discovery: Optional[OdaDiscovery] = None
+# Cleared after BINARY_WORK_DXF_FAILURE_LIMIT DXB failures in a row; later work files stay ASCII for the process lifetime.
+binary_work_dxf_supported = True
+_binary_work_dxf_lock = threading.Lock()
+_binary_work_dxf_failures = 0
+
+
+@dataclass(frozen=True)
+class OdaDiscovery:
+    """Where ODA was found (``path`` is empty when it was not) and the ``CAD_ODA_EXEC`` value it was resolved under."""
+
+    path: str
+    source: str
+    installed: bool
+    env: str
 
 
 @dataclass
@@ -192,24 +227,65 @@ def odafc_candidate_paths() -> list[Path]:
     return paths
 
 
-def resolve_odafc_path() -> Optional[str]:
+def _search_odafc_path() -> Optional[str]:
     for path in odafc_candidate_paths():
         if path.is_file():
             return str(path.resolve())
     return None
 
 
-def configure_odafc() -> Optional[str]:
-    """优先使用与主程序同目录的 ODA File Converter。"""
-    global _odafc_configured
-    path = resolve_odafc_path()
-    if path:
-        import ezdxf
+def _odafc_source(path: str) -> str:
+    app_dir = get_app_dir()
+    p = Path(path)
+    app_root = _macos_app_root()
+    adjacent_roots = [app_dir]
+    if app_root:
+        adjacent_roots.append(app_root.parent)
+    if os.environ.get("CAD_ODA_EXEC"):
+        return "env"
+    if (_oda_mount_dir and _oda_mount_dir in p.parents) or any(root == p.parent or root in p.parents for root in adjacent_roots):
+        return "bundled"
+    return "system"
+
+
+def discover_odafc(refresh: bool = False) -> OdaDiscovery:
+    """Resolve ODA once and reuse the result.
+
+    The candidate paths are searched again only when ``CAD_ODA_EXEC``
+    changes, the cached executable disappears, or ``refresh`` is set.
+    """
+    global _oda_discovery, _odafc_configured
+    env = os.environ.get("CAD_ODA_EXEC", "").strip()
+    with _oda_discovery_lock:
+        cached = _oda_discovery
+        if cached and not refresh and cached.env == env and (not cached.path or os.path.isfile(cached.path)):
+            return cached
+        path = _search_odafc_path()
+        installed = False
+        if path:
+            import ezdxf
+
+            # 优先使用与主程序同目录的 ODA File Converter。
+            option = "win_exec_path" if sys.platform == "win32" else "unix_exec_path"
+            ezdxf.options.set("odafc-addon", option, path)
+            _odafc_configured = True
+            try:
+                from ezdxf.addons import odafc
+
+                installed = odafc.is_installed()
+            except Exception:
+                installed = True
+        _oda_discovery = OdaDiscovery(path or "", _odafc_source(path) if path else "", installed, env)
+        return _oda_discovery
+
+
+def resolve_odafc_path() -> Optional[str]:
+    return discover_odafc().path or None
+
 
-        option = "win_exec_path" if sys.platform == "win32" else "unix_exec_path"
-        ezdxf.options.set("odafc-addon", option, path)
-        _odafc_configured = True
-    return path
+def configure_odafc(refresh: bool = False) -> Optional[str]:
+    """Point ezdxf's odafc addon at the discovered ODA File Converter."""
+    return discover_odafc(refresh).path or None
 
 
 def dwg_unavailable_message() -> str:
@@ -229,46 +305,27 @@ def dwg_unavailable_short() -> str:
     return "未检测到 ODA，无法处理 DWG；请安装 ODA 或将 DWG 另存为 DXF"
 
 
-def odafc_status() -> dict:
-    path = configure_odafc() or resolve_odafc_path()
-    if not path:
+def odafc_status(refresh: bool = False) -> dict:
+    discovery = discover_odafc(refresh)
+    if not discovery.path:
         return {
             "installed": False,
             "path": "",
             "source": "",
             "message": dwg_unavailable_message(),
         }
-
-    app_dir = get_app_dir()
-    p = Path(path)
-    app_root = _macos_app_root()
-    adjacent_roots = [app_dir]
-    if app_root:
-        adjacent_roots.append(app_root.parent)
-    if os.environ.get("CAD_ODA_EXEC"):
-        source = "env"
-    elif (_oda_mount_dir and _oda_mount_dir in p.parents) or any(root == p.parent or root in p.parents for root in adjacent_roots):
-        source = "bundled"
-    else:
-        source = "system"
-    return {"installed": True, "path": path, "source": source}
+    return {"installed": True, "path": discovery.path, "source": discovery.source}
 
 
 def odafc_available() -> bool:
-    try:
-        configure_odafc()
-        from ezdxf.addons import odafc
-
-        return odafc.is_installed()
-    except Exception:
-        return bool(resolve_odafc_path())
+    return discover_odafc().installed
 
 
 def require_odafc(log: LogFn = None) -> None:
-    path = configure_odafc()
-    if not path or not odafc_available():
+    discovery = discover_odafc()
+    if not discovery.installed:
         raise RuntimeError(dwg_unavailable_message())
-    _log(log, f"ODA File Converter 已就绪 ({path})")
+    _log(log, f"ODA File Converter 已就绪 ({discovery.path})")
 
 
 def read_dwg_acad_signature(path: str) -> str:
@@ -302,6 +359,21 @@ def _macos_odafc_app(executable: str) -> Optional[Path]:
     return None
 
 
+def _oda_arguments(input_dir: str, output_dir: str, version: str, output_format: str, audit: bool, file_filter: str) -> list[str]:
+    """ODAFileConverter "Input Folder" "Output Folder" version type recurse audit filter"""
+    return [input_dir, output_dir, version, output_format, "0", "1" if audit else "0", file_filter]
+
+
+def _run_hidden_macos_odafc(app: Path, arguments: list[str]) -> None:
+    subprocess.run(
+        ["open", "-g", "-j", "-W", "-n", "-a", str(app), "--args", *arguments],
+        check=True,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        text=True,
+    )
+
+
 def _convert_with_hidden_macos_odafc(source: str, destination: str, *, version: str, audit: bool, replace: bool) -> bool:
     """Use LaunchServices to run ODA hidden and without activating it.
 
@@ -325,27 +397,12 @@ def _convert_with_hidden_macos_odafc(source: str, destination: str, *, version:
         raise FileNotFoundError(f"Destination folder does not exist: '{destination_path.parent}'")
 
     output_format = destination_path.suffix.upper().lstrip(".")
-    if output_format not in {"DXF", "DWG"}:
+    if output_format not in ODA_OUTPUT_SUFFIXES:
         raise ValueError(f"Unsupported output file format: '{destination_path.suffix}'")
     with tempfile.TemporaryDirectory(prefix="honsen_oda_output_") as output_dir:
-        arguments = [
-            str(source_path.parent),
-            output_dir,
-            version,
-            output_format,
-            "0",
-            "1" if audit else "0",
-            source_path.name,
-        ]
-        subprocess.run(
-            ["open", "-g", "-j", "-W", "-n", "-a", str(app), "--args", *arguments],
-            check=True,
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE,
-            text=True,
-        )
+        _run_hidden_macos_odafc(app, _oda_arguments(str(source_path.parent), output_dir, version, output_format, audit, source_path.name))
         converted = next(
-            (path for path in Path(output_dir).iterdir() if path.is_file() and path.suffix.lower() == destination_path.suffix.lower()),
+            (path for path in Path(output_dir).iterdir() if path.is_file() and path.suffix.upper().lstrip(".") in ODA_OUTPUT_SUFFIXES[output_format]),
             None,
         )
         if not converted:
@@ -362,16 +419,27 @@ def convert_with_odafc(source: str, destination: str, *, version: str, audit: bo
     (for example filenames with accented French characters).  ``ezdxf`` sends
     the source filename as that filter.  Stage a temporary ASCII-named copy on
     macOS so ODA always receives a stable filter, while preserving the original
-    file and the requested destination path.
+    file and the requested destination path.  Linux, and formats ezdxf's
+    ``odafc.convert`` rejects (binary ``.dxb``), go through the folder run
+    used for bulk conversions on every platform.
     """
+    if sys.platform.startswith("linux") or Path(destination).suffix.lower() not in (".dxf", ".dwg"):
+        destination_path = Path(destination)
+        if destination_path.exists() and not replace:
+            raise FileExistsError(f"Target file already exists: '{destination_path}'")
+        error = convert_many_with_odafc([(source, destination)], version=version, audit=audit).get(destination)
+        if error is not None:
+            raise error
+        return
     if sys.platform != "darwin":
         from ezdxf.addons import odafc
 
-        odafc.convert(source, destination, version=version, audit=audit, replace=replace)
+        with oda_pool.worker():
+            odafc.convert(source, destination, version=version, audit=audit, replace=replace)
         return
 
     source_path = Path(source)
-    with tempfile.TemporaryDirectory(prefix="honsen_oda_input_") as stage_dir:
+    with oda_pool.worker(), tempfile.TemporaryDirectory(prefix="honsen_oda_input_") as stage_dir:
         staged_source = Path(stage_dir) / f"input{source_path.suffix.lower()}"
         shutil.copy2(source_path, staged_source)
         if _convert_with_hidden_macos_odafc(str(staged_source), destination, version=version, audit=audit, replace=replace):
@@ -381,70 +449,572 @@ def convert_with_odafc(source: str, destination: str, *, version: str, audit: bo
         odafc.convert(str(staged_source), destination, version=version, audit=audit, replace=replace)
 
 
-def dwg_to_work_dxf(dwg_path: str, work_dxf_path: str, log: LogFn = None) -> None:
+class _OdaWorker:
+    """One ODA slot; on Linux it owns a private Xvfb display, started on first use."""
+
+    def __init__(self):
+        self.display = ""
+        self._xvfb: Optional[subprocess.Popen] = None
+
+    def environment(self) -> dict:
+        if (self._xvfb is None or self._xvfb.poll() is not None) and shutil.which("Xvfb"):
+            self._start_virtual_display()
+        env = os.environ.copy()
+        if self.display:
+            env["DISPLAY"] = self.display
+        return env
+
+    def _start_virtual_display(self) -> None:
+        # -displayfd lets Xvfb pick a free display and report it once it accepts clients.
+        read_fd, write_fd = os.pipe()
+        try:
+            process = subprocess.Popen(
+                ["Xvfb", "-displayfd", str(write_fd), "-screen", "0", "800x600x24", "-nolisten", "tcp"],
+                pass_fds=(write_fd,),
+                stdout=subprocess.DEVNULL,
+                stderr=subprocess.DEVNULL,
+            )
+        finally:
+            os.close(write_fd)
+        with os.fdopen(read_fd) as stream:
+            number = stream.readline().strip()
+        if number:
+            self._xvfb, self.display = process, f":{number}"
+        else:
+            process.kill()
+            self._xvfb, self.display = None, ""
+
+    def stop(self) -> None:
+        if self._xvfb is not None:
+            self._xvfb.terminate()
+            try:
+                self._xvfb.wait(timeout=5)
+            except subprocess.TimeoutExpired:
+                self._xvfb.kill()
+        self._xvfb, self.display = None, ""
+
+
+class OdaPool:
+    """Bounds concurrent ODA processes to ``size`` workers.
+
+    Only conversions take a worker, so translating DWG drawings overlaps
+    freely.  Idle workers are reused to keep their virtual displays warm;
+    after ``shutdown`` a worker is stopped as soon as its conversion ends.
+    """
+
+    def __init__(self, size: int = ODA_WORKERS):
+        self.size = max(1, size)
+        self.busy = 0
+        self._idle: list[_OdaWorker] = []
+        self._closed = False
+        self._condition = threading.Condition()
+
+    def resize(self, size: int) -> None:
+        with self._condition:
+            self.size = max(1, int(size))
+            self._condition.notify_all()
+
+    @contextmanager
+    def worker(self):
+        with self._condition:
+            while self.busy >= self.size:
+                self._condition.wait()
+            self.busy += 1
+            worker = self._idle.pop() if self._idle else _OdaWorker()
+        try:
+            yield worker
+        finally:
+            with self._condition:
+                self.busy -= 1
+                closed = self._closed
+                if not closed:
+                    self._idle.append(worker)
+                self._condition.notify_all()
+            if closed:
+                worker.stop()
+
+    def shutdown(self) -> None:
+        """Stop idle workers now and busy ones when their conversion returns."""
+        with self._condition:
+            self._closed = True
+            idle, self._idle = self._idle, []
+        for worker in idle:
+            worker.stop()
+
+
+oda_pool = OdaPool()
+
+
+def _run_odafc(worker: _OdaWorker, arguments: list[str]) -> None:
+    """Run the discovered ODA executable without a visible window: a private Xvfb display on Linux, SW_HIDE on Windows."""
+    executable = resolve_odafc_path()
+    if not executable:
+        raise RuntimeError(dwg_unavailable_message())
+    linux = sys.platform.startswith("linux")
+    options: dict = {"env": worker.environment()} if linux else {}
+    if sys.platform == "win32":
+        startupinfo = subprocess.STARTUPINFO()
+        startupinfo.dwFlags = subprocess.STARTF_USESHOWWINDOW
+        startupinfo.wShowWindow = subprocess.SW_HIDE
+        options["startupinfo"] = startupinfo
+    result = subprocess.run([executable, *arguments], text=True, capture_output=True, **options)
+    stderr = result.stderr.strip()
+    # ODAFileConverter always crashes on exit on Linux, even after a successful run.
+    failed = stderr not in ("", "Quit (core dumped)") if linux else bool(result.returncode or stderr)
+    if failed:
+        raise RuntimeError(f"ODA File Converter 执行失败 (返回码 {result.returncode}): {stderr}")
+
+
+def run_odafc_folder(input_dir: str, output_dir: str, *, version: str, output_format: str, audit: bool = True, file_filter: str = "*.DWG,*.DXF") -> None:
+    """Run ODA once over every matching file of ``input_dir``, on a pool worker."""
+    arguments = _oda_arguments(input_dir, output_dir, version, output_format, audit, file_filter)
+    with oda_pool.worker() as worker:
+        executable = resolve_odafc_path() if sys.platform == "darwin" else None
+        app = _macos_odafc_app(executable) if executable else None
+        if app:
+            _run_hidden_macos_odafc(app, arguments)
+            return
+        # ezdxf's public odafc.convert() handles one file per launch, so run the executable directly.
+        _run_odafc(worker, arguments)
+
+
+def convert_many_with_odafc(jobs: list[tuple[str, str]], *, version: str, audit: bool = True) -> dict[str, Exception]:
+    """Convert ``(source, destination)`` pairs with one ODA run.
+
+    All destinations must share one format.  Sources are staged under ASCII
+    names (see ``convert_with_odafc`` for the macOS Unicode filter bug) and
+    results are moved back by name.  Returns the error of each destination
+    that was not produced.
+    """
+    output_format = Path(jobs[0][1]).suffix.upper().lstrip(".")
+    if output_format not in ODA_OUTPUT_SUFFIXES or any(Path(destination).suffix.upper().lstrip(".") != output_format for _, destination in jobs):
+        raise ValueError(f"Unsupported output file format: '{jobs[0][1]}'")
+    errors: dict[str, Exception] = {}
+    with tempfile.TemporaryDirectory(prefix="honsen_oda_bulk_in_") as input_dir, tempfile.TemporaryDirectory(prefix="honsen_oda_bulk_out_") as output_dir:
+        staged = []
+        for index, (source, destination) in enumerate(jobs):
+            name = f"f{index:05d}"
+            shutil.copy2(source, Path(input_dir) / f"{name}{Path(source).suffix.lower()}")
+            staged.append((name, destination))
+        run_odafc_folder(input_dir, output_dir, version=version, output_format=output_format, audit=audit)
+        produced = {path.stem.lower(): path for path in Path(output_dir).iterdir() if path.is_file() and path.suffix.upper().lstrip(".") in ODA_OUTPUT_SUFFIXES[output_format]}
+        for name, destination in staged:
+            converted = produced.get(name)
+            if converted is None:
+                errors[destination] = RuntimeError("ODA File Converter 未生成目标文件")
+                continue
+            Path(destination).unlink(missing_ok=True)
+            shutil.move(str(converted), destination)
+    return errors
+
+
+class _BulkJob:
+    def __init__(self, source: str, destination: str):
+        self.source, self.destination = source, destination
+        self.error: Optional[Exception] = None
+        self.done = threading.Event()
+
+
+class OdaBulkConverter:
+    """Coalesce concurrent conversions into one ODA run per target version and format.
+
+    Requests submitted together in ``convert_all`` share a run.  While other
+    conversions are running, the first request of a group also waits
+    ``window`` seconds for more to arrive; with an idle converter it starts
+    at once.  Each caller gets its own result.
+    """
+
+    def __init__(self, window: float = BULK_WINDOW_SECONDS):
+        self.window = window
+        self._lock = threading.Lock()
+        self._pending: dict[tuple, list[_BulkJob]] = {}
+        self._running = 0
+
+    def convert(self, source: str, destination: str, *, version: str, audit: bool = True) -> None:
+        self.convert_all([(source, destination, version)], audit=audit)
+
+    def convert_all(self, requests: list[tuple[str, str, str]], audit: bool = True) -> None:
+        """Convert ``(source, destination, version)`` requests; raises the first failure once all finished."""
+        jobs, led = [], []
+        with self._lock:
+            busy = self._running > 0
+            for source, destination, version in requests:
+                job = _BulkJob(source, destination)
+                group = (version, Path(destination).suffix.lower(), audit)
+                pending = self._pending.setdefault(group, [])
+                if not pending:
+                    led.append(group)
+                pending.append(job)
+                jobs.append(job)
+        if led:
+            if self.window and busy:
+                time.sleep(self.window)
+            if len(led) == 1:
+                self._run(led[0])
+            else:
+                with ThreadPoolExecutor(len(led)) as executor:
+                    list(executor.map(self._run, led))
+        for job in jobs:
+            job.done.wait()
+        error = next((job.error for job in jobs if job.error is not None), None)
+        if error is not None:
+            raise error
+
+    def _run(self, group: tuple) -> None:
+        version, _, audit = group
+        with self._lock:
+            jobs = self._pending.pop(group)
+            self._running += 1
+        try:
+            if len(jobs) == 1:
+                convert_with_odafc(jobs[0].source, jobs[0].destination, version=version, audit=audit, replace=True)
+                errors = {}
+            else:
+                errors = convert_many_with_odafc([(item.source, item.destination) for item in jobs], version=version, audit=audit)
+        except Exception as exc:
+            errors = {item.destination: exc for item in jobs}
+        finally:
+            with self._lock:
+                self._running -= 1
+        for item in jobs:
+            item.error = errors.get(item.destination)
+            item.done.set()
+
+
+oda_bulk = OdaBulkConverter()
+
+
+class DwgPrefetch:
+    """Work DXF copies of the next queued DWGs, converted a few at a time in background ODA runs.
+
+    Each ``prepare`` converts at most ``ahead`` files, counting those still in
+    flight, so a run stages and holds the ODA slot for a short chunk only.
+    Results move into ``work_dxf_cache``, where the conversion session finds
+    them; only when the cache is off or cannot take a file is it kept here.
+    Entries are keyed by path, size, mtime and work DXF format so an edited
+    DWG is converted again; ``take`` waits for an entry still in flight and
+    hands a kept file to a conversion session that owns it.  ``retain`` drops
+    the kept files of DWGs that left the queue.
+    """
+
+    def __init__(self):
+        self._lock = threading.Condition()
+        self._ready: dict[tuple, str] = {}
+        self._converting: set[tuple] = set()
+        self._checked: set[tuple] = set()  # every task start asks again; look each file state up once
+        self._wanted: set[str] = set()
+
+    @staticmethod
+    def _key(path: str, binary: bool = False) -> Optional[tuple]:
+        """The entry of ``path``; ``binary`` asks for a binary work DXF, granted while ODA still produces them."""
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return None
+        return (os.path.abspath(path), stat.st_size, stat.st_mtime_ns, binary_work_dxf_supported and binary)
+
+    def prepare(self, paths: list[str], log: LogFn = None, binary: Container[str] = (), ahead: int = PIPELINE_DEPTH) -> Optional[threading.Thread]:
+        """Start converting the next DWGs of ``paths`` not yet converted, in flight or cached; those in ``binary`` get binary work DXFs.
+
+        At most ``ahead`` files convert at a time, in the order of ``paths``; later
+        ones are picked up by the ``prepare`` calls of later task starts.  The
+        conversion runs on a background thread, which is returned; the caller
+        does not wait for it.
+        """
+        with self._lock:
+            self._wanted.update(os.path.abspath(path) for path in paths)
+            room = ahead - len(self._converting)
+            missing = []
+            for path in dict.fromkeys(paths):
+                if len(missing) >= room:
+                    break
+                key = self._key(path, path in binary) if path.lower().endswith(".dwg") else None
+                if not key or key in self._checked:
+                    continue
+                if work_dxf_cache.lookup(work_dxf_cache_key(path, key[-1]), touch=False):
+                    self._checked.add(key)
+                else:
+                    missing.append((path, key))
+            if len(missing) < 2:
+                return None
+            self._checked.update(key for _, key in missing)
+            self._converting.update(key for _, key in missing)
+        thread = threading.Thread(target=self._convert_all, args=(missing, log), daemon=True)
+        thread.start()
+        return thread
+
+    def _convert_all(self, missing: list[tuple[str, tuple]], log: LogFn) -> None:
+        try:
+            require_odafc(log)
+            _log(log, f"后台预转换接下来 {len(missing)} 个排队 DWG → DXF AutoCAD 2010（一次 ODA 调用）...")
+            for use_binary in (True, False):
+                group = [(path, key) for path, key in missing if key[-1] == use_binary]
+                if group:
+                    self._convert(group, use_binary, log)
+        except Exception as exc:
+            _log(log, f"⚠ 批量转换失败，改为逐个转换: {exc}")
+        finally:
+            with self._lock:
+                self._converting.difference_update(key for _, key in missing)
+                self._lock.notify_all()
+
+    def _convert(self, missing: list[tuple[str, tuple]], binary: bool, log: LogFn) -> None:
+        try:
+            self._convert_group(missing, binary, log)
+        finally:
+            # Tasks waiting on this group go on while the other work DXF format still converts.
+            with self._lock:
+                self._converting.difference_update(key for _, key in missing)
+                self._lock.notify_all()
+
+    def _convert_group(self, missing: list[tuple[str, tuple]], binary: bool, log: LogFn) -> None:
+        jobs = []
+        for path, _ in missing:
+            fd, work_path = tempfile.mkstemp(prefix="cad_tr_prefetch_", suffix=".dxb" if binary else ".dxf")
+            os.close(fd)
+            jobs.append((path, work_path))
+        try:
+            errors = convert_many_with_odafc(jobs, version=WORK_DXF_VERSION)
+        except Exception as exc:
+            errors = {work_path: exc for _, work_path in jobs}
+            _log(log, f"⚠ 批量转换失败，改为逐个转换: {exc}")
+        for (path, key), (_, work_path) in zip(missing, jobs):
+            if work_path not in errors and binary and not _is_binary_work_dxf(work_path):
+                errors[work_path] = RuntimeError("ODA 未生成二进制 DXF")
+            if work_path in errors:
+                Path(work_path).unlink(missing_ok=True)
+                continue
+            if _store_work_dxf(path, work_path, log, binary, move=True) or not Path(work_path).exists():
+                continue
+            with self._lock:
+                if key[0] in self._wanted:
+                    self._ready[key] = work_path
+                    work_path = ""
+            if work_path:
+                Path(work_path).unlink(missing_ok=True)  # its task left the queue during the run
+
+    def take(self, path: str, binary: bool = False, cancel_event: Optional[threading.Event] = None) -> str:
+        """The prefetched work DXF of ``path``, waiting while it is still being converted; "" when there is none.
+
+        A file kept in the other work DXF format, e.g. after binary work DXFs were
+        given up during the run, is removed rather than left behind.
+        """
+        with self._lock:
+            key = self._key(path, binary)
+            if not key:
+                return ""
+            variants = [key[:-1] + (flag,) for flag in (True, False)]
+            while any(variant in self._converting for variant in variants):
+                if cancel_event and cancel_event.is_set():
+                    raise InterruptedError("translation cancelled")
+                self._lock.wait(.1)
+            key = self._key(path, binary) or key
+            for variant in variants:
+                if variant != key and variant in self._ready:
+                    Path(self._ready.pop(variant)).unlink(missing_ok=True)
+            return self._ready.pop(key, "")
+
+    def retain(self, paths: list[str]) -> None:
+        """Keep only the prefetched work DXFs of ``paths``; in-flight conversions of other DWGs are dropped when they finish."""
+        with self._lock:
+            self._wanted = {os.path.abspath(path) for path in paths}
+            self._checked = {key for key in self._checked if key[0] in self._wanted}
+            for key in [key for key in self._ready if key[0] not in self._wanted]:
+                Path(self._ready.pop(key)).unlink(missing_ok=True)
+
+    def clear(self) -> None:
+        with self._lock:
+            for work_path in self._ready.values():
+                Path(work_path).unlink(missing_ok=True)
+            self._ready.clear()
+            self._checked.clear()
+            self._wanted.clear()
+
+
+work_dxf_cache = OutputCache(WORK_DXF_CACHE_DIR, WORK_DXF_CACHE_LIMIT_MB << 20)
+
+
+def work_dxf_cache_key(dwg_path: str, binary: bool = False) -> str:
+    stat = os.stat(dwg_path)
+    return _work_dxf_cache_key(os.path.abspath(dwg_path), stat.st_size, stat.st_mtime_ns, binary)
+
+
+@lru_cache(maxsize=256)
+def _work_dxf_cache_key(path: str, size: int, mtime_ns: int, binary: bool) -> str:
+    # Hashed once per file state: the prefetch and the conversion session both ask.
+    return cache_key({"dwg": file_fingerprint(path), "version": WORK_DXF_VERSION, **({"format": "DXB"} if binary else {})})
+
+
+def _store_work_dxf(dwg_path: str, work_dxf_path: str, log: LogFn = None, binary: bool = False, move: bool = False) -> bool:
+    """Cache a work DXF; True once the cache holds it (with ``move``, the file itself moved there)."""
+    if work_dxf_cache.limit_bytes <= 0:
+        return False
+    try:
+        work_dxf_cache.store(work_dxf_cache_key(dwg_path, binary), work_dxf_path, move)
+    except OSError as exc:
+        _log(log, f"⚠ DXF 中间文件缓存写入失败: {exc}")
+        return False
+    return True
+
+
+def _is_binary_work_dxf(path: str) -> bool:
+    from ezdxf.lldxf.validator import is_binary_dxf_file
+
+    return os.path.isfile(path) and is_binary_dxf_file(path)
+
+
+def binary_work_dxf(targets: list[tuple[str, str]]) -> bool:
+    """Whether a DWG's work DXF may be binary: every target goes back through ODA, none is a plain copy of it."""
+    return binary_work_dxf_supported and all(fmt in ("source", "dwg") or version for fmt, version in targets)
+
+
+def dwg_to_work_dxf(dwg_path: str, work_dxf_path: str, log: LogFn = None, binary: bool = False) -> str:
+    """Convert ``dwg_path`` to the work DXF: binary DXF when ``binary`` and ODA produces it, else ASCII.
+
+    Returns why a requested binary work DXF fell back to ASCII, or "".
+    """
+    global binary_work_dxf_supported, _binary_work_dxf_failures
+    binary = binary and binary_work_dxf_supported
+    cached = work_dxf_cache.lookup(work_dxf_cache_key(dwg_path, binary))
+    if cached:
+        work_dxf_cache.publish(cached, work_dxf_path)
+        _log(log, "♻ DWG 转换缓存命中：源 DWG 未变化，直接复用 DXF 中间文件")
+        return ""
     require_odafc(log)
-    _log(log, "DWG → DXF AutoCAD 2010（工作副本）...")
-    convert_with_odafc(dwg_path, work_dxf_path, version=WORK_DXF_VERSION, audit=True, replace=True)
+    _log(log, f"DWG → {'二进制 ' if binary else ''}DXF AutoCAD 2010（工作副本）...")
+    fallback = ""
+    if binary:
+        binary_path = str(Path(work_dxf_path).with_suffix(".dxb"))
+        try:
+            oda_bulk.convert(dwg_path, binary_path, version=WORK_DXF_VERSION, audit=True)
+        except Exception as exc:
+            fallback = f"二进制 DXF 转换失败: {exc}"
+        if _is_binary_work_dxf(binary_path):
+            with _binary_work_dxf_lock:
+                _binary_work_dxf_failures = 0
+            os.replace(binary_path, work_dxf_path)
+            _log(log, "DWG 已转换为二进制 DXF 中间文件")
+            _store_work_dxf(dwg_path, work_dxf_path, log, binary=True)
+            return ""
+        Path(binary_path).unlink(missing_ok=True)
+        fallback = fallback or "ODA 未生成二进制 DXF"
+        _log(log, f"⚠ {fallback}，改用 ASCII DXF")
+    oda_bulk.convert(dwg_path, work_dxf_path, version=WORK_DXF_VERSION, audit=True)
+    if binary:
+        # ASCII worked where binary did not; only repeated failures mean this ODA cannot write DXB.
+        with _binary_work_dxf_lock:
+            _binary_work_dxf_failures += 1
+            disable = binary_work_dxf_supported and _binary_work_dxf_failures >= BINARY_WORK_DXF_FAILURE_LIMIT
+            if disable:
+                binary_work_dxf_supported = False
+        if disable:
+            fallback += f"；连续 {BINARY_WORK_DXF_FAILURE_LIMIT} 次失败，之后的 DXF 中间文件改用 ASCII 格式"
+            _log(log, f"⚠ ODA 连续 {BINARY_WORK_DXF_FAILURE_LIMIT} 个 DWG 无法输出二进制 DXF，之后的 DXF 中间文件改用 ASCII 格式")
     _log(log, "DWG 已转换为 DXF 中间文件")
+    _store_work_dxf(dwg_path, work_dxf_path, log)
+    return fallback
 
 
-def work_dxf_to_dwg(
-    work_dxf_path: str,
-    dwg_path: str,
-    meta: SourceCadMeta,
-    log: LogFn = None,
-) -> None:
-    require_odafc(log)
-    _log(log, f"DXF → DWG {meta.oda_version}（还原原版本 {meta.acad_sig or '未知'}）...")
-    convert_with_odafc(work_dxf_path, dwg_path, version=meta.oda_version, audit=True, replace=True)
-    _log(log, f"已输出 DWG: {dwg_path}")
+def output_targets(output_format="source", output_version="") -> list[tuple[str, str]]:
+    """``(format, version)`` pairs to write; a single format or version applies to every entry of the other list."""
+    formats = [output_format] if isinstance(output_format, str) else list(output_format)
+    versions = [output_version] if isinstance(output_version, str) else list(output_version)
+    if not formats or not versions or (len(formats) != len(versions) and 1 not in (len(formats), len(versions))):
+        raise ValueError("输出格式与输出版本的数量不匹配")
+    count = max(len(formats), len(versions))
+    return list(dict.fromkeys(zip(formats * count if len(formats) == 1 else formats, versions * count if len(versions) == 1 else versions)))
 
 
 class CadConversionSession:
     """管理 DWG 往返转换的临时目录。"""
 
-    def __init__(self, input_file: str, log: LogFn = None, output_format: str = "source", output_version: str = ""):
+    def __init__(self, input_file: str, log: LogFn = None, output_format="source", output_version="", prepared_input: str = ""):
         self.meta = analyze_source(input_file)
         self.log = log
-        self.output_is_dwg = output_format == "dwg" or (output_format == "source" and self.meta.is_dwg)
-        self.output_version = output_version
-        self.output_needs_oda = self.output_is_dwg or bool(output_version)
+        # ``output_format``/``output_version`` may be lists: every target is written from one translated work DXF.
+        self.targets = output_targets(output_format, output_version)
+        self.output_is_dwg = any(self._target_is_dwg(fmt) for fmt, _ in self.targets)
+        self.output_needs_oda = any(self._target_is_dwg(fmt) or version for fmt, version in self.targets)
+        self.needs_finalize = self.meta.is_dwg or self.output_needs_oda or len(self.targets) > 1
+        # DWG work files stay binary DXF between ODA and ezdxf when no target publishes the work DXF itself.
+        self.binary_work = self.meta.is_dwg and binary_work_dxf(self.targets)
+        # Why a requested binary work DXF fell back to ASCII, for the task's timings.
+        self.binary_fallback = ""
         self._tmp: Optional[str] = None
         self.work_input: str = input_file
+        self.prepared_input = prepared_input
+
+    def _target_is_dwg(self, output_format: str) -> bool:
+        return output_format == "dwg" or (output_format == "source" and self.meta.is_dwg)
 
     def __enter__(self) -> CadConversionSession:
-        if self.meta.is_dwg or self.output_needs_oda:
+        if self.output_needs_oda:
             require_odafc(self.log)
-            if not self.meta.is_dwg:
-                return self
+        if self.meta.is_dwg:
             self._tmp = tempfile.mkdtemp(prefix="cad_tr_")
             self.work_input = os.path.join(self._tmp, "work_input.dxf")
             _log(
                 self.log,
                 f"检测到 DWG：{self.meta.acad_sig} → 将按 {self.meta.oda_version} 还原",
             )
-            dwg_to_work_dxf(self.meta.original_path, self.work_input, self.log)
+            if self.prepared_input and os.path.isfile(self.prepared_input):
+                shutil.move(self.prepared_input, self.work_input)
+                _log(self.log, "已使用批量转换的 DXF 中间文件")
+            else:
+                self.binary_fallback = dwg_to_work_dxf(self.meta.original_path, self.work_input, self.log, self.binary_work)
+            self.binary_work = self.binary_work and _is_binary_work_dxf(self.work_input)
         return self
 
     def __exit__(self, exc_type, exc, tb) -> None:
         if self._tmp and os.path.isdir(self._tmp):
             shutil.rmtree(self._tmp, ignore_errors=True)
 
-    def work_output_path(self) -> str:
-        if self.output_needs_oda and not self._tmp:
+    def work_output_path(self, name: str = "work_output") -> str:
+        if self.needs_finalize and not self._tmp:
             self._tmp = tempfile.mkdtemp(prefix="cad_tr_")
         if self._tmp:
-            return os.path.join(self._tmp, "work_output.dxf")
+            return os.path.join(self._tmp, f"{name}.dxf")
         return ""
 
-    def finalize(self, translated_dxf: str, final_output: str) -> None:
-        with atomic_output_path(final_output) as temporary_output:
-            if self.output_is_dwg:
-                if self.output_version:
-                    self.meta.oda_version = self.output_version
-                work_dxf_to_dwg(translated_dxf, temporary_output, self.meta, self.log)
-            elif self.output_version:
-                require_odafc(self.log)
-                convert_with_odafc(translated_dxf, temporary_output, version=self.output_version, audit=True, replace=True)
-            elif os.path.abspath(translated_dxf) != os.path.abspath(final_output):
-                shutil.copy2(translated_dxf, temporary_output)
+    def finalize(self, translated_dxf: str, final_output) -> None:
+        """Write one output per target and publish them together once every conversion succeeded.
+
+        ``final_output`` is a path or one path per target.
+        """
+        self.finalize_many([(translated_dxf, final_output)])
+
+    def finalize_many(self, results: list[tuple]) -> None:
+        """``finalize`` for several ``(translated_dxf, final_output)`` pairs, e.g. one per translation mode.
+
+        Every ODA conversion is submitted at once, so those sharing an ODA
+        version and format join one bulk run.
+        """
+        with ExitStack() as stack:
+            conversions = []
+            for translated_dxf, final_output in results:
+                outputs = [final_output] if isinstance(final_output, str) else list(final_output)
+                if len(outputs) != len(self.targets):
+                    raise ValueError("输出路径与输出目标数量不一致")
+                for output, target in zip(outputs, self.targets):
+                    temporary_output = stack.enter_context(atomic_output_path(output))
+                    conversion = self._target_conversion(translated_dxf, output, temporary_output, target)
+                    if conversion:
+                        conversions.append(conversion)
+            if conversions:
+                oda_bulk.convert_all(conversions)
+                _log(self.log, f"已输出 {len(conversions)} 个 ODA 转换目标")
+
+    def _target_conversion(self, translated_dxf: str, final_output: str, temporary_output: str, target: tuple[str, str]) -> Optional[tuple[str, str, str]]:
+        """The ``(source, destination, version)`` ODA conversion of one target, or None once it was copied."""
+        output_format, output_version = target
+        if self._target_is_dwg(output_format):
+            require_odafc(self.log)
+            version = output_version or self.meta.oda_version
+            _log(self.log, f"DXF → DWG {version}（还原原版本 {self.meta.acad_sig or '未知'}）...")
+            return translated_dxf, temporary_output, version
+        if output_version:
+            require_odafc(self.log)
+            return translated_dxf, temporary_output, output_version
+        if os.path.abspath(translated_dxf) != os.path.abspath(final_output):
+            shutil.copy2(translated_dxf, temporary_output)
+        return None
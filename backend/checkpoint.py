@@ -0,0 +1,76 @@
+"""Per-task translation checkpoints so an interrupted drawing resumes where it stopped."""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import time
+from pathlib import Path
+
+from backend.storage import atomic_write_json, quarantine_corrupt_file
+
+
+CHECKPOINT_DIR = Path.home() / ".cad_translator_checkpoints"
+CHECKPOINT_INTERVAL_SECONDS = 5.0
+
+
+def checkpoint_path(task_id: str) -> Path:
+    return CHECKPOINT_DIR / f"{task_id}.json"
+
+
+def discard_checkpoint(task_id: str) -> None:
+    checkpoint_path(task_id).unlink(missing_ok=True)
+    for extra in CHECKPOINT_DIR.glob(f"{task_id}-*.json"):  # extra fan-out modes of the task
+        extra.unlink(missing_ok=True)
+
+
+def plan_fingerprint(settings: dict, item_keys: list[str]) -> str:
+    """Identify the extraction plan: translation settings plus the ordered item keys."""
+    payload = json.dumps({"settings": settings, "items": item_keys}, ensure_ascii=False, sort_keys=True)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class TranslationCheckpoint:
+    """Resolved translations by ``handle:field`` for one source file and plan.
+
+    A checkpoint written for another source revision or extraction plan is
+    ignored and replaced.  Writes are throttled; call ``flush`` when the
+    translate stage stops for any reason.
+    """
+
+    def __init__(self, path: str | Path, source: str, plan: str):
+        self.path = Path(path)
+        self.source, self.plan = source, plan
+        self.resolved: dict[str, str] = {}
+        self._dirty = False
+        self._written_at = time.monotonic()
+        try:
+            saved = json.loads(self.path.read_text(encoding="utf-8"))
+        except FileNotFoundError:
+            return
+        except (OSError, ValueError):
+            quarantine_corrupt_file(self.path)
+            return
+        if isinstance(saved, dict) and saved.get("source") == source and saved.get("plan") == plan:
+            self.resolved = dict(saved.get("resolved") or {})
+
+    def get(self, key: str) -> str | None:
+        return self.resolved.get(key)
+
+    def add(self, key: str, translated: str) -> None:
+        self.resolved[key] = translated
+        self._dirty = True
+        if time.monotonic() - self._written_at >= CHECKPOINT_INTERVAL_SECONDS:
+            self.flush()
+
+    def flush(self) -> None:
+        if not self._dirty:
+            return
+        atomic_write_json(self.path, {"source": self.source, "plan": self.plan, "resolved": self.resolved})
+        self._dirty = False
+        self._written_at = time.monotonic()
+
+    def discard(self) -> None:
+        self.path.unlink(missing_ok=True)
+        self.resolved.clear()
+        self._dirty = False
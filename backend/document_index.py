@@ -0,0 +1,61 @@
+"""Lookups over one loaded drawing, built once so write-back never rescans layouts."""
+
+from __future__ import annotations
+
+
+class DocumentIndex:
+    """ATTRIB instances by tag, extracted entities by handle and ACAD_TABLE
+    ``AcDbTable`` subclasses by entity.
+
+    ``doc`` may be ``None`` (entities collected outside a document); the tag
+    index is then empty and the other maps fill in as entities are seen.
+    """
+
+    def __init__(self, doc=None):
+        self.doc = doc
+        self.attribs_by_tag: dict[str, list] = {}
+        self.entities: dict[str, object] = {}
+        self._table_tags: dict[str, object] = {}
+        if doc is None:
+            return
+        layouts, layout_names = [doc.modelspace()], {doc.modelspace().name}
+        for layout in doc.layouts:
+            if layout.name not in layout_names:
+                layouts.append(layout)
+                layout_names.add(layout.name)
+        for layout in layouts:
+            for insert in layout.query('INSERT'):
+                for attrib in getattr(insert, 'attribs', []) or []:
+                    self.attribs_by_tag.setdefault(getattr(attrib.dxf, 'tag', ''), []).append(attrib)
+
+    def add_entity(self, entity) -> None:
+        handle = getattr(entity.dxf, 'handle', None)
+        if handle:
+            self.entities[handle] = entity
+
+    def table_tags(self, entity):
+        """The ``AcDbTable`` subclass tags of an ACAD_TABLE; raises like ``get_subclass``."""
+        handle = getattr(getattr(entity, 'dxf', None), 'handle', None)
+        tags = self._table_tags.get(handle) if handle else None
+        if tags is None:
+            tags = entity.xtags.get_subclass("AcDbTable")
+            if handle:
+                self._table_tags[handle] = tags
+        return tags
+
+    def set_attrib_tag(self, attrib, new_tag: str) -> None:
+        old_tag = getattr(attrib.dxf, 'tag', '')
+        attrib.dxf.tag = new_tag
+        instances = self.attribs_by_tag.get(old_tag)
+        if instances and attrib in instances:
+            instances.remove(attrib)
+            self.attribs_by_tag.setdefault(new_tag, []).append(attrib)
+
+    def rename_attrib_tags(self, old_tag: str, new_tag: str) -> int:
+        """Retag every ATTRIB instance carrying ``old_tag``; returns how many changed."""
+        instances = self.attribs_by_tag.pop(old_tag, [])
+        for attrib in instances:
+            attrib.dxf.tag = new_tag
+        if instances:
+            self.attribs_by_tag.setdefault(new_tag, []).extend(instances)
+        return len(instances)
@@ -0,0 +1,149 @@
+"""Tag-level DXF rewrite: copy a drawing tag by tag and patch planned text values.
+
+Every tag that is not in the translation plan is copied byte for byte, so
+geometry stays identical and memory use does not depend on the drawing size.
+ASCII and R13+ binary DXF are both patched in their own format.  Callers fall
+back to the ezdxf load/save path for anything this cannot patch (R12 binary
+DXF, version changes, MULTILEADER content, entities without handles).
+"""
+
+from __future__ import annotations
+
+import mmap
+import struct
+import threading
+from contextlib import ExitStack
+from pathlib import Path
+from typing import BinaryIO, Iterator, Optional
+
+import ezdxf  # noqa: F401  (registers the "dxfreplace" codec error handler)
+from ezdxf.lldxf.encoding import decode_dxf_unicode, has_dxf_unicode
+from ezdxf.lldxf.validator import is_binary_dxf_file
+
+from backend.dxf_scan import BINARY_DXF_SENTINEL, DXFScanUnsupported, binary_dxf_params, binary_dxf_tags, dxf_encoding
+
+
+MTEXT_CHUNK_SIZE = 250
+STREAMABLE_FIELDS = {
+    "TEXT": {"text"},
+    "ATTRIB": {"text", "tag"},
+    "ATTDEF": {"text", "tag", "prompt"},
+    "DIMENSION": {"text"},
+    "MTEXT": {"text"},
+}
+# Codes whose value the rewrite state machine reads; every other value is copied without decoding.
+_DECODED_CODES = {0, 1, 2, 3, 5, 100, 102, 302}
+
+
+def can_stream_field(dxftype: str, field: str) -> bool:
+    return field in STREAMABLE_FIELDS.get(dxftype, ()) or (dxftype == "ACAD_TABLE" and field.startswith("table:"))
+
+
+def _ascii_tags(src: BinaryIO, encoding: str) -> Iterator[tuple[int, str, bytes]]:
+    while True:
+        code_line = src.readline()
+        if not code_line:
+            return
+        value_line = src.readline()
+        code = int(code_line)
+        yield code, value_line.rstrip(b"\r\n").decode(encoding, errors="replace") if code in _DECODED_CODES else "", code_line + value_line
+
+
+def _binary_tags(data, encoding: str) -> Iterator[tuple[int, str, bytes]]:
+    for code, value, start, end in binary_dxf_tags(data, encoding, _DECODED_CODES):
+        yield code, value, data[start:end]
+
+
+def rewrite_dxf_text(source: str | Path, target: str | Path, plan: dict[str, dict[str, str]], tag_renames: Optional[dict[str, str]] = None, cancel_event: Optional[threading.Event] = None) -> int:
+    """Write ``source`` to ``target`` with ``plan[handle][field]`` values applied.
+
+    ``tag_renames`` maps old ATTDEF tags to new ones for every ATTRIB of a
+    layout INSERT (the ENTITIES section and ``*Paper_Space`` blocks) that is
+    not itself in the plan; ATTRIBs inside other block definitions keep their
+    tags, as on the ezdxf path.  Returns the number of replaced values.
+    """
+    binary = is_binary_dxf_file(str(source))
+    tag_renames = tag_renames or {}
+    replaced = 0
+
+    def encode(code: int, value: str) -> bytes:
+        value = value.replace("\r\n", " ").replace("\r", " ").replace("\n", " ")  # a raw newline would break the tag stream
+        if binary:
+            return struct.pack("<H", code) + value.encode(encoding, errors="dxfreplace") + b"\x00"
+        return f"{code:>3}".encode("ascii") + newline + value.encode(encoding, errors="dxfreplace") + newline
+
+    def renamed_tag(value: str) -> Optional[str]:
+        return tag_renames.get((decode_dxf_unicode(value) if has_dxf_unicode(value) else value).strip())
+
+    with open(source, "rb") as src, ExitStack() as stack:
+        newline = b""
+        if binary:
+            data = stack.enter_context(mmap.mmap(src.fileno(), 0, access=mmap.ACCESS_READ))
+            dxfversion, encoding = binary_dxf_params(data)
+            if dxfversion <= "AC1009":
+                raise DXFScanUnsupported("R12 binary DXF cannot be rewritten")
+            tags = _binary_tags(data, encoding)
+        else:
+            encoding = dxf_encoding(source)
+            newline = b"\r\n" if src.readline().endswith(b"\r\n") else b"\n"
+            src.seek(0)
+            tags = _ascii_tags(src, encoding)
+        dst = stack.enter_context(open(target, "wb"))
+        if binary:
+            dst.write(BINARY_DXF_SENTINEL)
+        section, expect_section_name, layout_block = "", False, False
+        dxftype, fields, subclass, subclass_index = "", None, "", 0
+        handle_seen = in_app_data = stopped = mtext_written = False
+        for count, (code, value, raw) in enumerate(tags, 1):
+            if cancel_event is not None and count % 50000 == 0 and cancel_event.is_set():
+                raise InterruptedError("translation cancelled")
+            output = None
+            if code == 0:
+                dxftype = value if section in ("ENTITIES", "BLOCKS") else ""
+                fields, subclass, subclass_index = None, "", 0
+                handle_seen = in_app_data = stopped = mtext_written = False
+                if value == "SECTION":
+                    expect_section_name = True
+                elif value == "ENDSEC":
+                    section = ""
+            elif expect_section_name and code == 2:
+                section, expect_section_name = value, False
+            elif dxftype and not stopped:
+                if code == 102:
+                    in_app_data = value.startswith("{")
+                elif in_app_data:
+                    pass
+                elif code in (101, 1001):
+                    stopped = True
+                elif dxftype == "BLOCK" and code == 2:
+                    layout_block = value.lower().startswith("*paper_space")
+                else:
+                    if code == 100:
+                        subclass, subclass_index = value, 0
+                    subclass_index += 1
+                    if code == 5 and not handle_seen:
+                        handle_seen = True
+                        fields = plan.get(value)
+                    elif fields and dxftype == "MTEXT" and code in (1, 3) and "text" in fields:
+                        if not mtext_written:
+                            content = fields["text"]
+                            chunks = [content[start:start + MTEXT_CHUNK_SIZE] for start in range(0, len(content), MTEXT_CHUNK_SIZE)] or [""]
+                            output = b"".join(encode(3, chunk) for chunk in chunks[:-1]) + encode(1, chunks[-1])
+                            mtext_written = True
+                            replaced += 1
+                        else:
+                            output = b""
+                    elif fields and code == 1 and dxftype in ("TEXT", "ATTRIB", "ATTDEF", "DIMENSION") and "text" in fields:
+                        output = encode(1, fields["text"])
+                    elif fields and code == 2 and dxftype in ("ATTRIB", "ATTDEF") and "tag" in fields:
+                        output = encode(2, fields["tag"])
+                    elif fields and code == 3 and dxftype == "ATTDEF" and "prompt" in fields:
+                        output = encode(3, fields["prompt"])
+                    elif fields and code == 302 and dxftype == "ACAD_TABLE" and subclass == "AcDbTable" and f"table:{subclass_index - 1}" in fields:
+                        output = encode(302, fields[f"table:{subclass_index - 1}"])
+                    elif code == 2 and dxftype == "ATTRIB" and tag_renames and (section == "ENTITIES" or layout_block) and not (fields and "tag" in fields) and renamed_tag(value) is not None:
+                        output = encode(2, renamed_tag(value))
+                    if output and dxftype != "MTEXT":
+                        replaced += 1
+            dst.write(raw if output is None else output)
+    return replaced
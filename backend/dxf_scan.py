@@ -0,0 +1,184 @@
+"""Stream text out of DXF files without building an ezdxf document.
+
+Only the tags of the entity currently being read are kept, so memory use does
+not grow with the drawing; geometry, hatches and proxies are skipped tag by
+tag.  Used where only the strings matter (quota pre-flight, planning).
+"""
+
+from __future__ import annotations
+
+import mmap
+from pathlib import Path
+from typing import Iterator, Optional
+
+from ezdxf.filemanagement import dxf_file_info
+from ezdxf.lldxf.encoding import decode_dxf_unicode, has_dxf_unicode
+from ezdxf.lldxf.tagger import ascii_tags_loader
+from ezdxf.lldxf.types import BINARY_DATA, BYTES, DOUBLE, INT16, INT32, INT64
+from ezdxf.lldxf.validator import is_binary_dxf_file
+from ezdxf.tools.codepage import toencoding
+from ezdxf.tools.text import plain_mtext
+
+
+TEXT_ENTITY_TYPES = {"TEXT", "MTEXT", "ATTRIB", "ATTDEF", "MULTILEADER", "MLEADER", "DIMENSION", "ACAD_TABLE"}
+_SCANNED_SECTIONS = {"ENTITIES", "BLOCKS"}
+BINARY_DXF_SENTINEL = b"AutoCAD Binary DXF\r\n\x1a\x00"
+# Byte width of each fixed-size binary value; other codes are length-prefixed chunks or zero-terminated strings.
+_BINARY_WIDTHS = {**dict.fromkeys(INT16, 2), **dict.fromkeys(DOUBLE, 8), **dict.fromkeys(INT32, 4), **dict.fromkeys(INT64, 8), **dict.fromkeys(BYTES, 1)}
+
+
+class DXFScanUnsupported(ValueError):
+    """The file cannot be streamed (e.g. R12 binary DXF); load it with ezdxf instead."""
+
+
+def binary_dxf_params(data) -> tuple[str, str]:
+    """``(dxfversion, encoding)`` from the header of binary DXF ``data``, read like ezdxf's binary loader."""
+
+    def header_value(name: bytes) -> Optional[int]:
+        # Limit the search to the first 1024 bytes, as ezdxf does; a 2-byte group code puts the value one byte later.
+        start = data.find(name, 22, 1024)
+        if start < 0:
+            return None
+        start += len(name) + 2
+        return start if data[start] == 65 else start + 1  # 65 == 'A', the value's first letter
+
+    start = header_value(b"$ACADVER")
+    dxfversion = bytes(data[start:start + 6]).decode() if start is not None else "AC1009"
+    if dxfversion >= "AC1021":
+        return dxfversion, "utf-8"
+    start = header_value(b"$DWGCODEPAGE")
+    if start is None:
+        return dxfversion, "cp1252"
+    return dxfversion, toencoding(bytes(data[start:data.find(b"\x00", start)]).decode())
+
+
+def binary_dxf_tags(data, encoding: str, decoded: Optional[set] = None) -> Iterator[tuple[int, str, int, int]]:
+    """Yield ``(code, value, start, end)`` for each tag of R13+ binary DXF ``data``.
+
+    ``value`` is the decoded string of string tags (only for codes in ``decoded``
+    when given) and ``""`` otherwise; ``data[start:end]`` is the tag's raw bytes.
+    """
+    index, length = len(BINARY_DXF_SENTINEL), len(data)
+    while index < length:
+        start = index
+        code = data[index] | (data[index + 1] << 8)
+        index += 2
+        value = ""
+        if code in BINARY_DATA:
+            index += 1 + data[index]
+        elif code in _BINARY_WIDTHS:
+            index += _BINARY_WIDTHS[code]
+        else:
+            end = data.find(b"\x00", index)
+            if end < 0:
+                raise DXFScanUnsupported("truncated binary DXF")
+            if decoded is None or code in decoded:
+                value = data[index:end].decode(encoding, errors="replace")
+            index = end + 1
+        yield code, value, start, index
+
+
+def dxf_encoding(path: str | Path) -> str:
+    if is_binary_dxf_file(str(path)):
+        with open(path, "rb") as stream:
+            return binary_dxf_params(stream.read(1024))[1]
+    info = dxf_file_info(path)
+    return "utf-8" if info.version >= "AC1021" else info.encoding
+
+
+def _dxf_tags(path: str | Path) -> Iterator[tuple[int, str]]:
+    if not is_binary_dxf_file(str(path)):
+        with open(path, "rt", encoding=dxf_encoding(path), errors="replace") as stream:
+            for tag in ascii_tags_loader(stream):
+                yield tag.code, tag.value
+        return
+    with open(path, "rb") as stream, mmap.mmap(stream.fileno(), 0, access=mmap.ACCESS_READ) as data:
+        dxfversion, encoding = binary_dxf_params(data)
+        if dxfversion <= "AC1009":
+            raise DXFScanUnsupported("R12 binary DXF cannot be streamed")
+        for code, value, _, _ in binary_dxf_tags(data, encoding):
+            yield code, value
+
+
+def _decode(value: str) -> str:
+    return decode_dxf_unicode(value) if has_dxf_unicode(value) else value
+
+
+def _entity_records(dxftype: str, tags: list, block: str) -> Iterator[dict]:
+    handle = layer = owner = ""
+    fields: list[tuple[str, str]] = []
+    mtext_chunks: list[str] = []
+    subclass, subclass_index = "", 0
+    in_app_data = False
+    for code, value in tags:
+        if code == 102:
+            in_app_data = value.startswith("{")
+            continue
+        if in_app_data:
+            continue
+        if code in (101, 1001):
+            break  # embedded MTEXT of attributes and XDATA are not entity fields
+        if code == 100:
+            subclass, subclass_index = value, 0
+        subclass_index += 1
+        if code == 5 and not handle:
+            handle = value
+        elif code == 8:
+            layer = value
+        elif code == 330 and not owner:
+            owner = value
+        elif dxftype == "MTEXT" and code in (1, 3):
+            mtext_chunks.append(value)
+        elif dxftype in ("TEXT", "ATTRIB", "ATTDEF", "DIMENSION") and code == 1:
+            fields.append(("text", value))
+        elif dxftype in ("ATTRIB", "ATTDEF") and code == 2:
+            fields.append(("tag", value))
+        elif dxftype == "ATTDEF" and code == 3:
+            fields.append(("prompt", value))
+        elif dxftype in ("MULTILEADER", "MLEADER") and code == 304:
+            fields.append(("mtext", plain_mtext(_decode(value), split=False)))
+        elif dxftype in ("MULTILEADER", "MLEADER") and code == 302:
+            fields.append(("block", value))
+        elif dxftype == "ACAD_TABLE" and code == 302 and subclass == "AcDbTable":
+            fields.append((f"table:{subclass_index - 1}", value))
+    if mtext_chunks:
+        fields.append(("text", plain_mtext(_decode("".join(mtext_chunks)), split=False)))
+    for field, text in fields:
+        if dxftype == "DIMENSION" and text.strip() in {"", "<>"}:
+            continue
+        yield {"type": dxftype, "handle": handle, "layer": layer or "0", "owner": owner, "block": block, "field": field, "text": _decode(text)}
+
+
+def scan_dxf_text(path: str | Path) -> Iterator[dict]:
+    """Yield text fields from the ENTITIES and BLOCKS sections.
+
+    Text records carry ``type``, ``handle``, ``layer``, ``owner``, ``block``
+    (the enclosing block definition, ``""`` in ENTITIES), ``field`` and
+    ``text``.  ``INSERT`` records carry ``block`` and the referenced ``name``
+    so callers can tell which block definitions are visible.
+    """
+    section, expect_section_name, block = "", False, ""
+    dxftype, tags = "", None
+    for code, value in _dxf_tags(path):
+        if code == 0:
+            if tags is not None:
+                if dxftype == "BLOCK":
+                    block = next((name for tag_code, name in tags if tag_code == 2), "")
+                elif dxftype == "INSERT":
+                    yield {"type": "INSERT", "block": block, "name": next((name for tag_code, name in tags if tag_code == 2), "")}
+                else:
+                    yield from _entity_records(dxftype, tags, block)
+                tags = None
+            if value == "SECTION":
+                expect_section_name = True
+            elif value == "ENDSEC":
+                section, block = "", ""
+            elif value == "ENDBLK":
+                block = ""
+            elif section in _SCANNED_SECTIONS and (value in TEXT_ENTITY_TYPES or value in ("BLOCK", "INSERT")):
+                dxftype, tags = value, []
+            continue
+        if expect_section_name and code == 2:
+            section, expect_section_name = value, False
+        elif tags is not None:
+            tags.append((code, value))
@@ -0,0 +1,150 @@
+"""Per-provider API key pools shared by the batch scheduler and translators."""
+
+from __future__ import annotations
+
+import hashlib
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Iterator, Optional
+
+
+KEY_TASK_LIMIT = 2
+QUOTA_REFRESH_SECONDS = 300
+
+
+class QuotaDeferredError(RuntimeError):
+    """A whole drawing does not fit the remaining monthly quota; try it later."""
+
+    retryable = False
+    deferred = True
+
+
+def key_fingerprint(key: str) -> str:
+    """Stable non-secret identifier for usage rows, logs and API snapshots."""
+    return hashlib.sha256(key.strip().encode("utf-8")).hexdigest()[:12]
+
+
+class KeyPool:
+    """Spread files and individual requests across several keys of one provider.
+
+    Keys are ranked by current load first and remaining monthly quota second;
+    a key reported as exhausted is only used when no other key is left.
+    """
+
+    def __init__(self, provider: str, keys: list[str] | None = None, task_limit: int = KEY_TASK_LIMIT):
+        self.provider = provider
+        self.task_limit = task_limit
+        self._condition = threading.Condition()
+        self._state: dict[str, dict] = {}
+        # None until the first refresh; a changed key list resets it so new keys load their quota.
+        self._refreshed_at: float | None = None
+        self.update_keys(keys or [])
+
+    def update_keys(self, keys: list[str]) -> None:
+        """Replace the configured keys while keeping in-flight counters of retained keys."""
+        cleaned = list(dict.fromkeys(key.strip() for key in keys if key and key.strip()))
+        with self._condition:
+            if list(self._state) != cleaned:
+                self._refreshed_at = None
+            self._state = {key: self._state.get(key) or {"tasks": 0, "requests": 0, "remaining": None, "exhausted": False} for key in cleaned}
+            self._condition.notify_all()
+
+    @property
+    def keys(self) -> list[str]:
+        with self._condition:
+            return list(self._state)
+
+    def __len__(self) -> int:
+        with self._condition:
+            return len(self._state)
+
+    def capacity(self) -> int:
+        with self._condition:
+            return self.task_limit * sum(not state["exhausted"] for state in self._state.values())
+
+    def _rank(self, key: str, load: str, preferred: str = ""):
+        state = self._state[key]
+        remaining = state["remaining"]
+        return (state["exhausted"], state[load], -(remaining if remaining is not None else float("inf")), key != preferred)
+
+    @contextmanager
+    def task_slot(self, preferred: str = "", cancel_event: Optional[threading.Event] = None) -> Iterator[str]:
+        """Lease a key for one file, waiting while every key runs ``task_limit`` files."""
+        with self._condition:
+            while True:
+                if cancel_event and cancel_event.is_set():
+                    raise InterruptedError("translation cancelled")
+                free = [key for key, state in self._state.items() if state["tasks"] < self.task_limit]
+                if free:
+                    key = min(free, key=lambda candidate: self._rank(candidate, "tasks", preferred))
+                    self._state[key]["tasks"] += 1
+                    break
+                if not self._state:
+                    raise RuntimeError(f"{self.provider} 未配置 API Key")
+                self._condition.wait(.1)
+        try:
+            yield key
+        finally:
+            with self._condition:
+                if key in self._state:
+                    self._state[key]["tasks"] -= 1
+                self._condition.notify_all()
+
+    @contextmanager
+    def request_slot(self, preferred: str = "") -> Iterator[str]:
+        """Lease the least-loaded key for one provider request without blocking."""
+        with self._condition:
+            if not self._state:
+                raise RuntimeError(f"{self.provider} 未配置 API Key")
+            key = min(self._state, key=lambda candidate: self._rank(candidate, "requests", preferred))
+            self._state[key]["requests"] += 1
+        try:
+            yield key
+        finally:
+            with self._condition:
+                if key in self._state:
+                    self._state[key]["requests"] -= 1
+
+    def record(self, key: str, characters: int) -> None:
+        with self._condition:
+            state = self._state.get(key)
+            if state and state["remaining"] is not None:
+                state["remaining"] = max(0, state["remaining"] - characters)
+
+    def mark_exhausted(self, key: str) -> bool:
+        """Flag a key whose quota ran out; return True while another key can continue."""
+        with self._condition:
+            if key in self._state:
+                self._state[key].update(exhausted=True, remaining=0)
+            self._condition.notify_all()
+            return any(not state["exhausted"] for state in self._state.values())
+
+    def remaining_total(self) -> int | None:
+        """Remaining characters over all keys, or None while any key's quota is unknown."""
+        with self._condition:
+            values = [state["remaining"] for state in self._state.values()]
+        if not values or any(value is None for value in values):
+            return None
+        return sum(values)
+
+    def refresh_quota(self, remaining_for: Callable[[str], int | None], force: bool = False) -> None:
+        """Reload remaining quota per key, at most once per ``QUOTA_REFRESH_SECONDS``."""
+        with self._condition:
+            if not force and self._refreshed_at is not None and time.monotonic() - self._refreshed_at < QUOTA_REFRESH_SECONDS:
+                return
+            self._refreshed_at = time.monotonic()
+            keys = list(self._state)
+        for key in keys:
+            remaining = remaining_for(key)
+            with self._condition:
+                if key in self._state:
+                    self._state[key]["remaining"] = remaining
+                    self._state[key]["exhausted"] = remaining == 0
+
+    def snapshot(self) -> list[dict]:
+        with self._condition:
+            return [
+                {"key_id": key_fingerprint(key), "tasks": state["tasks"], "requests": state["requests"], "remaining": state["remaining"], "exhausted": state["exhausted"]}
+                for key, state in self._state.items()
+            ]
@@ -14,6 +14,8 @@ from backend.storage import atomic_write_json
 
 DATABASE_PATH = Path.home() / ".cad_translator_language_assets.sqlite3"
 AZURE_F0_MONTHLY_CHARACTER_LIMIT = 2_000_000
+# Host parameters per IN (...) query; older SQLite builds allow 999 in all.
+SQL_BATCH_SIZE = 500
 
 
 def _normalise(text: str) -> str:
@@ -75,9 +77,41 @@ class LanguageAssets:
                     quota_exceeded INTEGER NOT NULL DEFAULT 0,
                     PRIMARY KEY(month, provider)
                 );
+                CREATE TABLE IF NOT EXISTS usage_monthly_keys (
+                    month TEXT NOT NULL,
+                    provider TEXT NOT NULL,
+                    key_id TEXT NOT NULL,
+                    characters INTEGER NOT NULL DEFAULT 0,
+                    requests INTEGER NOT NULL DEFAULT 0,
+                    quota_exceeded INTEGER NOT NULL DEFAULT 0,
+                    PRIMARY KEY(month, provider, key_id)
+                );
+                CREATE TABLE IF NOT EXISTS asset_state (
+                    name TEXT PRIMARY KEY,
+                    value INTEGER NOT NULL DEFAULT 0
+                );
+                CREATE TABLE IF NOT EXISTS block_translations (
+                    mode TEXT NOT NULL,
+                    content_hash TEXT NOT NULL,
+                    basis TEXT NOT NULL,
+                    targets TEXT NOT NULL,
+                    hit_count INTEGER NOT NULL DEFAULT 0,
+                    updated_at TEXT NOT NULL,
+                    PRIMARY KEY(mode, content_hash)
+                );
                 """
             )
 
+    @staticmethod
+    def _bump_revision(connection) -> None:
+        connection.execute("INSERT INTO asset_state(name, value) VALUES('revision', 1) ON CONFLICT(name) DO UPDATE SET value=value+1")
+
+    def revision(self) -> int:
+        """Counter of user edits to global terms and memory; provider results do not bump it."""
+        with self._connect() as connection:
+            row = connection.execute("SELECT value FROM asset_state WHERE name='revision'").fetchone()
+        return int(row["value"]) if row else 0
+
     @staticmethod
     def _now() -> str:
         return datetime.now().isoformat(timespec="seconds")
@@ -148,6 +182,7 @@ class LanguageAssets:
                 "ON CONFLICT(mode, source_norm, layer_contains) DO UPDATE SET source=excluded.source, target=excluded.target, updated_at=excluded.updated_at",
                 (mode, entry["source"], _normalise(source), entry["target"], entry["layer_contains"].casefold(), entry["updated_at"]),
             )
+            self._bump_revision(connection)
 
     def delete_term(self, scope: str, term_id: int, project_path: str = "") -> None:
         if scope == "project":
@@ -158,6 +193,7 @@ class LanguageAssets:
             return
         with self._lock, self._connect() as connection:
             connection.execute("DELETE FROM terms WHERE id=?", (term_id,))
+            self._bump_revision(connection)
 
     def lookup_term(self, source: str, mode: str, layer: str = "", project_path: str = "") -> str | None:
         source_norm, layer_norm = _normalise(source), (layer or "").casefold()
@@ -174,13 +210,14 @@ class LanguageAssets:
                 return str(term["target"])
         return None
 
-    def lookup_memory(self, source: str, mode: str, layer: str = "") -> str | None:
+    def lookup_memory(self, source: str, mode: str, layer: str = "", count_hit: bool = True) -> str | None:
         source_norm, layer_key = _normalise(source), (layer or "").casefold()
         with self._lock, self._connect() as connection:
             row = connection.execute("SELECT id, target FROM translation_memory WHERE mode=? AND source_norm=? AND layer_key IN (?, '') ORDER BY CASE WHEN layer_key='' THEN 1 ELSE 0 END LIMIT 1", (mode, source_norm, layer_key)).fetchone()
             if not row:
                 return None
-            connection.execute("UPDATE translation_memory SET hit_count=hit_count+1, updated_at=? WHERE id=?", (self._now(), row["id"]))
+            if count_hit:
+                connection.execute("UPDATE translation_memory SET hit_count=hit_count+1, updated_at=? WHERE id=?", (self._now(), row["id"]))
             return str(row["target"])
 
     def record_memory(self, source: str, target: str, mode: str, layer: str, provider: str, origin: str = "provider") -> None:
@@ -205,12 +242,45 @@ class LanguageAssets:
             with self._lock, self._connect() as connection:
                 connection.execute("DELETE FROM translation_memory WHERE id=?", (term_id,))
         self.record_memory(source, target, mode, layer, "manual", "manual")
+        with self._lock, self._connect() as connection:
+            self._bump_revision(connection)
 
     def delete_memory(self, term_id: int) -> None:
         with self._lock, self._connect() as connection:
             connection.execute("DELETE FROM translation_memory WHERE id=?", (term_id,))
+            self._bump_revision(connection)
 
-    def record_usage(self, provider: str, characters: int, quota_exceeded: bool = False) -> None:
+    def lookup_blocks(self, content_hashes: list[str], mode: str, basis: str) -> dict[str, list[str]]:
+        """Translated field values of the block definitions found, by content hash; absent or stale ones are left out."""
+        found = {}
+        with self._lock, self._connect() as connection:
+            for start in range(0, len(content_hashes), SQL_BATCH_SIZE):
+                chunk = content_hashes[start:start + SQL_BATCH_SIZE]
+                rows = connection.execute(
+                    f"SELECT content_hash, targets FROM block_translations WHERE mode=? AND basis=? AND content_hash IN ({','.join('?' * len(chunk))})",
+                    (mode, basis, *chunk),
+                )
+                found.update((row["content_hash"], list(json.loads(row["targets"]))) for row in rows)
+            if found:
+                connection.executemany(
+                    "UPDATE block_translations SET hit_count=hit_count+1, updated_at=? WHERE mode=? AND content_hash=?",
+                    [(self._now(), mode, content_hash) for content_hash in found],
+                )
+        return found
+
+    def record_blocks(self, blocks: dict[str, list[str]], mode: str, basis: str) -> None:
+        """Store the translated field values of block definitions, by content hash."""
+        if not blocks:
+            return
+        now = self._now()
+        with self._lock, self._connect() as connection:
+            connection.executemany(
+                "INSERT INTO block_translations(mode, content_hash, basis, targets, updated_at) VALUES(?,?,?,?,?) "
+                "ON CONFLICT(mode, content_hash) DO UPDATE SET basis=excluded.basis, targets=excluded.targets, updated_at=excluded.updated_at",
+                [(mode, content_hash, basis, json.dumps(targets, ensure_ascii=False), now) for content_hash, targets in blocks.items()],
+            )
+
+    def record_usage(self, provider: str, characters: int, quota_exceeded: bool = False, key_id: str = "") -> None:
         if provider not in {"deepl", "azure"}:
             return
         month = datetime.now().strftime("%Y-%m")
@@ -220,6 +290,21 @@ class LanguageAssets:
                 "ON CONFLICT(month, provider) DO UPDATE SET characters=characters+excluded.characters, requests=requests+excluded.requests, quota_exceeded=MAX(quota_exceeded, excluded.quota_exceeded)",
                 (month, provider, max(0, characters), 1, int(quota_exceeded)),
             )
+            if key_id:
+                connection.execute(
+                    "INSERT INTO usage_monthly_keys(month, provider, key_id, characters, requests, quota_exceeded) VALUES(?,?,?,?,?,?) "
+                    "ON CONFLICT(month, provider, key_id) DO UPDATE SET characters=characters+excluded.characters, requests=requests+excluded.requests, quota_exceeded=MAX(quota_exceeded, excluded.quota_exceeded)",
+                    (month, provider, key_id, max(0, characters), 1, int(quota_exceeded)),
+                )
+
+    def key_usage(self, provider: str) -> dict[str, dict]:
+        """This month's locally recorded usage per key fingerprint."""
+        month = datetime.now().strftime("%Y-%m")
+        with self._connect() as connection:
+            return {
+                row["key_id"]: dict(row)
+                for row in connection.execute("SELECT key_id, characters, requests, quota_exceeded FROM usage_monthly_keys WHERE month=? AND provider=?", (month, provider))
+            }
 
     def usage(self) -> dict:
         month = datetime.now().strftime("%Y-%m")
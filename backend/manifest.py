@@ -0,0 +1,71 @@
+"""Per-drawing manifests for incremental re-translation of revised drawings."""
+
+from __future__ import annotations
+
+import hashlib
+import json
+from pathlib import Path
+
+from backend.storage import atomic_write_json, quarantine_corrupt_file
+
+
+MANIFEST_DIR = Path.home() / ".cad_translator_manifests"
+
+
+def manifest_path(source: str, mode: str, include_blocks: bool) -> Path:
+    identity = json.dumps([str(Path(source).resolve()).casefold(), mode, bool(include_blocks)], ensure_ascii=False)
+    return MANIFEST_DIR / f"{hashlib.sha256(identity.encode('utf-8')).hexdigest()[:32]}.json"
+
+
+def text_hash(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()[:16]
+
+
+class DrawingManifest:
+    """Translations applied to the previous revision, by ``handle:field``.
+
+    ``basis`` fingerprints glossaries, project terms and memory edits; when it
+    differs the previous translations are only used to report the diff.
+    """
+
+    def __init__(self, path: str | Path, basis: str):
+        self.path = Path(path)
+        self.basis = basis
+        self.previous: dict[str, dict] = {}
+        self.reusable = False
+        self.entries: dict[str, dict] = {}
+        self.counts = {"added": 0, "changed": 0, "removed": 0, "reused": 0, "refreshed": 0}
+        try:
+            saved = json.loads(self.path.read_text(encoding="utf-8"))
+        except FileNotFoundError:
+            return
+        except (OSError, ValueError):
+            quarantine_corrupt_file(self.path)
+            return
+        if isinstance(saved, dict):
+            self.previous = dict(saved.get("entries") or {})
+            self.reusable = saved.get("basis") == basis
+
+    def resolve(self, key: str, text: str) -> str | None:
+        """Classify one item against the previous revision; return a reusable translation."""
+        previous = self.previous.get(key)
+        if previous is None:
+            self.counts["added"] += 1
+        elif previous.get("h") != text_hash(text):
+            self.counts["changed"] += 1
+        elif self.reusable:
+            self.counts["reused"] += 1
+            self.entries[key] = previous
+            return previous["t"]
+        else:
+            self.counts["refreshed"] += 1
+        return None
+
+    def record(self, key: str, text: str, translated: str) -> None:
+        self.entries[key] = {"h": text_hash(text), "t": translated}
+
+    def summary(self) -> dict:
+        return {**self.counts, "removed": sum(key not in self.entries for key in self.previous)}
+
+    def save(self) -> None:
+        atomic_write_json(self.path, {"basis": self.basis, "entries": self.entries})
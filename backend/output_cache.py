@@ -0,0 +1,106 @@
+"""Content-addressed cache of finished drawings, evicted least-recently-used first."""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import shutil
+import threading
+import time
+from pathlib import Path
+
+from backend.storage import atomic_output_path, atomic_write_json
+
+
+OUTPUT_CACHE_DIR = Path.home() / ".cad_translator_output_cache"
+OUTPUT_CACHE_LIMIT_MB = 2048
+
+
+def cache_key(parts: dict) -> str:
+    return hashlib.sha256(json.dumps(parts, ensure_ascii=False, sort_keys=True).encode("utf-8")).hexdigest()
+
+
+class OutputCache:
+    """Each entry is ``<key><suffix>`` plus a ``<key>.json`` index holding size,
+    mtime and last use.  An entry whose file no longer matches its index (for
+    example a hard-linked output edited in place) is dropped instead of served.
+    """
+
+    def __init__(self, root: str | Path = OUTPUT_CACHE_DIR, limit_bytes: int = OUTPUT_CACHE_LIMIT_MB << 20):
+        self.root = Path(root)
+        self.limit_bytes = limit_bytes
+        self._lock = threading.Lock()
+
+    def _index(self, key: str) -> Path:
+        return self.root / f"{key}.json"
+
+    def lookup(self, key: str, touch: bool = True) -> Path | None:
+        """The cached file of ``key``; ``touch=False`` checks it without recording a use (no index rewrite)."""
+        if self.limit_bytes <= 0:
+            return None
+        with self._lock:
+            try:
+                entry = json.loads(self._index(key).read_text(encoding="utf-8"))
+                path = self.root / entry["name"]
+                stat = path.stat()
+            except (OSError, ValueError, KeyError, TypeError):
+                self._drop(key)
+                return None
+            if (stat.st_size, stat.st_mtime_ns) != (entry.get("size"), entry.get("mtime_ns")):
+                self._drop(key)
+                return None
+            if touch:
+                entry["last_used"] = time.time()
+                atomic_write_json(self._index(key), entry)
+            return path
+
+    def store(self, key: str, source: str | Path, move: bool = False) -> None:
+        """Cache a copy of ``source``; ``move=True`` moves the file in instead of copying it."""
+        if self.limit_bytes <= 0:
+            return
+        source = Path(source)
+        name = f"{key}{source.suffix.lower()}"
+        self.root.mkdir(parents=True, exist_ok=True)
+        with self._lock:
+            with atomic_output_path(self.root / name) as temporary:
+                if move:
+                    shutil.move(source, temporary)
+                else:
+                    shutil.copyfile(source, temporary)
+            stat = (self.root / name).stat()
+            atomic_write_json(self._index(key), {"name": name, "size": stat.st_size, "mtime_ns": stat.st_mtime_ns, "last_used": time.time()})
+            self._evict()
+
+    def publish(self, cached: str | Path, target: str | Path) -> None:
+        """Atomically place a cached file at ``target``: hard link when possible, copy otherwise."""
+        with atomic_output_path(target) as temporary:
+            try:
+                os.link(cached, temporary)
+            except OSError:
+                shutil.copyfile(cached, temporary)
+
+    def _drop(self, key: str) -> None:
+        index = self._index(key)
+        try:
+            name = json.loads(index.read_text(encoding="utf-8")).get("name", "")
+        except (OSError, ValueError, AttributeError):
+            name = ""
+        if name:
+            (self.root / name).unlink(missing_ok=True)
+        index.unlink(missing_ok=True)
+
+    def _evict(self) -> None:
+        entries = []
+        for index in self.root.glob("*.json"):
+            try:
+                entry = json.loads(index.read_text(encoding="utf-8"))
+                entries.append((entry["last_used"], index.stem, entry["size"]))
+            except (OSError, ValueError, KeyError, TypeError):
+                self._drop(index.stem)
+        total = sum(size for _, _, size in entries)
+        for _, key, size in sorted(entries):
+            if total <= self.limit_bytes:
+                break
+            self._drop(key)
+            total -= size
@@ -0,0 +1,112 @@
+"""Stage gates for the batch pipeline.
+
+Each admitted file runs on one queue worker thread, but the work is split
+into stages (ODA conversion, parsing, provider translation, writing) that
+each admit a bounded number of files. A file waiting at a gate is the
+stage's hand-off queue; while one file waits on the provider, the next
+one's conversion and parse proceed in their own stages.
+"""
+
+from __future__ import annotations
+
+import threading
+from collections import Counter
+from contextlib import contextmanager
+from typing import Iterator, Optional
+
+
+STAGES = ("convert", "parse", "translate", "write")
+# ezdxf parsing is pure Python; a second parser would only contend for the GIL.
+STAGE_LIMITS = {"convert": 2, "parse": 1, "translate": 3, "write": 2}
+# Files admitted beyond the translate limit, so the next drawings are converted and parsed ahead.
+PIPELINE_DEPTH = 2
+
+
+class PipelineStages:
+    def __init__(self, limits: Optional[dict] = None):
+        self.limits = {**STAGE_LIMITS, **(limits or {})}
+        self._running = dict.fromkeys(STAGES, 0)
+        self._waiting = dict.fromkeys(STAGES, 0)
+        # Waiters per priority rank; a free slot goes to the best-ranked waiter first.
+        self._ranks = {name: Counter() for name in STAGES}
+        self._condition = threading.Condition()
+
+    def set_limit(self, stage: str, limit: int) -> None:
+        with self._condition:
+            self.limits[stage] = max(1, int(limit))
+            self._condition.notify_all()
+
+    @contextmanager
+    def stage(self, name: str, cancel_event: Optional[threading.Event] = None, rank: int = 0) -> Iterator[None]:
+        """Hold one slot of ``name``, waiting in its hand-off queue while the stage is full.
+
+        Lower ``rank`` is served first, so an interactive file overtakes batch files waiting at the same gate.
+        """
+        ranks = self._ranks[name]
+        with self._condition:
+            self._waiting[name] += 1
+            ranks[rank] += 1
+            try:
+                while self._running[name] >= self.limits[name] or any(count for other, count in ranks.items() if other < rank):
+                    if cancel_event and cancel_event.is_set():
+                        raise InterruptedError("translation cancelled")
+                    self._condition.wait(.1)
+            finally:
+                self._waiting[name] -= 1
+                ranks[rank] -= 1
+                self._condition.notify_all()
+            self._running[name] += 1
+        try:
+            yield
+        finally:
+            with self._condition:
+                self._running[name] -= 1
+                self._condition.notify_all()
+
+    def snapshot(self) -> dict:
+        with self._condition:
+            return {name: {"running": self._running[name], "waiting": self._waiting[name], "limit": self.limits[name]} for name in STAGES}
+
+
+class SlotLimiter:
+    """At most ``limit`` concurrent holders per name (an API key, a provider); limits change at runtime.
+
+    ``default`` applies to names without their own limit; ``None`` means unbounded.
+    """
+
+    def __init__(self, default: Optional[int] = None):
+        self.default = default
+        self.limits: dict[str, int] = {}
+        self._held: Counter = Counter()
+        self._condition = threading.Condition()
+
+    def set_limit(self, name: Optional[str], limit: Optional[int]) -> None:
+        """Set the limit of ``name``, or the default when ``name`` is None; ``None`` removes the limit."""
+        with self._condition:
+            if name is None:
+                self.default = limit
+            elif limit is None:
+                self.limits.pop(name, None)
+            else:
+                self.limits[name] = max(1, int(limit))
+            self._condition.notify_all()
+
+    def limit(self, name: str) -> Optional[int]:
+        return self.limits.get(name, self.default)
+
+    @contextmanager
+    def slot(self, name: str, cancel_event: Optional[threading.Event] = None) -> Iterator[None]:
+        with self._condition:
+            while (limit := self.limit(name)) is not None and self._held[name] >= limit:
+                if cancel_event and cancel_event.is_set():
+                    raise InterruptedError("translation cancelled")
+                self._condition.wait(.1)
+            self._held[name] += 1
+        try:
+            yield
+        finally:
+            with self._condition:
+                self._held[name] -= 1
+                if not self._held[name]:
+                    del self._held[name]
+                self._condition.notify_all()
@@ -5,8 +5,12 @@ import urllib.error
 import urllib.parse
 import urllib.request
 
+from backend.providers.endpoints import AZURE_ENDPOINT, azure_endpoint
+
+# AZURE_ENDPOINT moved to backend.providers.endpoints; it stays importable from here.
+__all__ = ["AZURE_ENDPOINT", "AZURE_LANGUAGE_CODES", "AzureFreeQuotaExceededError", "AzureTranslator", "AzureTranslatorError"]
+
 
-AZURE_ENDPOINT = "https://api.cognitive.microsofttranslator.com/translate"
 AZURE_LANGUAGE_CODES = {"zh-cn": "zh-Hans", "en": "en", "en-us": "en", "fr": "fr"}
 
 
@@ -31,7 +35,7 @@ class AzureTranslator:
         if self.region:
             headers["Ocp-Apim-Subscription-Region"] = self.region
         request = urllib.request.Request(
-            f"{AZURE_ENDPOINT}?{query}",
+            f"{azure_endpoint()}?{query}",
             data=json.dumps([{"Text": text}], ensure_ascii=False).encode("utf-8"),
             headers=headers,
             method="POST",
@@ -48,7 +52,11 @@ class AzureTranslator:
             if str(code) == "403001":
                 raise AzureFreeQuotaExceededError("Azure Translator F0 免费额度已用尽，请等待下月额度重置或升级 Azure 资源。") from exc
             error = AzureTranslatorError(f"Azure Translator 请求失败 ({code}): {message}")
-            error.retryable = exc.code not in {400, 401, 403}
+            error.retryable = exc.code == 429 or exc.code >= 500
             raise error from exc
-        except (OSError, KeyError, IndexError, TypeError, json.JSONDecodeError) as exc:
+        except OSError as exc:
             raise AzureTranslatorError(f"Azure Translator 请求失败: {exc}") from exc
+        except (KeyError, IndexError, TypeError, ValueError) as exc:
+            error = AzureTranslatorError(f"Azure Translator 返回无法解析: {exc}")
+            error.retryable = False
+            raise error from exc
@@ -0,0 +1,25 @@
+"""Provider endpoint overrides, e.g. for the offline stand-in in ``tools/mock_provider_server.py``."""
+
+import os
+from typing import Optional
+
+
+DEEPL_SERVER_ENV = "CAD_DEEPL_SERVER_URL"
+AZURE_ENDPOINT_ENV = "CAD_AZURE_ENDPOINT"
+AZURE_ENDPOINT = "https://api.cognitive.microsofttranslator.com/translate"
+
+
+def deepl_server_url() -> Optional[str]:
+    """Base URL passed to ``deepl.Translator``; None keeps the library's free/pro choice."""
+    return os.environ.get(DEEPL_SERVER_ENV, "").strip().rstrip("/") or None
+
+
+def deepl_usage_endpoint(key: str) -> str:
+    server = deepl_server_url()
+    if server:
+        return f"{server}/v2/usage"
+    return "https://api-free.deepl.com/v2/usage" if key.strip().endswith(":fx") else "https://api.deepl.com/v2/usage"
+
+
+def azure_endpoint() -> str:
+    return os.environ.get(AZURE_ENDPOINT_ENV, "").strip() or AZURE_ENDPOINT
@@ -0,0 +1,93 @@
+"""Record provider traffic and replay it offline for reproducible benchmarks.
+
+``CAD_PROVIDER_JOURNAL=record:PATH`` appends one JSON line per DeepL/Azure
+request; ``replay:PATH`` answers from that file with the recorded latency and
+``replay-fast:PATH`` answers immediately.  Lines use short keys: ``p``
+provider, ``m`` language pair, ``t`` source text, ``r`` result, ``ms``
+latency and ``e`` error.  API keys are never written.
+"""
+
+import json
+import threading
+import time
+from collections import defaultdict, deque
+from pathlib import Path
+from typing import Optional
+
+
+JOURNAL_ENV = "CAD_PROVIDER_JOURNAL"
+_write_lock = threading.Lock()
+
+
+class ReplayMissError(RuntimeError):
+    """The journal has no answer for a request; re-record against the provider."""
+
+    retryable = False
+
+
+class ReplayedProviderError(RuntimeError):
+    """A provider failure reproduced from the journal."""
+
+    retryable = True
+
+
+class JournalRecorder:
+    def __init__(self, path):
+        self.path = Path(path)
+
+    def record(self, provider: str, mode: str, text: str, result: Optional[str] = None, seconds: float = 0.0, error: Optional[BaseException] = None) -> None:
+        entry = {"p": provider, "m": mode, "t": text, "ms": round(seconds * 1000, 1)}
+        if error is None:
+            entry["r"] = result
+        else:
+            entry["e"] = f"{type(error).__name__}: {error}"
+        line = json.dumps(entry, ensure_ascii=False, separators=(",", ":")) + "\n"
+        with _write_lock:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            with self.path.open("a", encoding="utf-8") as handle:
+                handle.write(line)
+
+
+class JournalReplay:
+    """Answer ``(mode, text)`` requests in recorded order.
+
+    The last answer for a request is kept once its recorded sequence is used
+    up, so a benchmark can run the same drawings more than once.
+    """
+
+    def __init__(self, path, realtime: bool = True):
+        self.path = Path(path)
+        self.realtime = realtime
+        self._lock = threading.Lock()
+        self._entries: dict[tuple[str, str], deque] = defaultdict(deque)
+        self.requests = 0
+        with self.path.open(encoding="utf-8") as handle:
+            for line in handle:
+                if line.strip():
+                    entry = json.loads(line)
+                    self._entries[(entry["m"], entry["t"])].append(entry)
+
+    def translate(self, mode: str, text: str) -> str:
+        with self._lock:
+            self.requests += 1
+            entries = self._entries.get((mode, text))
+            if not entries:
+                raise ReplayMissError(f"回放日志中没有该请求 ({mode}): \"{text}\"")
+            entry = entries.popleft() if len(entries) > 1 else entries[0]
+        if self.realtime and entry.get("ms"):
+            time.sleep(entry["ms"] / 1000)
+        if "e" in entry:
+            raise ReplayedProviderError(entry["e"])
+        return entry["r"]
+
+
+def journal_from_env(value: str) -> tuple[Optional[JournalRecorder], Optional[JournalReplay]]:
+    """Parse the ``CAD_PROVIDER_JOURNAL`` value into ``(recorder, replay)``."""
+    action, _, path = (value or "").strip().partition(":")
+    if not path:
+        return None, None
+    if action == "record":
+        return JournalRecorder(path), None
+    if action in ("replay", "replay-fast"):
+        return None, JournalReplay(path, realtime=action == "replay")
+    raise ValueError(f"{JOURNAL_ENV} 应为 record:PATH、replay:PATH 或 replay-fast:PATH")
@@ -1,28 +1,73 @@
-"""Persistent, bounded batch scheduler for CAD translations."""
+"""Persistent, bounded batch scheduler for CAD translations.
+
+A fixed pool of worker threads takes files from per-priority ready queues.
+Within a priority, files are ordered by estimated cost (longest or shortest
+first) with an aging guard, so one huge drawing queued last does not run
+alone at the end.  Files waiting out a retry backoff sit in a timer heap
+instead of holding a worker, and the global, per-key and per-provider limits
+can be changed while the queue runs.
+"""
 
 from __future__ import annotations
 
+import heapq
 import json
 import os
 import threading
+import time
 import uuid
+from collections import deque
+from contextlib import contextmanager
 from pathlib import Path
 from typing import Callable
 
+from backend.checkpoint import discard_checkpoint
+from backend.key_pool import KEY_TASK_LIMIT, KeyPool
+from backend.pipeline import PIPELINE_DEPTH, PipelineStages, SlotLimiter
 from backend.storage import atomic_write_json, quarantine_corrupt_file
+from backend.task_cost import file_size, task_cost
 
 
 STATE_PATH = Path.home() / ".cad_translator_queue.json"
 ACTIVE = {"queued", "retrying", "running"}
 MAX_TASK_HISTORY = 100
+MAX_RUNNING = 3
+# Served in this order; an interactive file overtakes every queued batch file.
+PRIORITIES = ("interactive", "normal", "background")
+# ``0`` means automatic: ``max_running`` follows the key pools' capacity (at least MAX_RUNNING)
+# and the worker pool admits PIPELINE_DEPTH files beyond it.
+QUEUE_LIMITS = {"workers": 0, "max_running": 0, "per_key": KEY_TASK_LIMIT, "per_provider": {}}
+# ``lpt`` (longest first) minimises the batch makespan, ``spt`` (shortest first) the average wait.
+SCHEDULING_POLICIES = ("lpt", "spt", "fifo")
+# Aging guard: the oldest queued file starts at the latest after ``fairness`` later files overtook it
+# while it waited at the head of the arrival order; 0 disables it.
+QUEUE_POLICY = {"policy": "lpt", "fairness": 8}
 
 
 class BatchQueue:
-    def __init__(self, run: Callable[[dict, Callable[[str], None], threading.Event, threading.Event], str], emit: Callable[[str], None], key_for: Callable[[dict], str]):
-        self.run, self.emit, self.key_for = run, emit, key_for
+    def __init__(self, run: Callable[[dict, Callable[[str], None], threading.Event, threading.Event], str], emit: Callable[[str], None], key_for: Callable[[dict], str], pool_for: Callable[[dict], KeyPool | None] | None = None):
+        self.run, self.emit, self.key_for, self.pool_for = run, emit, key_for, pool_for
+        # Raised through ``set_limits(capacity=...)`` when the key pools can keep more files busy.
+        self.max_running = MAX_RUNNING
+        self.limits = {**QUEUE_LIMITS, "per_provider": {}}
+        self.stages = PipelineStages()
+        self.key_slots = SlotLimiter(KEY_TASK_LIMIT)
+        self.provider_slots = SlotLimiter()
         self.lock = threading.RLock()
-        self.oda_lock = threading.Lock()
-        self.key_locks: dict[str, threading.BoundedSemaphore] = {}
+        self._wakeup = threading.Condition(self.lock)
+        self.policy = dict(QUEUE_POLICY)
+        # Per priority: a heap in policy order and a deque in arrival order for the aging guard.
+        self._ready: dict[str, list] = {priority: [] for priority in PRIORITIES}
+        self._arrivals: dict[str, deque] = {priority: deque() for priority in PRIORITIES}
+        # task id -> (priority, heap token, arrival token) of its live entries
+        self._enqueued: dict[str, tuple[str, int, int]] = {}
+        # Per priority: [arrival token of the oldest queued file, later files dispatched ahead of it].
+        self._overtaken: dict[str, list[int]] = {priority: [0, 0] for priority in PRIORITIES}
+        self._tokens = 0
+        self._throughput = {"since": 0.0, "cost": 0.0}
+        self._delayed: list[tuple[float, str]] = []  # (due, task id) of retry backoffs
+        self._running: set[str] = set()
+        self._workers = 0
         self.tasks: list[dict] = self._load()
         self.paused = False
         self.started = False
@@ -31,6 +76,29 @@ class BatchQueue:
         self.resume_event.set()
         self.cancel_event = threading.Event()
 
+    @property
+    def tasks(self) -> list[dict]:
+        return self._tasks
+
+    @tasks.setter
+    def tasks(self, tasks: list[dict]) -> None:
+        with self.lock:
+            self._tasks = tasks
+            self._index = {task["id"]: task for task in tasks}
+            self._clear_ready()
+            for task in tasks:
+                if task["status"] in {"queued", "retrying"}:
+                    self._enqueue(task)
+
+    @property
+    def running_limit(self) -> int:
+        return self.limits["max_running"] or self.max_running
+
+    @property
+    def worker_count(self) -> int:
+        # Files beyond the translate limit wait in the convert/parse hand-off queues.
+        return self.limits["workers"] or self.running_limit + PIPELINE_DEPTH
+
     def _load(self) -> list[dict]:
         try:
             tasks = json.loads(STATE_PATH.read_text(encoding="utf-8")).get("tasks", [])
@@ -53,37 +121,138 @@ class BatchQueue:
         finished = [task for task in self.tasks if task["status"] not in ACTIVE]
         if len(finished) > MAX_TASK_HISTORY:
             keep = {task["id"] for task in finished[-MAX_TASK_HISTORY:]}
+            for task in finished[:-MAX_TASK_HISTORY]:
+                discard_checkpoint(task["id"])
+                self._index.pop(task["id"], None)
             self.tasks[:] = [task for task in self.tasks if task["status"] in ACTIVE or task["id"] in keep]
 
     def snapshot(self):
         with self.lock:
             total = len(self.tasks)
-            done = sum(t["status"] in {"succeeded", "failed"} for t in self.tasks)
+            done = sum(t["status"] in {"succeeded", "failed", "deferred"} for t in self.tasks)
             tasks = [{k: v for k, v in task.items() if not k.startswith("_")} for task in self.tasks]
-            return {"tasks": tasks, "paused": self.paused, "started": self.started, "resumable": self.resumable, "progress": round(done * 100 / total) if total else 0}
+            return {
+                "tasks": tasks, "paused": self.paused, "started": self.started, "resumable": self.resumable,
+                "progress": round(done * 100 / total) if total else 0, "stages": self.stages.snapshot(),
+                "workers": {"size": self.worker_count, "busy": len(self._running)}, "limits": self.limits_snapshot(),
+                "policy": dict(self.policy), "eta_seconds": self._eta(),
+            }
+
+    def _eta(self) -> float | None:
+        """Seconds until the batch is done: remaining estimated cost over measured throughput.
 
-    def add(self, files: list[str]):
+        Before any file finished, costs are spread over the translate slots; a single long
+        file bounds the ETA from below either way.
+        """
+        remaining = [task_cost(task) * (1 - task.get("progress", 0) / 100) for task in self.tasks if task["status"] in ACTIVE]
+        if not remaining:
+            return None
+        if self._throughput["cost"]:
+            rate = (time.monotonic() - self._throughput["since"]) / self._throughput["cost"]
+            total = sum(remaining) * rate
+        else:
+            total = sum(remaining) / min(self.running_limit, len(remaining))
+        return round(max(total, max(remaining)))
+
+    def set_policy(self, policy: str | None = None, fairness: int | None = None) -> dict:
+        """Switch the ordering policy or aging guard of the running queue; queued files are reordered."""
+        if policy is not None and policy not in SCHEDULING_POLICIES:
+            raise ValueError(f"未知调度策略: {policy}")
+        if fairness is not None and fairness < 0:
+            raise ValueError("公平性阈值不能为负数")
+        with self.lock:
+            self.policy.update({name: value for name, value in {"policy": policy, "fairness": fairness}.items() if value is not None})
+            for task_id in list(self._enqueued):
+                self._enqueue(self._index[task_id], refresh=True)
+        return dict(self.policy)
+
+    def refresh_cost(self, task_id: str) -> None:
+        """Re-rank a queued file after its text scan produced an estimate."""
+        with self.lock:
+            task = self._task(task_id)
+            if task and task_id in self._enqueued:
+                self._enqueue(task, refresh=True)
+
+    def limits_snapshot(self) -> dict:
+        with self.lock:
+            return {**self.limits, "per_provider": dict(self.limits["per_provider"]), "effective": {"workers": self.worker_count, "max_running": self.running_limit}}
+
+    def set_limits(self, workers: int | None = None, max_running: int | None = None, per_key: int | None = None, per_provider: dict[str, int] | None = None, capacity: int | None = None) -> dict:
+        """Change concurrency limits of the running queue; ``0`` restores an automatic limit.
+
+        ``capacity`` is how many files the key pools can translate at once; the automatic
+        ``max_running`` follows it, never below MAX_RUNNING.
+        """
+        values = {"workers": workers, "max_running": max_running}
+        if any(value is not None and value < 0 for value in values.values()) or (per_key is not None and per_key < 1):
+            raise ValueError("并发上限必须为正整数（0 表示自动）")
+        if per_provider and any(limit < 0 for limit in per_provider.values()):
+            raise ValueError("并发上限必须为正整数（0 表示自动）")
+        with self.lock:
+            if capacity is not None:
+                self.max_running = max(MAX_RUNNING, int(capacity))
+            self.limits.update({name: int(value) for name, value in values.items() if value is not None})
+            if per_key is not None:
+                self.limits["per_key"] = int(per_key)
+                self.key_slots.set_limit(None, self.limits["per_key"])
+            for provider, limit in (per_provider or {}).items():
+                if limit:
+                    self.limits["per_provider"][provider] = int(limit)
+                else:
+                    self.limits["per_provider"].pop(provider, None)
+                self.provider_slots.set_limit(provider, limit or None)
+        self._schedule()
+        return self.limits_snapshot()
+
+    def add(self, files: list[str], priority: str = "normal"):
+        if priority not in PRIORITIES:
+            raise ValueError(f"未知优先级: {priority}")
         with self.lock:
             for path in files:
-                self.tasks.append({
-                    "id": uuid.uuid4().hex, "input_file": path,
+                task = {
+                    "id": uuid.uuid4().hex, "input_file": path, "priority": priority, "size": file_size(path),
                     "status": "queued", "progress": 0, "retries": 0, "output_file": "", "message": "等待中", "logs": [],
-                })
+                }
+                self.tasks.append(task)
+                self._index[task["id"]] = task
+                self._enqueue(task)
             self._save()
+        self._schedule()
+        return self.snapshot()
+
+    def set_priority(self, task_id: str, priority: str):
+        if priority not in PRIORITIES:
+            raise ValueError(f"未知优先级: {priority}")
+        with self.lock:
+            task = self._task(task_id)
+            if task:
+                task["priority"] = priority
+                if task["status"] == "queued":
+                    self._enqueue(task)
+                self._save()
+        self._schedule()
         return self.snapshot()
 
     def remove(self, task_id: str):
         with self.lock:
-            self.tasks = [t for t in self.tasks if not (t["id"] == task_id and t["status"] != "running")]
+            task = self._task(task_id)
+            if task and task["status"] != "running":
+                self.tasks.remove(task)
+                self._index.pop(task_id, None)
+                self._enqueued.pop(task_id, None)
+                discard_checkpoint(task_id)
             self._save()
         return self.snapshot()
 
     def retry(self, task_id: str):
         with self.lock:
             task = self._task(task_id)
-            if task and task["status"] in {"failed", "succeeded", "cancelled"}:
+            if task and task["status"] in {"failed", "succeeded", "cancelled", "deferred"}:
                 task.pop("_output_path", None)
+                task.pop("_output_paths", None)
+                task.pop("estimate", None)
                 task.update(status="queued", progress=0, message="等待重翻", output_file="")
+                self._enqueue(task)
                 if self.cancel_event.is_set():
                     self.cancel_event = threading.Event()
                 self.started = True
@@ -113,15 +282,24 @@ class BatchQueue:
                 self.cancel_event = threading.Event()
             if settings:
                 for task in self.tasks:
-                    if task["status"] in {"queued", "retrying", "cancelled", "failed"}:
+                    if task["status"] in {"queued", "retrying", "cancelled", "failed", "deferred"}:
                         task.update(
                             output_dir=settings["output_dir"], output_format=settings["output_format"],
                             output_version=settings["output_version"], translation_mode=settings["translation_mode"],
-                            translate_blocks=settings["translate_blocks"], provider=settings.get("provider", "deepl"),
-                            azure_region=settings.get("azure_region", ""), status="queued", progress=0,
+                            translation_modes=settings.get("translation_modes") or [],
+                            translate_blocks=settings["translate_blocks"], incremental_translation=settings.get("incremental", True),
+                            provider=settings.get("provider", "deepl"), azure_region=settings.get("azure_region", ""), status="queued", progress=0,
                             retries=0, output_file="", message="等待中", logs=[], _key=settings.get("api_key") or settings.get("deepl_key", ""),
                         )
                         task.pop("_output_path", None)
+                        task.pop("_output_paths", None)
+                        task.pop("outputs", None)
+                        task.pop("estimate", None)
+                        task.pop("incremental", None)
+                        task.pop("timings", None)
+                        self._enqueue(task)
+            if not self.started or settings:
+                self._throughput = {"since": time.monotonic(), "cost": 0.0}
             self.started = True
             self.paused = False
             self.resumable = False
@@ -152,6 +330,7 @@ class BatchQueue:
             for task in self.tasks:
                 if task["status"] in ACTIVE:
                     task.update(status="cancelled", message="已停止")
+            self._clear_ready()
             self._save()
         return self.snapshot()
 
@@ -159,32 +338,124 @@ class BatchQueue:
         with self.lock:
             if self.started or any(task["status"] == "running" for task in self.tasks):
                 raise RuntimeError("请先停止队列")
-            self.tasks.clear()
+            for task in self.tasks:
+                discard_checkpoint(task["id"])
+            self.tasks = []
             self.resumable = False
             self._save()
         return self.snapshot()
 
     def _task(self, task_id: str):
-        return next((t for t in self.tasks if t["id"] == task_id), None)
+        return self._index.get(task_id)
+
+    def _clear_ready(self) -> None:
+        for priority in PRIORITIES:
+            self._ready[priority].clear()
+            self._arrivals[priority].clear()
+        self._enqueued.clear()
+        self._delayed.clear()
+
+    def _enqueue(self, task: dict, refresh: bool = False) -> None:
+        """Put ``task`` on its priority's ready queue; an older entry of the task becomes stale.
+
+        ``refresh`` re-ranks a queued task (new cost or policy) while keeping its arrival order.
+        """
+        priority = task.get("priority") if task.get("priority") in PRIORITIES else "normal"
+        current = self._enqueued.get(task["id"])
+        if task["id"] in self._running or (current and current[0] == priority and not refresh):
+            return  # a running task is re-queued by its worker when it finishes
+        task.setdefault("size", file_size(task.get("input_file", "")))
+        task["cost"] = task_cost(task)
+        self._tokens += 1
+        if current and current[0] == priority:
+            arrival = current[2]
+        else:
+            arrival = self._tokens
+            self._arrivals[priority].append((arrival, task["id"]))
+        self._enqueued[task["id"]] = (priority, self._tokens, arrival)
+        order = {"lpt": -task["cost"], "spt": task["cost"]}.get(self.policy["policy"], 0)
+        heapq.heappush(self._ready[priority], (order, arrival, self._tokens, task["id"]))
+
+    def _live(self, task_id: str, priority: str) -> bool:
+        entry = self._enqueued.get(task_id)
+        if not entry or entry[0] != priority:
+            return False
+        task = self._index.get(task_id)
+        if task and task["status"] in {"queued", "retrying"}:
+            return True
+        del self._enqueued[task_id]
+        return False
+
+    def _next_ready(self) -> dict | None:
+        """Pop the next task, best priority first: in policy order, or the oldest once it aged out."""
+        for priority in PRIORITIES:
+            arrivals, ready = self._arrivals[priority], self._ready[priority]
+            while arrivals and not (self._live(arrivals[0][1], priority) and self._enqueued[arrivals[0][1]][2] == arrivals[0][0]):
+                arrivals.popleft()
+            if not arrivals:
+                ready.clear()  # every heap entry of this priority is stale
+                continue
+            oldest = arrivals[0][1]
+            overtaken = self._overtaken[priority]
+            if overtaken[0] != arrivals[0][0]:
+                overtaken[:] = [arrivals[0][0], 0]  # a new file reached the head of the arrival order
+            fairness = self.policy["fairness"]
+            if fairness and overtaken[1] >= fairness:
+                task_id = oldest
+            else:
+                while True:
+                    _, _, token, task_id = heapq.heappop(ready)
+                    if self._live(task_id, priority) and self._enqueued[task_id][1] == token:
+                        break
+                if task_id != oldest:
+                    overtaken[1] += 1
+            del self._enqueued[task_id]
+            return self._index[task_id]
+        return None
+
+    def _promote_due_retries(self) -> float | None:
+        """Re-queue retries whose backoff ended; return seconds until the next one is due."""
+        now = time.monotonic()
+        while self._delayed and self._delayed[0][0] <= now:
+            _, task_id = heapq.heappop(self._delayed)
+            task = self._index.get(task_id)
+            if task and task["status"] == "retrying":
+                task["status"] = "queued"
+                self._enqueue(task)
+        return self._delayed[0][0] - now if self._delayed else None
+
+    def _drained(self) -> bool:
+        return not self._running and not self._delayed and not self._enqueued
 
     def _schedule(self):
         with self.lock:
-            if not self.started or self.paused or sum(t["status"] == "running" for t in self.tasks) >= 3:
-                return
-            for task in self.tasks:
-                if task["status"] in {"queued", "retrying"}:
-                    task["status"] = "running"
-                    task["message"] = "运行中"
-                    self._save()
-                    threading.Thread(target=self._work, args=(task["id"],), daemon=True).start()
-                    if sum(t["status"] == "running" for t in self.tasks) >= 3:
+            self.stages.set_limit("translate", self.running_limit)
+            while self._workers < self.worker_count:
+                self._workers += 1
+                threading.Thread(target=self._worker, daemon=True).start()
+            self._wakeup.notify_all()
+
+    def _worker(self):
+        while True:
+            with self.lock:
+                while True:
+                    if self._workers > self.worker_count:
+                        self._workers -= 1
+                        return
+                    delay = self._promote_due_retries()
+                    task = self._next_ready() if self.started and not self.paused else None
+                    if task:
                         break
+                    self._wakeup.wait(delay)
+                self._running.add(task["id"])
+                task["status"] = "running"
+                task["message"] = "运行中"
+                self._save()
+            self._work(task)
 
-    def _work(self, task_id: str):
+    def _work(self, task: dict):
+        task_id = task["id"]
         with self.lock:
-            task = self._task(task_id)
-            if not task:
-                return
             task["progress"] = 1
         def log(message: str, level: str = "INFO"):
             _ = level
@@ -203,48 +474,78 @@ class BatchQueue:
             if cancel_event.is_set():
                 raise InterruptedError("应用已关闭")
             key = task.get("_key") or self.key_for(task)
-            limiter = self.key_locks.setdefault(key, threading.BoundedSemaphore(2))
-            with limiter:
-                # ponytail: one ODA lock for all DWG phases; split locks only if conversion throughput matters.
-                lock = self.oda_lock if task["input_file"].lower().endswith(".dwg") or task.get("output_format") == "dwg" else _NullLock()
-                with lock:
-                    output = self.run(task, log, self.resume_event, cancel_event)
+            pool = self.pool_for(task) if self.pool_for else None
+            rank = PRIORITIES.index(task.get("priority")) if task.get("priority") in PRIORITIES else PRIORITIES.index("normal")
+
+            @contextmanager
+            def stage(name):
+                # The provider key is leased only for the translate stage, so admitted files
+                # convert and parse while others hold every key slot.
+                if name != "translate":
+                    with self.stages.stage(name, cancel_event, rank):
+                        yield ""
+                    return
+                # Provider and key first: a file waiting for a busy key must not hold a translate slot.
+                with self.provider_slots.slot(task.get("provider", "deepl"), cancel_event):
+                    if pool and len(pool):
+                        limiter = pool.task_slot(key, cancel_event)
+                    else:
+                        limiter = _KeySlot(self.key_slots, key, cancel_event)
+                    # The leased key goes to the caller only: concurrent mode translators of one
+                    # task each keep their own rather than overwrite a shared task["_key"].
+                    with limiter as leased_key, self.stages.stage(name, cancel_event, rank):
+                        yield leased_key
+
+            task["_stage"] = stage
+            # ODA conversions are throttled by backend.cad.oda_pool, not per task.
+            output = self.run(task, log, self.resume_event, cancel_event)
             if cancel_event.is_set():
                 raise InterruptedError("translation stopped")
             with self.lock:
                 task.update(status="succeeded", progress=100, output_file=output, message="成功")
+                self._throughput["cost"] += task.get("cost") or task_cost(task)
         except Exception as exc:
-            retry_delay = None
             with self.lock:
                 if cancel_event.is_set():
                     if task["status"] != "cancelled":
                         task.update(status="queued", message="应用关闭，可重新开始")
                     return
-                if not getattr(exc, "retryable", True):
+                if getattr(exc, "deferred", False):
+                    task.update(status="deferred", message=str(exc))
+                elif not getattr(exc, "retryable", True):
                     task.update(status="failed", message=str(exc))
                 else:
                     task["retries"] += 1
                 if getattr(exc, "retryable", True) and task["retries"] <= 3:
                     retry_delay = 2 ** task["retries"]
                     task.update(status="retrying", message=f"失败，{retry_delay} 秒后重试: {exc}")
-                    self._save()
+                    # The backoff waits in the timer heap; the worker moves on to the next file.
+                    heapq.heappush(self._delayed, (time.monotonic() + retry_delay, task_id))
                 elif getattr(exc, "retryable", True):
                     task.update(status="failed", message=str(exc))
-            if retry_delay:
-                if cancel_event.wait(retry_delay):
-                    return
-                with self.lock:
-                    if task["status"] == "retrying":
-                        task["status"] = "queued"
         finally:
             with self.lock:
-                task = self._task(task_id)
-                if task: task.pop("_key", None)
-                if not any(task["status"] in ACTIVE for task in self.tasks):
+                self._running.discard(task_id)
+                task.pop("_key", None)
+                task.pop("_stage", None)
+                if task["status"] == "queued" and task_id in self._index:
+                    self._enqueue(task)
+                if self._drained():
                     self.started = False
                 self._save()
-            self._schedule()
+                self._wakeup.notify_all()
+
+
+class _KeySlot:
+    """Single-key fallback used when no key pool is configured."""
+
+    def __init__(self, limiter: SlotLimiter, key: str, cancel_event: threading.Event | None = None):
+        self.limiter, self.key = limiter, key
+        self._slot = limiter.slot(key, cancel_event)
+
+    def __enter__(self):
+        self._slot.__enter__()
+        return self.key
 
-class _NullLock:
-    def __enter__(self): return self
-    def __exit__(self, *args): return False
+    def __exit__(self, *args):
+        return self._slot.__exit__(*args)
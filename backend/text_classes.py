@@ -0,0 +1,65 @@
+"""Character-class counts for the translate/skip decisions.
+
+Every count runs inside C string methods (``map(str.isprintable, ...)``,
+``str.translate``, ``str.count``, compiled regexes) so classifying the
+unique strings of a large drawing does no per-character Python work.
+"""
+
+from __future__ import annotations
+
+import re
+from typing import NamedTuple, Optional
+
+
+CJK_RE = re.compile(r'[\u4e00-\u9fff]')
+NON_TRANSLATABLE_RE = re.compile(r'[\d\s.,:;*×x\-_/\\%°(){}\[\]]+')
+_DELETE_WHITESPACE = str.maketrans('', '', ''.join(chr(code) for code in range(0x3001) if chr(code).isspace()))  # U+3000 is the last whitespace code point
+
+
+class TextClass(NamedTuple):
+    """Layer-independent verdict on one source string: ``skip``, ``glossary`` or ``provider``.
+
+    ``result`` is the text written back for ``skip`` and the built-in glossary
+    translation for ``glossary``; ``reason`` is the skip log line.
+    """
+
+    verdict: str
+    cleaned: str
+    result: Optional[str] = None
+    reason: str = ""
+
+
+def printable_count(text: str) -> int:
+    return sum(map(str.isprintable, text))
+
+
+def whitespace_count(text: str) -> int:
+    return len(text) - len(text.translate(_DELETE_WHITESPACE))
+
+
+def invalid_char_count(text: str) -> int:
+    """Characters ``TextCleaner.is_valid_char`` rejects.
+
+    Letters, CJK and the Latin-1/Extended-A range are printable except
+    U+00A0 and U+00AD, which are accepted; U+FFFD is printable but rejected.
+    """
+    return len(text) - printable_count(text) - text.count('\xa0') - text.count('\xad') + text.count('\ufffd')
+
+
+def readable_ratio(text: str) -> float:
+    """Share of printable, whitespace or CJK characters (``is_valid_text_for_translation``)."""
+    if not text:
+        return 1.0
+    return (printable_count(text) + whitespace_count(text) - text.count(' ')) / len(text)
+
+
+def is_symbolic(cleaned: str) -> bool:
+    """Numbers, dimensions and punctuation, or ASCII that is mostly non-word characters."""
+    stripped = cleaned.strip()
+    if NON_TRANSLATABLE_RE.fullmatch(stripped):
+        return True
+    return stripped.isascii() and (len(cleaned) - sum(map(str.isalnum, cleaned))) / (len(cleaned) or 1) > 0.6
+
+
+def has_cjk(text: str) -> bool:
+    return CJK_RE.search(text) is not None
@@ -0,0 +1,63 @@
+"""Compact records for translatable text fields.
+
+A drawing can hold 100k+ text fields, so items are ``__slots__`` objects
+instead of dicts: no per-item ``__dict__``, interned layer/location strings,
+and the raw source text stored only when it differs from the cleaned text.
+They keep the mapping-style access (``item['field']``, ``item.get(...)``,
+``'key' in item``) the extraction and write-back code was written against.
+"""
+
+from __future__ import annotations
+
+import sys
+
+
+class TextItem:
+    __slots__ = ("entity", "handle", "field", "original_text", "_raw_source", "layer", "location", "type", "block", "translated_text", "block_cached")
+
+    def __init__(self, original_text, field="text", entity=None, handle="", raw_source=None, layer="", location="", type="", block=""):
+        self.entity = entity
+        self.handle = handle
+        self.field = sys.intern(field)
+        self.original_text = original_text
+        self._raw_source = raw_source if raw_source != original_text else None
+        self.layer = sys.intern(layer or "")
+        self.location = sys.intern(location or "")
+        self.type = sys.intern(type)
+        self.block = sys.intern(block or "")
+
+    @property
+    def raw_source(self):
+        return self.original_text if self._raw_source is None else self._raw_source
+
+    def __getitem__(self, key):
+        try:
+            return getattr(self, key)
+        except AttributeError:
+            raise KeyError(key) from None
+
+    def __setitem__(self, key, value):
+        if key == "location":
+            value = sys.intern(value)
+        setattr(self, key, value)
+
+    def __contains__(self, key):
+        return hasattr(self, key)
+
+    def get(self, key, default=None):
+        return getattr(self, key, default)
+
+    def copy(self):
+        """The extracted field without any translation state, for resolving another mode."""
+        clone = object.__new__(TextItem)
+        for name in ("entity", "handle", "field", "original_text", "_raw_source", "layer", "location", "type", "block"):
+            setattr(clone, name, getattr(self, name))
+        return clone
+
+    def release(self):
+        """Drop the entity reference and raw copy once the field has been written."""
+        self.entity = None
+        self._raw_source = None
+
+    def __repr__(self):
+        return f"TextItem({self.type}/{self.field} {self.original_text!r})"
@@ -3,11 +3,16 @@ import ezdxf
 import re
 import time
 import os
+import random
 import sys
 import json
+import hashlib
 import threading
 import queue
 import urllib.request
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import ExitStack, contextmanager, nullcontext
 from datetime import datetime
 from pathlib import Path
 
@@ -21,9 +26,19 @@ except ImportError:  # Homebrew Python on macOS does not include Tk by default.
     tk = ttk = filedialog = messagebox = None
 
 from backend.providers.azure import AzureFreeQuotaExceededError, AzureTranslator
+from backend.providers.endpoints import deepl_server_url
+from backend.providers.journal import JOURNAL_ENV, journal_from_env
+from backend.checkpoint import TranslationCheckpoint, plan_fingerprint
+from backend.document_index import DocumentIndex
+from backend.dxf_rewrite import can_stream_field, rewrite_dxf_text
+from backend.dxf_scan import DXFScanUnsupported, scan_dxf_text
+from backend.key_pool import key_fingerprint
+from backend.manifest import DrawingManifest
 from backend.language_assets import LanguageAssets
-from backend.storage import atomic_output_path, atomic_write_json
+from backend.storage import atomic_output_path, atomic_write_json, file_fingerprint
+from backend.text_classes import TextClass, has_cjk, invalid_char_count, is_symbolic, printable_count, readable_ratio
 from backend.text_cleaning import TextCleaner
+from backend.text_items import TextItem
 
 try:
     import winreg
@@ -31,6 +46,19 @@ except ImportError:
     winreg = None
 
 APP_VERSION = "1.8.8"
+# Transient provider failures are retried per text item so one dropped request
+# does not restart a whole drawing (and its ODA conversion) from the queue.
+ITEM_RETRY_ATTEMPTS = 4
+ITEM_RETRY_BASE_SECONDS = 1.0
+ITEM_RETRY_MAX_SECONDS = 20.0
+EXTRACT_PROGRESS_EVERY = 10000
+# Validity verdicts are memoized per text; the memo starts over past this many texts.
+TEXT_VALIDITY_CACHE_LIMIT = 100000
+# DXF outputs of at least this size are written by patching text tags in
+# place (backend.dxf_rewrite) instead of loading the whole drawing in ezdxf.
+STREAM_REWRITE_MIN_MB = 64
+# Anonymous table, dimension and unnamed blocks, renumbered per drawing; the block cache skips them.
+ANONYMOUS_BLOCK_PREFIXES = ("*D", "*T", "*U")
 
 # ODA can export legacy SHX/GBK text as ``\M+5C6BD`` rather than Unicode.
 # The leading nibble identifies the legacy codepage; the following four hex
@@ -64,6 +92,15 @@ def load_yaml_data(filename):
             return yaml.safe_load(f)
     return {}
 
+def glossary_fingerprint():
+    """Hash of the bundled YAML glossaries, part of the output cache key."""
+    digest = hashlib.sha256()
+    for path in sorted(Path(resource_path("glossaries")).glob("*.yaml")):
+        digest.update(path.name.encode("utf-8"))
+        digest.update(path.read_bytes())
+    return digest.hexdigest()
+
+
 def get_installed_fonts():
     fonts = set()
     if winreg is None:
@@ -107,6 +144,10 @@ def output_prefix(mode):
     return OUTPUT_PREFIXES.get(mode, "fr")
 
 
+def _first_output(output_file):
+    return output_file if isinstance(output_file, str) else output_file[0]
+
+
 def wait_for_translation(resume_event=None, cancel_event=None):
     while resume_event and not resume_event.wait(0.1):
         if cancel_event and cancel_event.is_set():
@@ -115,6 +156,30 @@ def wait_for_translation(resume_event=None, cancel_event=None):
         raise InterruptedError("translation cancelled")
 
 
+class ProviderRequestError(RuntimeError):
+    """A text item failed after its own retries; restarting the file would not help."""
+
+    retryable = False
+
+
+def is_retryable_provider_error(exc):
+    """Only provider and network failures that may pass are retried: timeouts, 429 and 5xx.
+
+    Errors that say so themselves (``retryable``) are taken at their word;
+    anything else, e.g. a bug or a malformed reply, fails at once.
+    """
+    retryable = getattr(exc, "retryable", None)
+    if retryable is not None:
+        return bool(retryable)
+    if isinstance(exc, (deepl.exceptions.AuthorizationException, deepl.exceptions.QuotaExceededException)):
+        return False
+    if isinstance(exc, (deepl.exceptions.TooManyRequestsException, deepl.exceptions.ConnectionException, OSError)):
+        return True  # OSError covers timeouts, refused and reset connections and urllib's URLError
+    if isinstance(exc, deepl.exceptions.DeepLException):
+        return exc.should_retry or exc.http_status_code == 429 or (exc.http_status_code or 0) >= 500
+    return False
+
+
 class CADChineseTranslator:
 
     @staticmethod
@@ -138,6 +203,28 @@ class CADChineseTranslator:
         self.deepl_translator = None
         self.translation_provider = "deepl"
         self.azure_translator = None
+        self.key_pool = None
+        self.pool_preferred_key = ""
+        self.quota_gate = None
+        self.quota_spent = None
+        self.pipeline_stage = None
+        # Seconds spent inside each stage, plus the work DXF format and size of DWG inputs.
+        self.timings = {}
+        self._pool_clients = {}
+        self.cancel_event = None
+        self.checkpoint_path = None
+        self.manifest_path = None
+        self.manifest_basis = ""
+        # The input's file_fingerprint when the caller already hashed it (batch tasks).
+        self.source_fingerprint = ""
+        self.incremental_summary = None
+        self._manifest = None
+        self._block_scans, self._collected_blocks = {}, set()
+        self._document_index = DocumentIndex()
+        self._text_validity = {}
+        self._text_classes = {}
+        self.stream_rewrite_min_bytes = STREAM_REWRITE_MIN_MB << 20
+        self.provider_journal, self.provider_replay = journal_from_env(os.environ.get(JOURNAL_ENV, ""))
         self.cleaner = TextCleaner()
         abbrev_data = load_yaml_data("glossaries/translation_abbreviations.yaml")
         self.abbrev_map_fr_to_zh = abbrev_data.get("abbrev_map", {})
@@ -186,7 +273,7 @@ class CADChineseTranslator:
             }
         if self.deepl_api_key:
             try:
-                self.deepl_translator = deepl.Translator(self.deepl_api_key)
+                self.deepl_translator = deepl.Translator(self.deepl_api_key, server_url=deepl_server_url())
                 self.safe_log(" DeepL 引擎初始化成功")
             except Exception as e:
                 self.safe_log(f" DeepL 初始化失败: {e}")
@@ -199,7 +286,7 @@ class CADChineseTranslator:
         self._deepl_api_key = value
         if value:
             try:
-                self.deepl_translator = deepl.Translator(value)
+                self.deepl_translator = deepl.Translator(value, server_url=deepl_server_url())
             except Exception as e:
                 self.safe_log(f" DeepL 初始化失败: {e}")
     def safe_log(self, message, level="INFO"):
@@ -217,6 +304,111 @@ class CADChineseTranslator:
         self.translation_provider = "azure"
         self.azure_translator = AzureTranslator(key, region) if key else None
 
+    def configure_key_pool(self, pool, preferred_key=""):
+        """Share a provider key pool; requests then go to the least-loaded key."""
+        self.key_pool = pool
+        self.pool_preferred_key = preferred_key or ""
+
+    @contextmanager
+    def stage(self, name):
+        """Enter a batch pipeline stage (convert/parse/translate/write) when run from the queue; time spent inside is added to ``timings``."""
+        with self.pipeline_stage(name) if self.pipeline_stage else nullcontext() as leased_key:
+            if leased_key:
+                self.pool_preferred_key = leased_key
+            started = time.perf_counter()
+            try:
+                yield
+            finally:
+                self.timings[name] = round(self.timings.get(name, 0) + time.perf_counter() - started, 3)
+
+    def _record_work_dxf(self, session):
+        if session.meta.is_dwg and os.path.isfile(session.work_input):
+            self.timings["work_dxf"] = {"format": "binary" if session.binary_work else "ascii", "bytes": os.path.getsize(session.work_input)}
+            if session.binary_fallback:
+                self.timings["work_dxf"]["binary_fallback"] = session.binary_fallback
+
+    def _provider_client(self, key=None):
+        if self.translation_provider == "azure":
+            if key is None or key == getattr(self.azure_translator, "key", None):
+                if not self.azure_translator:
+                    raise RuntimeError("Azure Translator 未初始化，请配置 API Key")
+                return self.azure_translator
+            region = getattr(self.azure_translator, "region", "")
+            return self._pool_clients.setdefault(key, AzureTranslator(key, region))
+        if key is None or key == self.deepl_api_key:
+            if not self.deepl_translator:
+                raise RuntimeError("DeepL 未初始化，请配置 API Key")
+            return self.deepl_translator
+        if key not in self._pool_clients:
+            self._pool_clients[key] = deepl.Translator(key, server_url=deepl_server_url())
+        return self._pool_clients[key]
+
+    def _call_provider(self, client, cleaned, lang_config):
+        if not self.provider_journal:
+            return self._request_provider(client, cleaned, lang_config)
+        mode = f"{lang_config['source']}>{lang_config['target']}"
+        started = time.perf_counter()
+        try:
+            result = self._request_provider(client, cleaned, lang_config)
+        except Exception as exc:
+            self.provider_journal.record(self.translation_provider, mode, cleaned, seconds=time.perf_counter() - started, error=exc)
+            raise
+        self.provider_journal.record(self.translation_provider, mode, cleaned, result, time.perf_counter() - started)
+        return result
+
+    def _request_provider(self, client, cleaned, lang_config):
+        if self.translation_provider == "azure":
+            return client.translate_text(cleaned, lang_config['source'], lang_config['target'])
+        deepl_result = client.translate_text(
+            cleaned,
+            source_lang=lang_config['source'].split('-')[0].upper(),
+            target_lang=(
+                lang_config['target'].upper()
+                if lang_config['target'].startswith('en-')
+                else lang_config['target'].split('-')[0].upper()
+            ),
+        )
+        return deepl_result.text
+
+    def _provider_translate(self, cleaned, lang_config):
+        """Return ``(translation, key)``; a pool moves on when one key's quota is spent."""
+        if self.provider_replay:
+            return self.provider_replay.translate(f"{lang_config['source']}>{lang_config['target']}", cleaned), ""
+        if not self.key_pool or len(self.key_pool) < 2:
+            key = getattr(self.azure_translator, "key", "") if self.translation_provider == "azure" else self.deepl_api_key
+            try:
+                return self._call_provider(self._provider_client(), cleaned, lang_config), key or ""
+            except AzureFreeQuotaExceededError as e:
+                e.key = key or ""
+                raise
+        while True:
+            with self.key_pool.request_slot(self.pool_preferred_key) as key:
+                try:
+                    return self._call_provider(self._provider_client(key), cleaned, lang_config), key
+                except (AzureFreeQuotaExceededError, deepl.exceptions.QuotaExceededException) as e:
+                    if not self.key_pool.mark_exhausted(key):
+                        e.key = key
+                        raise
+                    if isinstance(e, AzureFreeQuotaExceededError):
+                        self.language_assets.record_usage("azure", 0, quota_exceeded=True, key_id=key_fingerprint(key))
+                    self.safe_log(f"Key {key_fingerprint(key)} 额度已用尽，切换到下一个 Key", level="warning")
+
+    def _provider_translate_with_retry(self, cleaned, lang_config):
+        """Retry transient failures of one item with capped exponential backoff and jitter."""
+        for attempt in range(1, ITEM_RETRY_ATTEMPTS + 1):
+            try:
+                return self._provider_translate(cleaned, lang_config)
+            except Exception as e:
+                if attempt == ITEM_RETRY_ATTEMPTS or not is_retryable_provider_error(e):
+                    raise
+                delay = min(ITEM_RETRY_MAX_SECONDS, ITEM_RETRY_BASE_SECONDS * 2 ** (attempt - 1))
+                delay = random.uniform(delay / 2, delay)
+                self.safe_log(f"⚠ 翻译请求失败，{delay:.1f} 秒后重试 ({attempt}/{ITEM_RETRY_ATTEMPTS - 1}): {e}", level="warning")
+                if self.cancel_event and self.cancel_event.wait(delay):
+                    raise InterruptedError("translation cancelled")
+                if not self.cancel_event:
+                    time.sleep(delay)
+
     def configure_language_assets(self, project_package_path=""):
         self.project_package_path = project_package_path or ""
 
@@ -309,73 +501,100 @@ class CADChineseTranslator:
 
         return self.cleaner.normalize_whitespace(text)
    
-    def translate_text(self, text, lang_config_key, layer=''):
-        if not text or not lang_config_key:
-            return text
-
-        cache_key = (text, lang_config_key, (layer or '').casefold())
-
+    def classify_text(self, text, lang_config_key):
+        """The ``TextClass`` of ``text``, computed once per string and mode (the memo starts over past its limit)."""
+        memo_key = (text, lang_config_key)
+        text_class = self._text_classes.get(memo_key)
+        if text_class is None:
+            if len(self._text_classes) >= TEXT_VALIDITY_CACHE_LIMIT:
+                self._text_classes.clear()
+            text_class = self._text_classes[memo_key] = self._classify_text(text, lang_config_key)
+        return text_class
+
+    def _classify_text(self, text, lang_config_key):
         # Step 1: 预清洗
         cleaned = self.cleaner.full_clean(text)
-
-        if cache_key in self.translated_cache:
-            return self.translated_cache[cache_key]
-
         if not cleaned.strip():
-            self.safe_log(f"跳过空文本或无效文本: \"{text}\"")
-            return self.cleaner.safe_utf8(text)
-
+            return TextClass("skip", cleaned, self.cleaner.safe_utf8(text), f"跳过空文本或无效文本: \"{text}\"")
         try:
             cleaned.encode('utf-8')
         except UnicodeEncodeError as e:
-            self.safe_log(f"跳过包含编码问题的文本: \"{text}\" - 错误: {e}")
-            return self.cleaner.safe_utf8(text)
+            return TextClass("skip", cleaned, self.cleaner.safe_utf8(text), f"跳过包含编码问题的文本: \"{text}\" - 错误: {e}")
 
         # Step 2: 判定是否跳过翻译
-        non_translatable = re.fullmatch(r'[\d\s.,:;*×x\-_/\\%°(){}\[\]]+', cleaned.strip())
-        ascii_only = all(ord(c) < 128 for c in cleaned.strip())
-        non_word_ratio = sum(1 for c in cleaned if not c.isalnum()) / (len(cleaned) or 1)
-
-        if non_translatable or (ascii_only and non_word_ratio > 0.6):
-            self.safe_log(f"跳过非翻译文本（符号/ASCII）: \"{cleaned}\"")
-            self.translated_cache[cache_key] = cleaned
-            return self.cleaner.safe_utf8(cleaned)
+        if is_symbolic(cleaned):
+            return TextClass("skip", cleaned, self.cleaner.safe_utf8(cleaned), f"跳过非翻译文本（符号/ASCII）: \"{cleaned}\"")
 
         # Step 3: 缩写处理 & 中文校验
-        cleaned = self.preprocess_abbreviations(cleaned, lang_config_key)
-        cleaned = self.cleaner.safe_utf8(cleaned)
+        cleaned = self.cleaner.safe_utf8(self.preprocess_abbreviations(cleaned, lang_config_key))
+        if lang_config_key.startswith("zh_to_") and not has_cjk(cleaned):
+            return TextClass("skip", cleaned, self.cleaner.safe_utf8(text), f"跳过非中文内容（疑似编号）: \"{cleaned}\"")
+        if lang_config_key not in self.language_configs:
+            return TextClass("skip", cleaned, self.cleaner.safe_utf8(text), f"无效的翻译配置: {lang_config_key}")
 
-        if lang_config_key.startswith("zh_to_") and not re.search(r'[\u4e00-\u9fff]', cleaned):
-            self.safe_log(f"跳过非中文内容（疑似编号）: \"{cleaned}\"")
-            return self.cleaner.safe_utf8(text)
+        glossary_translation = self.get_glossary_translation(cleaned, lang_config_key)
+        if glossary_translation:
+            return TextClass("glossary", cleaned, glossary_translation)
 
-        if lang_config_key not in self.language_configs:
-            self.safe_log(f"无效的翻译配置: {lang_config_key}")
-            return self.cleaner.safe_utf8(text)
+        # Step 4: 可读性检查（CJK 基本区均为可打印字符）
+        if len(cleaned) > 0 and printable_count(cleaned) / len(cleaned) < 0.5:
+            return TextClass("skip", cleaned, self.cleaner.safe_utf8(text), f"跳过损坏文本(可读字符比例过低): \"{cleaned}\"")
+        return TextClass("provider", cleaned)
+
+    def _resolve_locally(self, text, lang_config_key, layer='', dry_run=False):
+        """Resolve text without a provider call.
+
+        Returns ``(translation, cleaned)``; ``translation`` is None when the
+        cleaned text still needs DeepL/Azure.  ``dry_run`` is used by the
+        quota pre-flight: it neither logs, caches nor counts memory hits.
+        The layer-independent checks come from ``classify_text``; only the
+        term, layer glossary and memory lookups run per layer.
+        """
+        if not text or not lang_config_key:
+            return text, text
+        log = (lambda *args, **kwargs: None) if dry_run else self.safe_log
+        cache = {} if dry_run else self.translated_cache
+
+        cache_key = (text, lang_config_key, (layer or '').casefold())
+        text_class = self.classify_text(text, lang_config_key)
+        cleaned = text_class.cleaned
+
+        if cache_key in self.translated_cache:
+            return self.translated_cache[cache_key], cleaned
+
+        if text_class.verdict == "skip":
+            log(text_class.reason)
+            return text_class.result, cleaned
 
         lang_config = self.language_configs[lang_config_key]
         glossary_translation = self.language_assets.lookup_term(cleaned, lang_config_key, layer, self.project_package_path)
         glossary_translation = glossary_translation or self.get_layer_glossary_translation(cleaned, lang_config_key, layer)
-        glossary_translation = glossary_translation or self.get_glossary_translation(cleaned, lang_config_key)
+        glossary_translation = glossary_translation or text_class.result
         if glossary_translation:
             final = self.cleaner.safe_utf8(self.cleaner.full_clean(glossary_translation)).strip()
-            self.translated_cache[cache_key] = final
-            self.safe_log(f"✔ 术语表命中 ({lang_config['name']}): \"{cleaned}\" → \"{final}\"")
-            return final
+            cache[cache_key] = final
+            log(f"✔ 术语表命中 ({lang_config['name']}): \"{cleaned}\" → \"{final}\"")
+            return final, cleaned
 
-        memory_translation = self.language_assets.lookup_memory(cleaned, lang_config_key, layer)
+        memory_translation = self.language_assets.lookup_memory(cleaned, lang_config_key, layer, count_hit=not dry_run)
         if memory_translation:
             final = self.cleaner.safe_utf8(self.cleaner.full_clean(memory_translation)).strip()
-            self.translated_cache[cache_key] = final
-            self.safe_log(f"✔ 翻译记忆命中 ({lang_config['name']}): \"{cleaned}\" → \"{final}\"")
-            return final
+            cache[cache_key] = final
+            log(f"✔ 翻译记忆命中 ({lang_config['name']}): \"{cleaned}\" → \"{final}\"")
+            return final, cleaned
+
+        return None, cleaned
+
+    def translate_text(self, text, lang_config_key, layer=''):
+        if not text or not lang_config_key:
+            return text
 
-        # Step 4: 可读性检查
-        printable_chars = sum(1 for char in cleaned if char.isprintable() or '\u4e00' <= char <= '\u9fff')
-        if len(cleaned) > 0 and printable_chars / len(cleaned) < 0.5:
-            self.safe_log(f"跳过损坏文本(可读字符比例过低): \"{cleaned}\"")
-            return self.cleaner.safe_utf8(text)
+        cache_key = (text, lang_config_key, (layer or '').casefold())
+        resolved, cleaned = self._resolve_locally(text, lang_config_key, layer)
+        if resolved is not None:
+            return resolved
 
+        lang_config = self.language_configs[lang_config_key]
         try:
             context = self.get_contextual_translation(cleaned, lang_config_key)
             self.safe_log(f"翻译中 ({lang_config['name']}): {cleaned}")
@@ -383,25 +602,7 @@ class CADChineseTranslator:
                 self.safe_log(f"提示术语: {context}")
 
             # Step 5: provider translation
-            if self.translation_provider == "azure":
-                if not self.azure_translator:
-                    raise RuntimeError("Azure Translator 未初始化，请配置 API Key")
-                translated_result = self.azure_translator.translate_text(
-                    cleaned, lang_config['source'], lang_config['target']
-                )
-            else:
-                if not self.deepl_translator:
-                    raise RuntimeError("DeepL 未初始化，请配置 API Key")
-                deepl_result = self.deepl_translator.translate_text(
-                    cleaned,
-                    source_lang=lang_config['source'].split('-')[0].upper(),
-                    target_lang=(
-                        lang_config['target'].upper()
-                        if lang_config['target'].startswith('en-')
-                        else lang_config['target'].split('-')[0].upper()
-                    ),
-                )
-                translated_result = deepl_result.text
+            translated_result, used_key = self._provider_translate_with_retry(cleaned, lang_config)
 
             # Step 6: 翻译结果后处理
             if self.contains_surrogates(translated_result):
@@ -420,20 +621,91 @@ class CADChineseTranslator:
 
             self.translated_cache[cache_key] = final
             self.language_assets.record_memory(cleaned, final, lang_config_key, layer, self.translation_provider)
-            self.language_assets.record_usage(self.translation_provider, len(cleaned))
+            self.language_assets.record_usage(self.translation_provider, len(cleaned), key_id=key_fingerprint(used_key) if used_key else "")
+            if self.key_pool and used_key:
+                self.key_pool.record(used_key, len(cleaned))
+            if self.quota_spent:
+                self.quota_spent(len(cleaned))
             self.safe_log(f"✔ 翻译完成 ({'Azure Translator' if self.translation_provider == 'azure' else 'DeepL'}): \"{cleaned}\" → \"{final}\"")
-            time.sleep(0.5)
+            if not self.provider_replay or self.provider_replay.realtime:
+                time.sleep(0.5)
             return final
 
         except AzureFreeQuotaExceededError as e:
-            self.language_assets.record_usage("azure", 0, quota_exceeded=True)
+            # Recorded per key too: a key that reported 403001 is known to be F0 for the rest of the month.
+            self.language_assets.record_usage("azure", 0, quota_exceeded=True, key_id=key_fingerprint(e.key) if getattr(e, "key", "") else "")
             self.safe_log(str(e), level="error")
             raise
+        except InterruptedError:
+            raise
         except Exception as e:
             provider = "Azure Translator" if self.translation_provider == "azure" else "DeepL"
             self.safe_log(f"翻译失败 ({provider}): {e} → 原文: \"{cleaned}\"")
-            raise RuntimeError(f"{provider} 翻译失败: {e}") from e
+            raise ProviderRequestError(f"{provider} 翻译失败: {e}") from e
+
 
+    def estimate_provider_characters(self, items, lang_config):
+        """Billable characters still needed after glossary, memory and cache resolution."""
+        pending = {}
+        for item in items:
+            if not self.is_valid_text_for_translation(item['original_text']):
+                continue
+            layer = item.get('layer', '')
+            resolved, cleaned = self._resolve_locally(item['original_text'], lang_config, layer, dry_run=True)
+            if resolved is None:
+                pending.setdefault((cleaned, (layer or '').casefold()), len(cleaned))
+        return {"items": len(items), "unique": len(pending), "characters": sum(pending.values())}
+
+    def estimate_cad_file(self, input_file, lang_config, include_blocks=False):
+        """Pre-flight estimate of a DXF file; DWG files are estimated after conversion."""
+        try:
+            items = self.scan_text_items(input_file, include_blocks)
+        except DXFScanUnsupported:
+            items = self.extract_text_entities(ezdxf.readfile(input_file), lang_config, include_blocks=include_blocks)
+        return self.estimate_provider_characters(items, lang_config)
+
+    def scan_text_items(self, input_file, include_blocks=False):
+        """Translatable strings from the streaming scanner, without loading the drawing.
+
+        Follows ``extract_text_entities``: block definitions count only when
+        blocks are included, the block is (transitively) inserted, or it is a
+        layout or a *T/*D table/dimension block.  Items have no ``entity``.
+        """
+        items, block_items, inserts = [], {}, {}
+        last_text, mtext_handles = ('', ''), set()
+        for record in scan_dxf_text(input_file):
+            if record['type'] == 'INSERT':
+                inserts.setdefault(record['block'], set()).add(record['name'])
+                continue
+            text = decode_oda_mbcs_escapes(record['text'])
+            if record['field'] == 'text':
+                last_text = (record['handle'], text)
+            elif record['field'] == 'mtext' and text.strip():
+                mtext_handles.add(record['handle'])
+            if record['field'] == 'tag' and not self._should_translate_attdef_tag(text, last_text[1] if last_text[0] == record['handle'] else ''):
+                continue
+            if record['field'] == 'block' and record['handle'] in mtext_handles:
+                continue
+            if not text.strip() or not self.is_valid_text_for_translation(text):
+                continue
+            cleaned = self._clean_entity_text(text)
+            if not cleaned:
+                continue
+            item = TextItem(cleaned, record['field'], handle=record['handle'], raw_source=text.strip(), layer=record['layer'], location=record['block'] or 'Model', type=record['type'], block=record['block'])
+            if record['block']:
+                block_items.setdefault(record['block'], []).append(item)
+            else:
+                items.append(item)
+        visible = {name for name in block_items if include_blocks or name.upper().startswith(('*PAPER_SPACE', '*T', '*D'))}
+        pending = list(inserts.get('', ())) + [name for block in visible for name in inserts.get(block, ())]
+        while pending:
+            name = pending.pop()
+            if name not in visible:
+                visible.add(name)
+                pending.extend(inserts.get(name, ()))
+        for name in visible:
+            items.extend(block_items.get(name, ()))
+        return items
 
     def extract_text_entities(self, doc, lang_config, include_blocks=False):
         """
@@ -442,17 +714,28 @@ class CADChineseTranslator:
         不再依赖“块已炸开”的假设。
         """
         items = []
+        for item in self.iter_text_entities(doc, lang_config, include_blocks):
+            items.append(item)
+            if len(items) % EXTRACT_PROGRESS_EVERY == 0:
+                self.safe_log(f"   已提取 {len(items)} 个文本对象...")
+        self.safe_log(f"📝 总共提取到 {len(items)} 个文本对象。")
+        return items
+
+    def iter_text_entities(self, doc, lang_config, include_blocks=False):
+        """按布局、块定义逐段产出文字条目，供提取与翻译阶段流式消费"""
         processed_layouts = set()
+        self._block_scans, self._collected_blocks = {}, set()
+        self._document_index = DocumentIndex(doc)
 
         # 1. 提取模型空间
         modelspace = doc.modelspace()
-        items.extend(self._extract_from_layout(modelspace, include_blocks))
+        yield from self._extract_from_layout(modelspace, include_blocks)
         processed_layouts.add(modelspace.name)
 
         # 2. 提取布局 (Paper Space)
         for layout in doc.layouts:
             if layout.name not in processed_layouts:
-                items.extend(self._extract_from_layout(layout, include_blocks))
+                yield from self._extract_from_layout(layout, include_blocks)
                 processed_layouts.add(layout.name)
 
         # 3. 块定义扫描。ACAD_TABLE 和 DIMENSION 的可见图形分别存放在
@@ -463,7 +746,7 @@ class CADChineseTranslator:
             block_count = 0
             for block in doc.blocks:
                 # 跳过空块
-                if len(list(block)) == 0:
+                if next(iter(block), None) is None:
                     continue
                 # 跳过已经处理过的特殊布局块
                 if block.name in processed_layouts:
@@ -475,7 +758,7 @@ class CADChineseTranslator:
                     block_items = self._extract_from_layout(block, include_blocks=True, in_block_def=True)
                     if block_items:
                         self.safe_log(f"  -> 块 '{block.name}' 中发现 {len(block_items)} 个文本对象")
-                        items.extend(block_items)
+                        yield from block_items
                         block_count += 1
                 except Exception as e:
                     self.safe_log(f"  ⚠️ 扫描块 '{block.name}' 失败: {e}", level="warning")
@@ -491,7 +774,7 @@ class CADChineseTranslator:
                     block_items = self._extract_from_layout(block, include_blocks=False, in_block_def=True)
                     if block_items:
                         self.safe_log(f"  -> 可见匿名块 '{block.name}' 中发现 {len(block_items)} 个文本对象")
-                        items.extend(block_items)
+                        yield from block_items
                         special_block_count += 1
                 except Exception as e:
                     self.safe_log(f"  ⚠️ 扫描匿名块 '{block.name}' 失败: {e}", level="warning")
@@ -500,9 +783,6 @@ class CADChineseTranslator:
             else:
                 self.safe_log("ℹ️ 未勾选'包含块'，仅跳过普通块定义。")
 
-        self.safe_log(f"📝 总共提取到 {len(items)} 个文本对象。")
-        return items
-
     SUPPORTED_TEXT_TYPES = ['TEXT', 'MTEXT', 'ATTDEF', 'ATTRIB', 'MULTILEADER', 'DIMENSION', 'ACAD_TABLE']
 
     def _clean_entity_text(self, text):
@@ -540,7 +820,7 @@ class CADChineseTranslator:
         AutoCAD can rebuild it from these source values when opening the file.
         """
         try:
-            tags = entity.xtags.get_subclass("AcDbTable")
+            tags = self._document_index.table_tags(entity)
         except (AttributeError, KeyError, TypeError):
             return []
         return [
@@ -551,7 +831,7 @@ class CADChineseTranslator:
 
     def _write_acad_table_text_slot(self, entity, slot, text):
         try:
-            tags = entity.xtags.get_subclass("AcDbTable")
+            tags = self._document_index.table_tags(entity)
             index = int(slot)
             tag = tags[index]
         except (AttributeError, KeyError, TypeError, ValueError, IndexError) as exc:
@@ -570,15 +850,14 @@ class CADChineseTranslator:
         cleaned = self._clean_entity_text(decoded_text)
         if not cleaned:
             return
-        items.append({
-            'entity': entity,
-            'field': field,
-            'original_text': cleaned,
-            'raw_source': decoded_text.strip(),
-            'layer': getattr(entity.dxf, 'layer', 'DEFAULT'),
-            'location': layout.name if hasattr(layout, 'name') else 'Unknown',
-            'type': entity.dxftype(),
-        })
+        self._document_index.add_entity(entity)
+        items.append(TextItem(
+            cleaned, field, entity=entity, handle=getattr(entity.dxf, 'handle', None) or '',
+            raw_source=decoded_text.strip(),
+            layer=getattr(entity.dxf, 'layer', 'DEFAULT'),
+            location=layout.name if hasattr(layout, 'name') else 'Unknown',
+            type=entity.dxftype(),
+        ))
 
     def _should_translate_attdef_tag(self, tag, default_text):
         """
@@ -602,22 +881,12 @@ class CADChineseTranslator:
         return False
 
     def _sync_attrib_tags(self, doc, old_tag, new_tag):
-        """ATTDEF 标记变更后，同步更新图上所有 ATTRIB 实例的标记"""
+        """ATTDEF 标记变更后，同步更新图上所有 ATTRIB 实例的标记（按标记索引查找）"""
         if not old_tag or old_tag == new_tag:
             return
-        count = 0
-        layouts = [doc.modelspace()]
-        layout_names = {doc.modelspace().name}
-        for layout in doc.layouts:
-            if layout.name not in layout_names:
-                layouts.append(layout)
-                layout_names.add(layout.name)
-        for layout in layouts:
-            for insert in layout.query('INSERT'):
-                for attrib in getattr(insert, 'attribs', []) or []:
-                    if getattr(attrib.dxf, 'tag', '') == old_tag:
-                        attrib.dxf.tag = new_tag[:255]
-                        count += 1
+        if self._document_index.doc is not doc:
+            self._document_index = DocumentIndex(doc)
+        count = self._document_index.rename_attrib_tags(old_tag, new_tag[:255])
         if count:
             self.safe_log(f"  已同步 {count} 个 ATTRIB 标记: {old_tag!r} → {new_tag!r}")
 
@@ -683,39 +952,51 @@ class CADChineseTranslator:
             return (handle, field)
         return (id(entity), field)
 
+    @staticmethod
+    def _checkpoint_key(item):
+        entity = item.get('entity')
+        handle = item.get('handle') or (getattr(entity.dxf, 'handle', None) if entity is not None else None)
+        return f"{handle}:{item.get('field', 'text')}" if handle else ""
+
+    def _scan_block_definition(self, block_layout):
+        """块定义自身的文字与嵌套块，每张图纸每个块只扫描一次"""
+        cached = self._block_scans.get(block_layout.name)
+        if cached is None:
+            texts, nested = [], []
+            for entity in block_layout:
+                dxftype = entity.dxftype()
+                if dxftype == 'INSERT':
+                    try:
+                        nested_layout = entity.block()
+                    except Exception:
+                        nested_layout = None
+                    if nested_layout is not None and all(nested_layout.name != other.name for other in nested):
+                        nested.append(nested_layout)
+                elif dxftype in self.SUPPORTED_TEXT_TYPES:
+                    for it in self.collect_entity_text_items(entity, block_layout):
+                        it['block'] = block_layout.name
+                        texts.append(it)
+            cached = self._block_scans[block_layout.name] = (texts, nested)
+        return cached
+
     def _extract_from_block_layout(self, block_layout, layout, block_name, items, seen, depth=0):
-        """直接扫描块定义内的文字（含嵌套块），用于图框/标题栏等块参照"""
-        if depth > 15:
+        """直接扫描块定义内的文字（含嵌套块），用于图框/标题栏等块参照。
+        已在本图纸中收集过的块不再重复收集，因此同一图框被多次引用只计一次。"""
+        if depth > 15 or block_layout.name in self._collected_blocks:
             return 0
+        self._collected_blocks.add(block_layout.name)
+        texts, nested = self._scan_block_definition(block_layout)
         found = 0
-        for entity in block_layout:
-            dxftype = entity.dxftype()
-            if dxftype == 'INSERT':
-                try:
-                    nested_layout = entity.block()
-                    nested_name = getattr(entity.dxf, 'name', '?')
-                    if nested_layout is not None:
-                        found += self._extract_from_block_layout(
-                            nested_layout,
-                            layout,
-                            f"{block_name}>{nested_name}",
-                            items,
-                            seen,
-                            depth + 1,
-                        )
-                except Exception:
-                    pass
-                continue
-            if dxftype not in self.SUPPORTED_TEXT_TYPES:
+        for it in texts:
+            key = self._entity_key(it['entity'], it['field'])
+            if key in seen:
                 continue
-            for it in self.collect_entity_text_items(entity, layout):
-                key = self._entity_key(it['entity'], it['field'])
-                if key in seen:
-                    continue
-                seen.add(key)
-                it['location'] = f"{layout.name}|块:{block_name}"
-                items.append(it)
-                found += 1
+            seen.add(key)
+            it['location'] = f"{layout.name}|块:{block_name}"
+            items.append(it)
+            found += 1
+        for nested_layout in nested:
+            found += self._extract_from_block_layout(nested_layout, layout, f"{block_name}>{nested_layout.name}", items, seen, depth + 1)
         return found
 
     def _extract_from_insert(self, insert, layout, include_blocks, items, seen):
@@ -762,11 +1043,21 @@ class CADChineseTranslator:
                     if key in seen:
                         continue
                     seen.add(key)
+                    if in_block_def:
+                        it['block'] = layout.name
                     items.append(it)
         return items
 
     def is_valid_text_for_translation(self, text):
-        """检查文本是否适合翻译（增强编码检查）"""
+        """检查文本是否适合翻译（增强编码检查），结果按文本缓存（超过上限时清空）"""
+        verdict = self._text_validity.get(text)
+        if verdict is None:
+            if len(self._text_validity) >= TEXT_VALIDITY_CACHE_LIMIT:
+                self._text_validity.clear()
+            verdict = self._text_validity[text] = self._check_text_validity(text)
+        return verdict
+
+    def _check_text_validity(self, text):
         if not text or not text.strip():
             return False
 
@@ -776,29 +1067,27 @@ class CADChineseTranslator:
             return False
 
         # 检查是否包含无效字符
-        invalid_chars = sum(1 for char in cleaned if not self.cleaner.is_valid_char(char))
+        invalid_chars = invalid_char_count(cleaned)
         if invalid_chars > 0:
             self.safe_log(f"发现 {invalid_chars} 个无效字符，跳过文本: \"{text[:20]}...\"")
             return False
 
         # 检查可读性
-        printable_chars = sum(1 for char in cleaned if (
-            char.isprintable() or 
-            char.isspace() or 
-            '\u4e00' <= char <= '\u9fff'
-        ))
-        if len(cleaned) > 0 and printable_chars / len(cleaned) < 0.8:
+        if readable_ratio(cleaned) < 0.8:
             return False
 
         return True
 
-    def _write_mtext_entity(self, entity, cleaned_text):
+    def _format_mtext(self, cleaned_text):
         font = getattr(self, 'default_font', 'SimSun')
         if ';' in font:
             font = "SimSun"
 
         safe_content = self.cleaner.escape_mtext_special_chars(cleaned_text)
-        formatted_text = r"{\f" + font + r"|b0|i0|c134;" + safe_content + r"}"
+        return r"{\f" + font + r"|b0|i0|c134;" + safe_content + r"}"
+
+    def _write_mtext_entity(self, entity, cleaned_text):
+        formatted_text = self._format_mtext(cleaned_text)
 
         self.safe_log(f"构造 MTEXT: {repr(formatted_text[:50])}...")
         entity.dxf.text = formatted_text
@@ -828,7 +1117,10 @@ class CADChineseTranslator:
             elif field == 'prompt' and dxftype == "ATTDEF":
                 entity.dxf.prompt = cleaned_text
 
-            elif field == 'tag' and dxftype in ("ATTDEF", "ATTRIB"):
+            elif field == 'tag' and dxftype == "ATTRIB":
+                self._document_index.set_attrib_tag(entity, cleaned_text[:255])
+
+            elif field == 'tag' and dxftype == "ATTDEF":
                 entity.dxf.tag = cleaned_text[:255]
 
             elif field == 'text' and dxftype == "MTEXT":
@@ -865,107 +1157,342 @@ class CADChineseTranslator:
             self.safe_log(f"写回失败: {e}\n{traceback.format_exc()}")
             raise
 
-    def translate_cad_file(self, input_file, output_file, lang_config, include_blocks=False, output_format="source", output_version="", resume_event=None, cancel_event=None):
+    def translate_cad_file(self, input_file, output_file, lang_config, include_blocks=False, output_format="source", output_version="", resume_event=None, cancel_event=None, prepared_input=""):
         from backend.cad import CadConversionSession
 
         wait_for_translation(resume_event, cancel_event)
-        with CadConversionSession(input_file, self.safe_log, output_format, output_version) as session:
+        with ExitStack() as stack:
+            with self.stage("convert"):
+                session = stack.enter_context(CadConversionSession(input_file, self.safe_log, output_format, output_version, prepared_input))
             work_input = session.work_input
-            work_output = session.work_output_path() or output_file
+            self._record_work_dxf(session)
+            # ``output_file`` is one path per output target when several formats/versions are requested.
+            work_output = session.work_output_path() or _first_output(output_file)
+            wait_for_translation(resume_event, cancel_event)
+            self._translate_cad_file_dxf(work_input, work_output, lang_config, include_blocks, input_file, "", resume_event, cancel_event, session.binary_work)
+            if session.needs_finalize:
+                wait_for_translation(resume_event, cancel_event)
+                with self.stage("write"):
+                    session.finalize(work_output, output_file)
+        if self._manifest:
+            self._manifest.save()
+        if self.checkpoint_path:
+            Path(self.checkpoint_path).unlink(missing_ok=True)
+
+    def translate_cad_file_modes(self, input_file, jobs, include_blocks=False, output_format="source", output_version="", resume_event=None, cancel_event=None, prepared_input=""):
+        """Convert, read and extract ``input_file`` once and write one output per translation mode.
+
+        ``jobs`` maps each mode (all sharing one source language) to ``(translator, output_file)``;
+        every mode needs its own translator, which holds that mode's checkpoint, manifest and
+        quota gate. ``self`` coordinates the stages and writes every output.
+        """
+        from backend.cad import CadConversionSession
+
+        wait_for_translation(resume_event, cancel_event)
+        with ExitStack() as stack:
+            with self.stage("convert"):
+                session = stack.enter_context(CadConversionSession(input_file, self.safe_log, output_format, output_version, prepared_input))
+            self._record_work_dxf(session)
+            work_outputs = {mode: session.work_output_path(f"work_output_{mode}") or _first_output(output_file) for mode, (_, output_file) in jobs.items()}
             wait_for_translation(resume_event, cancel_event)
-            self._translate_cad_file_dxf(work_input, work_output, lang_config, include_blocks, input_file, "", resume_event, cancel_event)
-            if session.meta.is_dwg or output_version or output_format == "dwg":
+            self._translate_cad_file_dxf_modes(session.work_input, {mode: (translator, work_outputs[mode]) for mode, (translator, _) in jobs.items()}, include_blocks, input_file, resume_event, cancel_event, session.binary_work)
+            if session.needs_finalize:
                 wait_for_translation(resume_event, cancel_event)
-                session.finalize(work_output, output_file)
+                # Finalized together so every mode sharing an ODA target version converts in one run.
+                with self.stage("write"):
+                    session.finalize_many([(work_outputs[mode], jobs[mode][1]) for mode in jobs])
+        for translator, _ in jobs.values():
+            if translator._manifest:
+                translator._manifest.save()
+            if translator.checkpoint_path:
+                Path(translator.checkpoint_path).unlink(missing_ok=True)
+
+    def _translate_cad_file_dxf_modes(self, input_file, jobs, include_blocks, source_label, resume_event, cancel_event, binary_output=False):
+        """One extraction, each mode resolved concurrently by its translator, then one write per mode."""
+        self.cancel_event = cancel_event
+        modes = list(jobs)
+        self.safe_log(f"正在读取: {source_label or input_file}（一次提取，输出 {len(modes)} 种语言: {', '.join(modes)}）")
+        doc = None
+        with self.stage("parse"):
+            items = self._streamable_text_items(input_file, jobs[modes[0]][1], "", include_blocks)
+            if items is None:
+                try:
+                    doc = ezdxf.readfile(input_file)
+                except Exception as e:
+                    self.safe_log(f"❌ 读取文件失败: {e}")
+                    raise Exception("无法读取DXF文件")
+                items = self.extract_text_entities(doc, modes[0], include_blocks=include_blocks)
+            else:
+                self.safe_log("✅ 流式读取文本 (不加载整张图纸)")
+
+        def resolve(mode):
+            translator, writes = jobs[mode][0], []
+            translator.cancel_event = cancel_event
+            # Each mode leases its own translate slot and key, since every mode calls the provider.
+            # It works on copies; the write list keeps its own copy past ``release()``.
+            with translator.stage("translate"):
+                translator._translate_items([item.copy() for item in items], mode, include_blocks, input_file, source_label, resume_event, cancel_event, lambda item, translated: writes.append((item.copy(), translated)))
+            return writes
+
+        with ThreadPoolExecutor(len(modes)) as executor:
+            resolved = dict(zip(modes, executor.map(resolve, modes)))
+
+        for index, mode in enumerate(modes):
+            output_file = jobs[mode][1]
+            wait_for_translation(resume_event, cancel_event)
+            self.safe_log(f"💾 正在保存文件 ({mode})...")
+            if doc is None:
+                plan, tag_renames = {}, {}
+                for item, translated in resolved[mode]:
+                    self._plan_streamed_value(plan, tag_renames, item, translated)
+                with self.stage("write"), atomic_output_path(output_file) as temporary_output:
+                    replaced = rewrite_dxf_text(input_file, temporary_output, plan, tag_renames, cancel_event)
+                self.safe_log(f"✅ 文件成功保存: {output_file} (流式改写 {replaced} 处文字)")
+                continue
+            if index:
+                # Later modes are applied onto a pristine copy instead of keeping a clone per mode in memory.
+                with self.stage("parse"):
+                    doc = ezdxf.readfile(input_file)
+                # Table tags are cached by handle, and the handles repeat in the re-read document.
+                self._document_index = DocumentIndex(doc)
+            for item, translated in resolved[mode]:
+                entity = item.get('entity') if index == 0 else doc.entitydb.get(item['handle'])
+                if entity is None:
+                    raise RuntimeError(f"写回 CAD 实体失败: 找不到句柄 {item['handle']!r}")
+                self.write_back_translation(entity, translated, item['field'])
+                if item['field'] == 'tag':
+                    self._sync_attrib_tags(doc, item.get('raw_source', item['original_text']), translated)
+            with self.stage("write"), atomic_output_path(output_file) as temporary_output:
+                doc.saveas(temporary_output, fmt="bin" if binary_output else "asc")
+            self.safe_log(f"✅ 文件成功保存: {output_file}")
+        self.safe_log("🎉 全部任务完成！")
 
     def _translate_cad_file_dxf(
-        self, input_file, output_file, lang_config, include_blocks=False, source_label=None, output_version="", resume_event=None, cancel_event=None
+        self, input_file, output_file, lang_config, include_blocks=False, source_label=None, output_version="", resume_event=None, cancel_event=None, binary_output=False
     ):
         display_name = source_label or input_file
+        self.cancel_event = cancel_event
         self.safe_log(f"正在读取: {display_name}")
         self.safe_log(f"当前写入字体: {self.default_font}")
-        
+
+        with self.stage("parse"):
+            items = self._streamable_text_items(input_file, output_file, output_version, include_blocks)
+        if items is not None:
+            self.safe_log("✅ 流式读取文本 (不加载整张图纸)")
+            plan, tag_renames = {}, {}
+
+            def apply_streamed(item, translated):
+                self._plan_streamed_value(plan, tag_renames, item, translated)
+
+            with self.stage("translate"):
+                self._translate_items(items, lang_config, include_blocks, input_file, source_label, resume_event, cancel_event, apply_streamed)
+            self.safe_log("💾 正在保存文件...")
+            try:
+                wait_for_translation(resume_event, cancel_event)
+                with self.stage("write"), atomic_output_path(output_file) as temporary_output:
+                    replaced = rewrite_dxf_text(input_file, temporary_output, plan, tag_renames, cancel_event)
+                self.safe_log(f"✅ 文件成功保存: {output_file} (流式改写 {replaced} 处文字)")
+            except Exception as e:
+                self.safe_log(f"❌ 文件保存失败: {e}")
+                raise e
+            self.safe_log("🎉 全部任务完成！")
+            return
+
         doc = None
-        # 自动检测编码读取
-        try:
-            doc = ezdxf.readfile(input_file) 
-            self.safe_log("✅ 成功读取文件 (自动检测编码)")
-        except Exception as e:
-            self.safe_log(f"❌ 读取文件失败: {e}")
-            raise Exception("无法读取DXF文件")
+        with self.stage("parse"):
+            # 自动检测编码读取
+            try:
+                doc = ezdxf.readfile(input_file) 
+                self.safe_log("✅ 成功读取文件 (自动检测编码)")
+            except Exception as e:
+                self.safe_log(f"❌ 读取文件失败: {e}")
+                raise Exception("无法读取DXF文件")
 
-        if doc is None:
-            raise Exception("无法读取DXF文件")
+            if doc is None:
+                raise Exception("无法读取DXF文件")
 
-        # ============================================================
-        # 🔥 核心逻辑：直接提取 (不再炸开块)
-        # ============================================================
-        # 注意：这里直接调用修改后的 extract_text_entities，它内部会处理块遍历
-        items = self.extract_text_entities(doc, lang_config, include_blocks=include_blocks)
+            # ============================================================
+            # 🔥 核心逻辑：直接提取 (不再炸开块)
+            # ============================================================
+            # 注意：这里直接调用修改后的 extract_text_entities，它内部会处理块遍历
+            items = self.extract_text_entities(doc, lang_config, include_blocks=include_blocks)
+
+        def apply_to_document(item, translated):
+            entity = item.get('entity') or self._document_index.entities[item['handle']]
+            self.write_back_translation(entity, translated, item.get('field', 'text'))
+            if item.get('field') == 'tag':
+                self._sync_attrib_tags(doc, item.get('raw_source', item['original_text']), translated)
+
+        with self.stage("translate"):
+            self._translate_items(items, lang_config, include_blocks, input_file, source_label, resume_event, cancel_event, apply_to_document)
 
         # ============================================================
-        # 执行翻译循环
+        # 保存文件
         # ============================================================
+        self.safe_log("💾 正在保存文件...")
+        try:
+            wait_for_translation(resume_event, cancel_event)
+            if output_version and output_file.lower().endswith(".dxf"):
+                doc.dxfversion = output_version
+            with self.stage("write"), atomic_output_path(output_file) as temporary_output:
+                doc.saveas(temporary_output, fmt="bin" if binary_output else "asc")
+            self.safe_log(f"✅ 文件成功保存: {output_file}")
+        except Exception as e:
+            self.safe_log(f"❌ 文件保存失败: {e}")
+            raise e
+
+        self.safe_log("🎉 全部任务完成！")
+
+    def _streamable_text_items(self, input_file, output_file, output_version, include_blocks):
+        """Scanner items when a large drawing can be written by patching tags in place, else None."""
+        if not str(output_file).lower().endswith(".dxf") or output_version:
+            return None
+        if os.path.getsize(input_file) < self.stream_rewrite_min_bytes:
+            return None
+        try:
+            items = self.scan_text_items(input_file, include_blocks)
+        except DXFScanUnsupported:
+            self.safe_log("ℹ 二进制 DXF 无法流式读取，使用完整加载写回")
+            return None
+        except Exception as e:
+            self.safe_log(f"ℹ 流式读取失败 ({e})，使用完整加载写回")
+            return None
+        unsupported = next((item for item in items if not item['handle'] or not can_stream_field(item['type'], item['field'])), None)
+        if unsupported is not None:
+            self.safe_log(f"ℹ 包含无法流式改写的文字 ({unsupported['type']}/{unsupported['field']})，使用完整加载写回")
+            return None
+        return items
+
+    def _plan_streamed_value(self, plan, tag_renames, item, translated):
+        plan.setdefault(item['handle'], {})[item['field']] = self._prepare_streamed_value(item, translated)
+        if item['field'] == 'tag':
+            tag_renames[item.get('raw_source', item['original_text'])] = plan[item['handle']]['tag']
+
+    def _prepare_streamed_value(self, item, translated):
+        cleaned_text = self.fully_clean_for_write(translated)
+        if item['type'] == 'MTEXT':
+            return self._format_mtext(cleaned_text)
+        return cleaned_text[:255] if item['field'] == 'tag' else cleaned_text
+
+    def _block_cache_basis(self):
+        return self.manifest_basis or hashlib.sha256(json.dumps([glossary_fingerprint(), self.language_assets.revision(), self.translation_provider, self.project_package_path]).encode("utf-8")).hexdigest()
+
+    @staticmethod
+    def _block_content_hash(block_items):
+        """Hash of a block definition's text-bearing fields, in definition order."""
+        content = [[item['type'], item['field'], item.get('layer', ''), item.get('raw_source', item['original_text'])] for item in block_items]
+        return hashlib.sha256(json.dumps(content, ensure_ascii=False).encode("utf-8")).hexdigest()
+
+    def _apply_block_cache(self, items, lang_config):
+        """Mark items of block definitions already translated in any drawing; return the groups that missed.
+
+        Anonymous *D/*T/*U blocks are regenerated per drawing and never looked up or stored.
+        """
+        groups = {}
+        for item in items:
+            if item.get('block') and not item['block'].upper().startswith(ANONYMOUS_BLOCK_PREFIXES):
+                groups.setdefault(item['block'], []).append(item)
+        hashed = {}
+        for block_items in groups.values():
+            hashed.setdefault(self._block_content_hash(block_items), []).append(block_items)
+        found = self.language_assets.lookup_blocks(list(hashed), lang_config, self._block_cache_basis()) if hashed else {}
+        missed, hits = {}, 0
+        for content_hash, blocks in hashed.items():
+            targets = found.get(content_hash)
+            if targets is None or len(targets) != len(blocks[0]):
+                missed[content_hash] = blocks[0]  # blocks with equal content translate alike
+                continue
+            for block_items in blocks:
+                for item, target in zip(block_items, targets):
+                    item['block_cached'] = target
+                hits += 1
+        if hits:
+            self.safe_log(f"♻ 块译文缓存命中 {hits} 个块定义")
+        return missed
+
+    def _store_block_cache(self, groups, lang_config):
+        blocks = {}
+        for content_hash, block_items in groups.items():
+            if all('translated_text' in item for item in block_items):
+                blocks[content_hash] = [item['translated_text'] for item in block_items]
+        self.language_assets.record_blocks(blocks, lang_config, self._block_cache_basis())
+
+    def _translate_items(self, items, lang_config, include_blocks, input_file, source_label, resume_event, cancel_event, apply):
+        """Resolve every item (checkpoint, manifest, then provider) and hand changed texts to ``apply``."""
         total_items = len(items)
+        if self.quota_gate and total_items:
+            estimate = self.estimate_provider_characters(items, lang_config)
+            self.safe_log(f"📊 预估需调用翻译服务: {estimate['unique']} 条, {estimate['characters']} 字符")
+            self.quota_gate(estimate)
         if total_items == 0:
             self.safe_log("⚠️ 未找到任何可翻译的文本对象。")
-        else:
-            self.safe_log(f"🚀 开始翻译，共发现 {total_items} 个文本对象...")
-            
-            successful_translations = 0
-            skipped_invalid = 0
+            return
+        self.safe_log(f"🚀 开始翻译，共发现 {total_items} 个文本对象...")
+
+        # Each unique string is checked and classified once; repeats only look their verdict up.
+        classes = {text: self.classify_text(text, lang_config) for text in dict.fromkeys(item['original_text'] for item in items) if self.is_valid_text_for_translation(text)}
+        verdicts = Counter(text_class.verdict for text_class in classes.values())
+        self.safe_log(f"🔎 预分类 {len(classes)} 条唯一文本：跳过 {verdicts['skip']}，术语候选 {verdicts['glossary']}，待翻译 {verdicts['provider']}")
+
+        successful_translations = 0
+        skipped_invalid = 0
+        block_groups = self._apply_block_cache(items, lang_config)
+        checkpoint_keys = [self._checkpoint_key(item) for item in items]
+        checkpoint = None
+        if self.checkpoint_path:
+            plan = plan_fingerprint({"mode": lang_config, "include_blocks": bool(include_blocks)}, checkpoint_keys)
+            checkpoint = TranslationCheckpoint(self.checkpoint_path, self.source_fingerprint or file_fingerprint(source_label or input_file), plan)
+            if checkpoint.resolved:
+                self.safe_log(f"♻ 从检查点继续：已有 {len(checkpoint.resolved)} 条译文")
+        manifest = self._manifest = DrawingManifest(self.manifest_path, self.manifest_basis) if self.manifest_path else None
 
+        try:
             for i, item in enumerate(items, 1):
                 wait_for_translation(resume_event, cancel_event)
                 original_text = item['original_text']
-                
-                if not self.is_valid_text_for_translation(original_text):
+                text_class = classes.get(original_text)
+
+                if text_class is None:
                     skipped_invalid += 1
                     item['translated_text'] = original_text
                     continue
 
-                translated = self.translate_text(original_text, lang_config, item.get('layer', ''))
+                key = checkpoint_keys[i - 1]
+                translated = item.get('block_cached')
+                if translated is None and checkpoint and key:
+                    translated = checkpoint.get(key)
+                # Only texts not already served by the block cache or checkpoint are diffed against the manifest.
+                if translated is None and manifest and key:
+                    translated = manifest.resolve(key, original_text)
+                if translated is None:
+                    translated = text_class.result if text_class.verdict == "skip" else self.translate_text(original_text, lang_config, item.get('layer', ''))
+                    if checkpoint and key:
+                        checkpoint.add(key, translated)
+                if manifest and key:
+                    manifest.record(key, original_text, translated)
                 item['translated_text'] = translated
 
                 if translated != original_text:
                     try:
-                        self.write_back_translation(
-                            item['entity'],
-                            translated,
-                            item.get('field', 'text'),
-                        )
-                        if item.get('field') == 'tag':
-                            self._sync_attrib_tags(
-                                doc,
-                                item.get('raw_source', original_text),
-                                translated,
-                            )
+                        apply(item, translated)
+                        item.release()
                         successful_translations += 1
                     except Exception as e:
                         self.safe_log(f" ❌ 写回实体失败: {e}", level="error")
                         raise RuntimeError(f"写回 CAD 实体失败: {e}") from e
-                
+
                 if i % 10 == 0 or i == total_items:
                     self.safe_log(f"   进度: {i}/{total_items} ({i/total_items*100:.1f}%)")
-
-            self.safe_log(f"翻译统计：成功 {successful_translations}, 跳过 {skipped_invalid}")
-
-        # ============================================================
-        # 保存文件
-        # ============================================================
-        self.safe_log("💾 正在保存文件...")
-        try:
-            wait_for_translation(resume_event, cancel_event)
-            if output_version and output_file.lower().endswith(".dxf"):
-                doc.dxfversion = output_version
-            with atomic_output_path(output_file) as temporary_output:
-                doc.saveas(temporary_output)
-            self.safe_log(f"✅ 文件成功保存: {output_file}")
-        except Exception as e:
-            self.safe_log(f"❌ 文件保存失败: {e}")
-            raise e
-
-        self.safe_log("🎉 全部任务完成！")
+        finally:
+            if checkpoint:
+                checkpoint.flush()
+        self._store_block_cache(block_groups, lang_config)
+
+        self.safe_log(f"翻译统计：成功 {successful_translations}, 跳过 {skipped_invalid}")
+        if manifest:
+            self.incremental_summary = manifest.summary()
+            counts = self.incremental_summary
+            self.safe_log(f"🔁 增量翻译：新增 {counts['added']}，修改 {counts['changed']}，删除 {counts['removed']}，复用 {counts['reused']}" + (f"，术语/记忆已更新重新解析 {counts['refreshed']}" if counts['refreshed'] else ""))
 
     # 注意：你原来的 clean_all_entities 和 write_back_translation 保持不变即可
     # 只要它们能正确处理 entity 对象，无论这个 entity 来自模型空间还是块，操作都是一样的。
@@ -8,9 +8,11 @@ from collections import deque
 from io import BytesIO
 from pathlib import Path
 from types import SimpleNamespace
+from unittest.mock import patch
 
 from backend import queue as batch_queue
 from backend import api as web_api
+from backend.key_pool import KeyPool, QuotaDeferredError, key_fingerprint
 from backend.providers.azure import AzureFreeQuotaExceededError
 from backend.storage import atomic_output_path
 from backend.api import DROPPED_FILE_RETENTION_SECONDS, SSE_QUEUE_SIZE, TranslationService
@@ -98,6 +100,16 @@ with tempfile.TemporaryDirectory() as tmp:
     assert quota_task["status"] == "failed" and quota_task["retries"] == 0
     assert "azure-key" not in batch_queue.STATE_PATH.read_text(encoding="utf-8")
 
+    deferred_queue = batch_queue.BatchQueue(lambda *_: (_ for _ in ()).throw(QuotaDeferredError("quota")), lambda _: None, lambda _: "secret")
+    deferred_queue.tasks = []
+    deferred_queue.add(["large.dxf"])
+    deferred_queue.start(settings)
+    wait_for_terminal(deferred_queue)
+    deferred_task = deferred_queue.snapshot()["tasks"][0]
+    assert deferred_task["status"] == "deferred" and deferred_task["retries"] == 0
+    deferred_queue.retry(deferred_task["id"])  # deferred drawings are re-queued explicitly
+    wait_for_terminal(deferred_queue)
+
     providers = []
     recovered_queue = batch_queue.BatchQueue(run, lambda _: None, lambda task: providers.append(task["provider"]) or "azure-key")
     recovered_queue.tasks = []
@@ -106,6 +118,161 @@ with tempfile.TemporaryDirectory() as tmp:
     wait_for_terminal(recovered_queue)
     assert providers == ["azure"]
 
+    pool = KeyPool("deepl", ["key-a", "key-b"])
+    pool.refresh_quota(lambda key: {"key-a": 10, "key-b": 500}[key])
+    with pool.task_slot() as first_key, pool.task_slot() as second_key, pool.task_slot() as third_key:
+        assert (first_key, second_key, third_key) == ("key-b", "key-a", "key-b")  # load first, then remaining quota
+        assert pool.capacity() == 4
+    with pool.request_slot("key-a") as busy, pool.request_slot() as spread:
+        assert busy == "key-b" and spread == "key-a"
+    assert pool.mark_exhausted("key-b") and pool.remaining_total() == 10
+    assert "key-a" not in str(pool.snapshot()) and pool.snapshot()[0]["key_id"] == key_fingerprint("key-a")
+    fresh_pool = KeyPool("deepl", ["key-a"])
+    with patch("backend.key_pool.time.monotonic", return_value=1.0):  # host booted a second ago
+        fresh_pool.refresh_quota(lambda key: 7)
+        assert fresh_pool.remaining_total() == 7
+        fresh_pool.update_keys(["key-a", "key-c"])  # a changed key list reloads quota at once
+        fresh_pool.refresh_quota(lambda key: 3)
+        assert fresh_pool.remaining_total() == 6
+    pooled_keys = []
+    def pooled_run(task, log, resume_event, cancel_event):
+        enqueued_key = task.get("_key")
+        with task["_stage"]("translate") as leased_key:  # keys are leased for the translate stage only
+            time.sleep(.05)
+            pooled_keys.append((leased_key, task.get("_key") == enqueued_key))  # the lease stays with its stage, not the shared task
+        return "out.dxf"
+    shared_pool = KeyPool("deepl", ["key-a", "key-b"])
+    pooled_queue = batch_queue.BatchQueue(pooled_run, lambda _: None, lambda _: "key-a", lambda _: shared_pool)
+    pooled_queue.tasks = []
+    pooled_queue.add(["a.dxf", "b.dxf"])
+    pooled_queue.start(settings)
+    deadline = time.monotonic() + 2
+    while any(task["status"] in batch_queue.ACTIVE for task in pooled_queue.snapshot()["tasks"]) and time.monotonic() < deadline:
+        time.sleep(.01)
+    assert sorted(pooled_keys) == [("key-a", True), ("key-b", True)]  # concurrent files are spread over the pool
+
+    staged, provider_reply = [], threading.Event()
+    def staged_run(task, log, resume_event, cancel_event):
+        for name in ("convert", "parse"):
+            with task["_stage"](name):
+                staged.append((name, task["input_file"]))
+        with task["_stage"]("translate"):
+            staged.append(("translate", task["input_file"]))
+            provider_reply.wait(2)
+        return "out.dxf"
+    staged_queue = batch_queue.BatchQueue(staged_run, lambda _: None, lambda _: "secret")
+    staged_queue.tasks = []
+    staged_queue.max_running = 1
+    staged_queue.add(["first.dxf", "second.dxf"])
+    staged_queue.start(settings)
+    deadline = time.monotonic() + 2
+    while staged_queue.snapshot()["stages"]["translate"]["waiting"] != 1 and time.monotonic() < deadline:
+        time.sleep(.01)
+    # The next drawing is converted and parsed while the first one waits on the provider.
+    assert ("parse", "second.dxf") in staged and ("translate", "second.dxf") not in staged
+    assert staged_queue.snapshot()["stages"]["translate"] == {"running": 1, "waiting": 1, "limit": 1}
+    provider_reply.set()
+    deadline = time.monotonic() + 2
+    while any(task["status"] in batch_queue.ACTIVE for task in staged_queue.snapshot()["tasks"]) and time.monotonic() < deadline:
+        time.sleep(.01)
+    assert [task["status"] for task in staged_queue.snapshot()["tasks"]] == ["succeeded", "succeeded"]
+    assert not any(stage["running"] or stage["waiting"] for stage in staged_queue.snapshot()["stages"].values())
+
+    key_reply = threading.Event()
+    def keyed_run(task, log, resume_event, cancel_event):
+        with task["_stage"]("translate"):
+            key_reply.wait(2)
+        return "out.dxf"
+    keyed_queue = batch_queue.BatchQueue(keyed_run, lambda _: None, lambda _: "secret")
+    keyed_queue.tasks = []
+    keyed_queue.set_limits(max_running=2, per_key=1)
+    keyed_queue.add(["first.dxf", "second.dxf"])
+    keyed_queue.start(settings)
+    deadline = time.monotonic() + 2
+    while keyed_queue.snapshot()["workers"]["busy"] != 2 and time.monotonic() < deadline:
+        time.sleep(.01)
+    time.sleep(.05)
+    # The second file waits for the shared key without taking the free translate slot.
+    assert keyed_queue.snapshot()["stages"]["translate"] == {"running": 1, "waiting": 0, "limit": 2}
+    key_reply.set()
+    deadline = time.monotonic() + 2
+    while any(task["status"] in batch_queue.ACTIVE for task in keyed_queue.snapshot()["tasks"]) and time.monotonic() < deadline:
+        time.sleep(.01)
+    assert [task["status"] for task in keyed_queue.snapshot()["tasks"]] == ["succeeded", "succeeded"]
+
+    order, release = [], threading.Event()
+    def ordered_run(task, log, resume_event, cancel_event):
+        release.wait(2)
+        order.append(Path(task["input_file"]).stem)
+        return "out.dxf"
+    priority_queue = batch_queue.BatchQueue(ordered_run, lambda _: None, lambda _: "secret")
+    priority_queue.tasks = []
+    priority_queue.set_limits(workers=1)
+    priority_queue.add([f"batch{index}.dxf" for index in range(4)])
+    priority_queue.start(settings)
+    deadline = time.monotonic() + 2
+    while priority_queue.snapshot()["workers"]["busy"] != 1 and time.monotonic() < deadline:
+        time.sleep(.01)
+    priority_queue.add(["urgent.dxf"], priority="interactive")
+    assert priority_queue.snapshot()["workers"] == {"size": 1, "busy": 1}  # a fixed pool, not a thread per file
+    release.set()
+    deadline = time.monotonic() + 2
+    while any(task["status"] in batch_queue.ACTIVE for task in priority_queue.snapshot()["tasks"]) and time.monotonic() < deadline:
+        time.sleep(.01)
+    assert order == ["batch0", "urgent", "batch1", "batch2", "batch3"]  # the interactive file jumps the batch
+    assert not priority_queue.snapshot()["started"]
+    assert priority_queue.set_limits(capacity=6)["effective"]["max_running"] == 6  # follows the key pools
+    assert priority_queue.stages.limits["translate"] == 6
+    limits = priority_queue.set_limits(workers=0, max_running=5, per_provider={"azure": 1})
+    assert limits["effective"] == {"workers": 5 + batch_queue.PIPELINE_DEPTH, "max_running": 5}
+    assert priority_queue.stages.limits["translate"] == 5 and priority_queue.provider_slots.limit("azure") == 1
+    assert priority_queue.set_limits(per_provider={"azure": 0})["per_provider"] == {}
+    try:
+        priority_queue.set_limits(per_key=0)
+        raise AssertionError("a key needs at least one slot")
+    except ValueError:
+        pass
+
+    sized = []
+    for name, size in (("small.dxf", 100_000), ("medium.dwg", 1 << 20), ("large.dxf", 3 << 20)):
+        with open(Path(tmp) / name, "wb") as handle:
+            handle.truncate(size)
+        sized.append(str(Path(tmp) / name))
+    def scheduled_order(policy, fairness, files=sized):
+        order.clear()
+        cost_queue = batch_queue.BatchQueue(ordered_run, lambda _: None, lambda _: "secret")
+        cost_queue.tasks = []
+        cost_queue.set_limits(workers=1)
+        cost_queue.set_policy(policy, fairness)
+        release.clear()
+        cost_queue.add(files)
+        cost_queue.start(settings)
+        eta = cost_queue.snapshot()["eta_seconds"]
+        release.set()
+        deadline = time.monotonic() + 2
+        while any(task["status"] in batch_queue.ACTIVE for task in cost_queue.snapshot()["tasks"]) and time.monotonic() < deadline:
+            time.sleep(.01)
+        assert eta > 0 and cost_queue.snapshot()["eta_seconds"] is None
+        return order[:]
+    assert scheduled_order("lpt", 0) == ["large", "medium", "small"]  # the longest drawing does not finish the batch alone
+    assert scheduled_order("spt", 0) == ["small", "medium", "large"]
+    assert scheduled_order("lpt", 1) == ["large", "small", "medium"]  # the aging guard lets the oldest file through
+    rising = []
+    for index in range(20):
+        with open(Path(tmp) / f"f{index:02d}.dxf", "wb") as handle:
+            handle.truncate((index + 1) << 18)
+        rising.append(str(Path(tmp) / f"f{index:02d}.dxf"))
+    # Only overtakes of the file at the head of the arrival order count, so the policy shapes the whole batch.
+    lpt_order = [f"f{index:02d}" for index in [*range(19, 11, -1), 0, *range(11, 3, -1), 1, 3, 2]]
+    assert scheduled_order("lpt", 8, rising) == lpt_order
+    spt_order = [f"f{index:02d}" for index in range(20)]
+    assert scheduled_order("spt", 8, list(reversed(rising))) == spt_order[:8] + ["f19"] + spt_order[8:16] + ["f18", "f16", "f17"]
+    try:
+        priority_queue.set_policy("random")
+        raise AssertionError("unknown policies are rejected")
+    except ValueError:
+        pass
+
     dropped_service = object.__new__(TranslationService)
     dropped_service.dropped_files_dir = Path(tmp) / "dropped"
     dropped = TranslationService.save_dropped_files(
@@ -22,6 +22,7 @@ with tempfile.TemporaryDirectory() as tmp:
     assets.upsert_memory("fr_to_zh", "memory label", "人工译文", "ELEC")
     assets.record_memory("memory label", "接口新译文", "fr_to_zh", "ELEC", "azure")
     assert assets.lookup_memory("memory label", "fr_to_zh", "ELEC") == "人工译文"
+    assert assets.revision() == 2  # user edits only; provider results leave the output cache valid
 
     translator = CADChineseTranslator(log_callback=lambda *_args, **_kwargs: None)
     translator.language_assets = assets
@@ -2,16 +2,23 @@
 
 import os
 import tempfile
+import threading
 import unittest
 from pathlib import Path
 from types import SimpleNamespace
 from unittest.mock import patch
 
+import ezdxf
+from ezdxf.lldxf.validator import is_binary_dxf_file
+
 from backend import cad
 from backend.api import system_accent_theme
+from backend.output_cache import OutputCache
 from desktop.launcher import _webview_gui
 from desktop.native_bridge import NativeBridge
 from backend.api import TranslationService
+from backend.dxf_rewrite import rewrite_dxf_text
+from backend.dxf_scan import scan_dxf_text
 
 
 class PlatformCompatibilityTests(unittest.TestCase):
@@ -109,6 +116,296 @@ class PlatformCompatibilityTests(unittest.TestCase):
             self.assertEqual(command[-1], "input.dwg")
             self.assertEqual(destination.read_bytes(), b"dxf")
 
+    def test_concurrent_and_queued_conversions_share_one_oda_run(self):
+        started, release = threading.Event(), threading.Event()
+
+        def fake_folder_run(input_dir, output_dir, *, version, output_format, audit=True, file_filter=""):
+            started.set()
+            release.wait(5)
+            for path in Path(input_dir).iterdir():
+                (Path(output_dir) / f"{path.stem}.{output_format.lower()}").write_bytes(path.read_bytes() + version.encode())
+
+        with tempfile.TemporaryDirectory() as root, patch("backend.cad.run_odafc_folder", side_effect=fake_folder_run) as run:
+            sources = []
+            for index in range(4):
+                sources.append(Path(root) / f"图纸{index}.dxf")
+                sources[-1].write_bytes(f"drawing {index} ".encode())
+            converter = cad.OdaBulkConverter(window=0.2)
+            release.set()
+            converter.convert_all([(str(source), str(source.with_suffix(".dwg")), "ACAD2013") for source in sources[:3]])
+            self.assertEqual(run.call_count, 1)
+            self.assertEqual([source.with_suffix(".dwg").read_bytes() for source in sources[:3]], [f"drawing {index} ACAD2013".encode() for index in range(3)])
+
+            # A lone conversion on an idle converter does not wait for company.
+            idle = cad.OdaBulkConverter(window=30)
+            with patch("backend.cad.convert_with_odafc") as single, patch("backend.cad.time.sleep") as sleep:
+                idle.convert(str(sources[0]), str(Path(root) / "alone.dwg"), version="ACAD2013")
+            self.assertEqual((single.call_count, sleep.call_count), (1, 0))
+
+            # Requests arriving while a run is busy share the next run.
+            run.reset_mock()
+            started.clear()
+            release.clear()
+            with patch("backend.cad.convert_with_odafc") as first:
+                first.side_effect = lambda *args, **kwargs: (started.set(), release.wait(5))
+                threads = [threading.Thread(target=converter.convert, args=(str(sources[3]), str(Path(root) / "first.dxf")), kwargs={"version": "ACAD2013"})]
+                threads[0].start()
+                started.wait(5)
+                threads += [threading.Thread(target=converter.convert, args=(str(source), str(source.with_suffix(".dwg"))), kwargs={"version": "ACAD2013"}) for source in sources[:3]]
+                for thread in threads[1:]:
+                    thread.start()
+                threading.Event().wait(0.05)
+                release.set()
+                for thread in threads:
+                    thread.join()
+            self.assertEqual((first.call_count, run.call_count), (1, 1))
+
+            run.reset_mock()
+            for source in sources[:3]:
+                source.with_suffix(".dwg").rename(Path(root) / f"queued_{source.stem}.dwg")
+            queued = [str(Path(root) / f"queued_{source.stem}.dwg") for source in sources[:3]]
+            cache = OutputCache(Path(root) / "work_cache")
+            prefetch = cad.DwgPrefetch()
+            release.clear()
+            with patch("backend.cad.require_odafc"), patch("backend.cad.work_dxf_cache", cache):
+                thread = prefetch.prepare(queued + queued[:1], ahead=3)
+                self.assertTrue(started.wait(5))  # the conversion runs in the background, prepare returned
+                self.assertIsNone(prefetch.prepare(queued, ahead=3))  # already in flight
+                release.set()
+                self.assertEqual(prefetch.take(queued[1]), "")  # moved into the cache rather than kept twice
+                thread.join()
+                with patch.object(cache, "lookup", wraps=cache.lookup) as lookup:
+                    self.assertIsNone(prefetch.prepare(queued, ahead=3))
+                self.assertEqual(lookup.call_count, 0)  # later task starts do not look the batch up again
+            self.assertEqual(run.call_count, 1)
+            self.assertEqual(cache.lookup(cad.work_dxf_cache_key(queued[1])).read_bytes(), b"drawing 1 ACAD2013ACAD2010")
+
+            # Without a cache the files are kept for their tasks, and dropped once a task leaves the queue.
+            prefetch = cad.DwgPrefetch()
+            started.clear()
+            release.clear()
+            with patch("backend.cad.require_odafc"), patch("backend.cad.work_dxf_cache", OutputCache(Path(root) / "off", limit_bytes=0)):
+                thread = prefetch.prepare(queued, ahead=3)
+                self.assertTrue(started.wait(5))
+                prefetch.retain(queued[1:])
+                release.set()
+                work_input = prefetch.take(queued[1])
+                thread.join()
+            self.assertEqual(Path(work_input).read_bytes(), b"drawing 1 ACAD2013ACAD2010")
+            self.assertEqual(prefetch.take(queued[1]), "")
+            self.assertEqual(prefetch.take(queued[0]), "")  # its task left the queue during the run
+            leftover = prefetch._ready[prefetch._key(queued[2])]
+            prefetch.retain([])
+            self.assertFalse(Path(leftover).exists())
+            Path(work_input).unlink()
+            prefetch.clear()
+
+    def test_prefetch_converts_the_next_queued_dwgs_a_chunk_at_a_time(self):
+        staged = []
+
+        def fake_folder_run(input_dir, output_dir, *, version, output_format, audit=True, file_filter=""):
+            staged.append(sorted(path.read_bytes() for path in Path(input_dir).iterdir()))
+            for path in Path(input_dir).iterdir():
+                (Path(output_dir) / f"{path.stem}.{output_format.lower()}").write_bytes(b"0" * 22 if output_format == "DXB" else b"dxf")
+
+        with tempfile.TemporaryDirectory() as root, patch("backend.cad.run_odafc_folder", side_effect=fake_folder_run), patch("backend.cad.require_odafc"):
+            queued = []
+            for index in range(5):
+                queued.append(str(Path(root) / f"queued_{index}.dwg"))
+                Path(queued[-1]).write_bytes(f"dwg {index}".encode())
+            prefetch = cad.DwgPrefetch()
+            with patch("backend.cad.work_dxf_cache", OutputCache(Path(root) / "off", limit_bytes=0)):
+                prefetch.prepare(queued).join()
+                self.assertEqual(staged, [[b"dwg 0", b"dwg 1"]])  # PIPELINE_DEPTH files ahead, not the whole queue
+                self.assertEqual(prefetch.take(queued[2]), "")
+                prefetch.prepare(queued[3:]).join()
+                self.assertEqual(staged[1:], [[b"dwg 3", b"dwg 4"]])
+                prefetch.clear()
+
+                # Binary and ASCII work DXFs of one chunk; take derives the work format the way prepare did, and
+                # a file kept in the format this task no longer uses is removed rather than orphaned.
+                prefetch = cad.DwgPrefetch()
+                with patch("backend.cad._is_binary_work_dxf", return_value=True):
+                    prefetch.prepare(queued[:3], binary=set(queued[1:3]), ahead=3).join()
+                binary_input = prefetch.take(queued[1], binary=True)
+                self.assertTrue(binary_input.endswith(".dxb"))
+                orphan = prefetch._ready[prefetch._key(queued[2], binary=True)]
+                with patch("backend.cad.binary_work_dxf_supported", False):
+                    self.assertEqual(prefetch.take(queued[2], binary=True), "")
+                self.assertFalse(Path(orphan).exists())
+                ascii_input = prefetch.take(queued[0])
+                self.assertTrue(ascii_input.endswith(".dxf"))
+            for work_input in (binary_input, ascii_input):
+                Path(work_input).unlink()
+
+    def test_oda_pool_bounds_concurrent_conversions(self):
+        active, peak, lock = [0], [0], threading.Lock()
+
+        def fake_run(worker, arguments):
+            with lock:
+                active[0] += 1
+                peak[0] = max(peak[0], active[0])
+            threading.Event().wait(0.05)
+            with lock:
+                active[0] -= 1
+
+        pool = cad.OdaPool(2)
+        with tempfile.TemporaryDirectory() as root, patch("backend.cad.oda_pool", pool), patch("backend.cad.sys.platform", "linux"), patch("backend.cad._run_odafc", side_effect=fake_run):
+            threads = [threading.Thread(target=cad.run_odafc_folder, args=(root, root), kwargs={"version": "ACAD2010", "output_format": "DXF"}) for _ in range(5)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        self.assertEqual((peak[0], pool.busy, len(pool._idle)), (2, 0, 2))
+        with patch("backend.cad.shutil.which", return_value=None):
+            self.assertEqual(pool._idle[0].environment().get("DISPLAY"), os.environ.get("DISPLAY"))
+        pool.shutdown()
+
+        # A worker busy at shutdown is stopped when its conversion returns instead of going back to the pool.
+        pool = cad.OdaPool(1)
+        with patch.object(cad._OdaWorker, "stop") as stop:
+            with pool.worker():
+                pool.shutdown()
+                self.assertEqual(stop.call_count, 0)
+            self.assertEqual((stop.call_count, pool._idle), (1, []))
+
+    def test_unchanged_dwg_reuses_cached_work_dxf_without_oda(self):
+        def fake_convert(source, target, *, version, audit=True):
+            Path(target).write_bytes(Path(source).read_bytes() + version.encode())
+
+        with tempfile.TemporaryDirectory() as root, patch("backend.cad.oda_bulk.convert", side_effect=fake_convert) as convert, patch("backend.cad.require_odafc") as require:
+            source = Path(root) / "plan.dwg"
+            source.write_bytes(b"AC1027 drawing")
+            for attempt in range(2):
+                # A fresh cache object over the same folder stands in for an app restart.
+                with patch("backend.cad.work_dxf_cache", OutputCache(Path(root) / "work_cache")):
+                    with cad.CadConversionSession(str(source), output_format="dxf") as session:
+                        self.assertEqual(Path(session.work_input).read_bytes(), b"AC1027 drawingACAD2010")
+            self.assertEqual((convert.call_count, require.call_count), (1, 1))
+            source.write_bytes(b"AC1027 revised plan")
+            with patch("backend.cad.work_dxf_cache", OutputCache(Path(root) / "work_cache")), cad.CadConversionSession(str(source), output_format="dxf") as session:
+                self.assertEqual(Path(session.work_input).read_bytes(), b"AC1027 revised planACAD2010")
+            self.assertEqual(convert.call_count, 2)
+
+    def test_translated_dxf_is_finalized_into_every_output_target(self):
+        def fake_folder_run(input_dir, output_dir, *, version, output_format, audit=True, file_filter=""):
+            for path in Path(input_dir).iterdir():
+                (Path(output_dir) / f"{path.stem}.{output_format.lower()}").write_bytes(path.read_bytes() + version.encode())
+
+        self.assertEqual(cad.output_targets(["dxf", "dwg", "dwg"], ["", "ACAD2013", "ACAD2018"])[1:], [("dwg", "ACAD2013"), ("dwg", "ACAD2018")])
+        self.assertEqual(cad.output_targets("dwg", ["ACAD2013", "ACAD2018"]), [("dwg", "ACAD2013"), ("dwg", "ACAD2018")])
+        with self.assertRaises(ValueError):
+            cad.output_targets(["dxf", "dwg"], ["", "ACAD2013", "ACAD2018"])
+        with (
+            tempfile.TemporaryDirectory() as root,
+            patch("backend.cad.sys.platform", "linux"),
+            patch("backend.cad.run_odafc_folder", side_effect=fake_folder_run) as run,
+            patch("backend.cad.require_odafc"),
+        ):
+            source = Path(root) / "plan.dxf"
+            source.write_bytes(b"source")
+            outputs = [Path(root) / "fr_plan.dxf", Path(root) / "fr_plan_ACAD2013.dwg", Path(root) / "fr_plan_ACAD2018.dwg"]
+            with cad.CadConversionSession(str(source), output_format=["dxf", "dwg", "dwg"], output_version=["", "ACAD2013", "ACAD2018"]) as session:
+                work_output = session.work_output_path()
+                Path(work_output).write_bytes(b"translated ")
+                session.finalize(work_output, [str(path) for path in outputs])
+                self.assertEqual([path.read_bytes() for path in outputs], [b"translated ", b"translated ACAD2013", b"translated ACAD2018"])
+                self.assertEqual(run.call_count, 2)  # one ODA run per target version, started together
+
+                run.side_effect = OSError("ODA crashed")
+                retried = [path.with_name(f"en_{path.name[3:]}") for path in outputs]
+                with self.assertRaises(OSError):
+                    session.finalize(work_output, [str(path) for path in retried])
+            self.assertFalse(any(path.exists() for path in retried))  # outputs are published together or not at all
+
+    def test_dwg_work_files_are_binary_dxf_with_ascii_fallback(self):
+        doc = ezdxf.new("R2010")
+        text = doc.modelspace().add_text("总平面图")
+        for row in range(50):
+            doc.modelspace().add_line((0, row), (10, row))
+
+        def fake_convert(source, target, *, version, audit=True):
+            doc.saveas(target, fmt="bin" if target.endswith(".dxb") else "asc")
+
+        with (
+            tempfile.TemporaryDirectory() as root,
+            patch("backend.cad.oda_bulk.convert", side_effect=fake_convert) as convert,
+            patch("backend.cad.require_odafc"),
+            patch("backend.cad.work_dxf_cache", OutputCache(Path(root) / "work_cache")),
+            patch("backend.cad.binary_work_dxf_supported", True),
+        ):
+            source = Path(root) / "plan.dwg"
+            source.write_bytes(b"AC1027 drawing")
+            with cad.CadConversionSession(str(source), output_format="source") as session:
+                self.assertTrue(session.binary_work)
+                self.assertEqual([record["text"] for record in scan_dxf_text(session.work_input)], ["总平面图"])
+                work_output = session.work_output_path()
+                self.assertEqual(rewrite_dxf_text(session.work_input, work_output, {text.dxf.handle: {"text": "Site plan"}}), 1)
+                self.assertTrue(is_binary_dxf_file(work_output))
+                self.assertEqual(ezdxf.readfile(work_output).entitydb[text.dxf.handle].dxf.text, "Site plan")
+            # A plain DXF target publishes the work DXF itself, so it stays ASCII.
+            with cad.CadConversionSession(str(source), output_format="dxf") as session:
+                self.assertFalse(session.binary_work or is_binary_dxf_file(session.work_input))
+
+            convert.side_effect = lambda source, target, **options: None if target.endswith(".dxb") else fake_convert(source, target, **options)
+            fallbacks = []
+            with patch("backend.cad._binary_work_dxf_failures", 0), patch("backend.cad.BINARY_WORK_DXF_FAILURE_LIMIT", 2):
+                for revision in range(3):
+                    source.write_bytes(f"AC1027 revision {revision}".encode())
+                    with cad.CadConversionSession(str(source), output_format="dwg") as session:
+                        self.assertFalse(session.binary_work or is_binary_dxf_file(session.work_input))
+                    fallbacks.append(session.binary_fallback)
+                    # One failed DXB export does not give up binary work files; the second in a row does.
+                    self.assertEqual(cad.binary_work_dxf_supported, revision == 0)
+            self.assertEqual(fallbacks[0], "ODA 未生成二进制 DXF")
+            self.assertIn("之后的 DXF 中间文件改用 ASCII 格式", fallbacks[1])
+            self.assertEqual(fallbacks[2], "")  # later DWGs skip the DXB attempt
+            self.assertEqual([Path(call.args[1]).suffix for call in convert.call_args_list], [".dxb", ".dxf", ".dxb", ".dxf", ".dxb", ".dxf", ".dxf"])
+
+    def test_single_binary_dxf_conversion_uses_the_folder_run_on_windows(self):
+        def fake_folder_run(input_dir, output_dir, *, version, output_format, audit=True, file_filter=""):
+            for path in Path(input_dir).iterdir():
+                (Path(output_dir) / f"{path.stem}.dxb").write_bytes(path.read_bytes() + output_format.encode())
+
+        with (
+            tempfile.TemporaryDirectory() as root,
+            patch("backend.cad.sys.platform", "win32"),
+            patch("backend.cad.run_odafc_folder", side_effect=fake_folder_run) as run,
+            patch("ezdxf.addons.odafc.convert", side_effect=AssertionError("ezdxf only writes .dxf/.dwg")),
+        ):
+            source, destination = Path(root) / "plan.dwg", Path(root) / "work.dxb"
+            source.write_bytes(b"dwg ")
+            cad.convert_with_odafc(str(source), str(destination), version="ACAD2010", replace=True)
+            self.assertEqual((destination.read_bytes(), run.call_count), (b"dwg DXB", 1))
+
+    def test_oda_discovery_is_cached_until_invalidated(self):
+        with (
+            tempfile.TemporaryDirectory() as root,
+            patch("backend.cad._oda_discovery", None),
+            patch("backend.cad.shutil.which", return_value=None),
+            patch("backend.cad.odafc_candidate_paths", wraps=cad.odafc_candidate_paths) as candidates,
+            patch("ezdxf.options.set"),
+            patch("ezdxf.addons.odafc.is_installed", return_value=True),
+        ):
+            first, second = Path(root) / "a" / "ODAFileConverter", Path(root) / "b" / "ODAFileConverter"
+            for path in (first, second):
+                path.parent.mkdir()
+                path.write_bytes(b"")
+            with patch.dict(os.environ, {"CAD_ODA_EXEC": str(first)}):
+                # A 500-file DWG batch validates against one discovery.
+                self.assertTrue(all(cad.odafc_available() for _ in range(500)))
+                self.assertEqual(cad.odafc_status()["source"], "env")
+                self.assertEqual(candidates.call_count, 1)
+                os.environ["CAD_ODA_EXEC"] = str(second)
+                self.assertEqual(cad.resolve_odafc_path(), str(second.resolve()))
+                second.unlink()
+                self.assertFalse(cad.odafc_available())
+                second.write_bytes(b"")
+                self.assertFalse(cad.odafc_available())  # a missing ODA is remembered until refreshed
+                self.assertEqual(candidates.call_count, 3)
+                self.assertTrue(cad.odafc_status(refresh=True)["installed"])
+                self.assertEqual(candidates.call_count, 4)
+
     def test_oda_working_dxf_uses_an_oda_output_identifier(self):
         self.assertEqual(cad.WORK_DXF_VERSION, "ACAD2010")
         self.assertIn(cad.WORK_DXF_VERSION, cad.ODA_OUTPUT_VERSIONS)
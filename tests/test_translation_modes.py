@@ -1,20 +1,39 @@
 import json
+import os
 import unittest
 import tempfile
+import threading
+import deepl
+from contextlib import ExitStack, contextmanager
 import ezdxf
 from io import BytesIO
+from pathlib import Path
 from types import SimpleNamespace
-from unittest.mock import patch
+from unittest.mock import call, patch
 from urllib.error import HTTPError
 from ezdxf.lldxf.types import DXFTag
 
+from backend.key_pool import KeyPool, QuotaDeferredError, key_fingerprint
 from backend.providers.azure import AzureFreeQuotaExceededError, AzureTranslator, AzureTranslatorError
-from backend.language_assets import LanguageAssets
+from backend.language_assets import AZURE_F0_MONTHLY_CHARACTER_LIMIT, LanguageAssets
+from backend.output_cache import OutputCache
+from backend.storage import file_fingerprint
 from backend import translator
-from backend.translator import CADChineseTranslator, decode_oda_mbcs_escapes, output_prefix
+from backend.translator import ITEM_RETRY_ATTEMPTS, CADChineseTranslator, ProviderRequestError, decode_oda_mbcs_escapes, is_retryable_provider_error, output_prefix
+from tools.mock_provider_server import start_mock_server
 from backend.api import BatchStartBody, TranslateBody, app, builtin_terms, default_output_name, service, start_batch
 
 
+def insert_acad_table(path, owner, handle, cells, encoding="utf-8"):
+    """Insert an ``ACAD_TABLE``, as the first entity, whose ``AcDbTable`` subclass holds ``cells`` as 302 tags; ezdxf cannot create one."""
+    tags = ["0", "ACAD_TABLE", "5", handle, "330", owner, "100", "AcDbEntity", "8", "0", "100", "AcDbBlockReference", "2", "*T1", "10", "0.0", "20", "0.0", "30", "0.0", "100", "AcDbTable", "280", "0", "91", str(len(cells))]
+    for cell in cells:
+        tags += ["302", cell]
+    content = Path(path).read_text(encoding=encoding)
+    start = content.index("ENTITIES\n") + len("ENTITIES\n")
+    Path(path).write_text(content[:start] + "".join(f"{code:>3}\n{value}\n" for code, value in zip(tags[::2], tags[1::2])) + content[start:], encoding=encoding)
+
+
 class TranslationModeTests(unittest.TestCase):
     def setUp(self):
         self.assets_tmp = tempfile.TemporaryDirectory()
@@ -48,13 +67,57 @@ class TranslationModeTests(unittest.TestCase):
         self.assertFalse(raised.exception.retryable)
 
     def test_azure_invalid_request_and_key_are_not_retryable(self):
-        for status in (400, 401, 403):
+        for status, retryable in ((400, False), (401, False), (403, False), (404, False), (429, True), (503, True)):
             error = HTTPError("https://example.test", status, "Request failed", None, BytesIO(b'{"error":{"code":400000,"message":"invalid"}}'))
             with patch("backend.providers.azure.urllib.request.urlopen", side_effect=error):
                 with self.assertRaises(AzureTranslatorError) as raised:
                     AzureTranslator("key").translate_text("文本", "zh-cn", "fr")
             error.close()
-            self.assertFalse(raised.exception.retryable)
+            self.assertEqual(raised.exception.retryable, retryable, status)
+
+    def test_only_provider_and_network_failures_are_retryable(self):
+        retryable = [TimeoutError("timed out"), ConnectionResetError("reset"), deepl.exceptions.TooManyRequestsException("429"), deepl.exceptions.DeepLException("bad gateway", http_status_code=502)]
+        final = [ValueError("bug"), KeyError("translations"), deepl.exceptions.DeepLException("bad request", http_status_code=400), deepl.exceptions.AuthorizationException("key"), ProviderRequestError("item failed")]
+        self.assertEqual([is_retryable_provider_error(exc) for exc in retryable + final], [True] * len(retryable) + [False] * len(final))
+
+    def test_providers_can_be_pointed_at_the_local_mock_server(self):
+        server = start_mock_server(quota=10)
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+        overrides = {"CAD_DEEPL_SERVER_URL": server.base_url, "CAD_AZURE_ENDPOINT": f"{server.base_url}/translate"}
+        with patch.dict(os.environ, overrides):
+            translator = CADChineseTranslator(log_callback=lambda *args, **kwargs: None)
+            translator.deepl_api_key = "mock-deepl"
+            self.assertEqual(translator.translate_text("水泥结构", "zh_to_en"), "[EN-US] 水泥结构")
+            self.assertEqual(service.deepl_usage("mock-deepl"), {"available": True, "characters": 4, "limit": 10})
+            azure = AzureTranslator("mock-azure")
+            self.assertEqual(azure.translate_text("水泥结构墙体", "zh-cn", "fr"), "[FR] 水泥结构墙体")
+            with self.assertRaises(AzureFreeQuotaExceededError):
+                azure.translate_text("水泥结构墙体", "zh-cn", "fr")
+
+    def test_recorded_provider_journal_replays_without_network(self):
+        server = start_mock_server()
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+        journal = f"{self.assets_tmp.name}/journal.jsonl"
+        with patch.dict(os.environ, {"CAD_DEEPL_SERVER_URL": server.base_url, "CAD_PROVIDER_JOURNAL": f"record:{journal}"}), patch("backend.translator.time.sleep"):
+            recorder = CADChineseTranslator(log_callback=lambda *args, **kwargs: None)
+            recorder.deepl_api_key = "mock-deepl"
+            self.assertEqual(recorder.translate_text("水泥结构", "zh_to_fr"), "[FR] 水泥结构")
+        with open(journal, encoding="utf-8") as handle:
+            entry = json.loads(handle.readline())
+        self.assertEqual((entry["p"], entry["m"], entry["t"], entry["r"]), ("deepl", "zh-cn>fr", "水泥结构", "[FR] 水泥结构"))
+        self.assertNotIn("mock-deepl", json.dumps(entry))
+
+        self.assets.delete_memory(self.assets.list_memory()[0]["id"])
+        with patch.dict(os.environ, {"CAD_PROVIDER_JOURNAL": f"replay-fast:{journal}"}), patch("backend.translator.time.sleep") as sleep:
+            replayer = CADChineseTranslator(log_callback=lambda *args, **kwargs: None)
+            self.assertIsNone(replayer.deepl_translator)
+            self.assertEqual(replayer.translate_text("水泥结构", "zh_to_fr"), "[FR] 水泥结构")
+            with self.assertRaisesRegex(RuntimeError, "回放日志中没有该请求"):
+                replayer.translate_text("钢结构", "zh_to_fr")
+        sleep.assert_not_called()
+        self.assertEqual(replayer.provider_replay.requests, 2)
 
     def test_deepl_language_pairs_and_output_prefixes(self):
         translator = CADChineseTranslator()
@@ -182,8 +245,35 @@ class TranslationModeTests(unittest.TestCase):
             translator = CADChineseTranslator(log_callback=lambda *args, **kwargs: None)
             translator.language_assets = LanguageAssets(f"{tmp}/assets.sqlite3")
             translator.deepl_translator = Translator()
-            with self.assertRaisesRegex(RuntimeError, "DeepL 翻译失败"):
+            with self.assertRaisesRegex(RuntimeError, "DeepL 翻译失败") as raised, patch("backend.translator.time.sleep") as sleep:
                 translator.translate_text("水泥结构", "zh_to_en")
+        self.assertFalse(raised.exception.retryable)  # item retries already ran; the queue must not restart the file
+        self.assertEqual(sleep.call_count, ITEM_RETRY_ATTEMPTS - 1)
+
+    def test_transient_provider_failure_is_retried_per_item(self):
+        calls = []
+
+        class Translator:
+            def translate_text(self, text, **kwargs):
+                calls.append(text)
+                if len(calls) < 3:
+                    raise OSError("connection reset")
+                return SimpleNamespace(text="cement structure")
+
+        translator = CADChineseTranslator(log_callback=lambda *args, **kwargs: None)
+        translator.deepl_translator = Translator()
+        translator.cancel_event = threading.Event()
+        with patch.object(translator.cancel_event, "wait", return_value=False) as wait:
+            self.assertEqual(translator.translate_text("水泥结构", "zh_to_en"), "cement structure")
+        self.assertEqual(len(calls), 3)
+        delays = [call.args[0] for call in wait.call_args_list]
+        self.assertTrue(.5 <= delays[0] <= 1 and 1 <= delays[1] <= 2)
+
+        translator.cancel_event.set()
+        calls.clear()
+        with self.assertRaises(InterruptedError):
+            translator.translate_text("钢结构", "zh_to_en")
+        self.assertEqual(len(calls), 1)
 
     def test_azure_f0_quota_error_reaches_the_queue(self):
         translator = CADChineseTranslator(log_callback=lambda *args, **kwargs: None)
@@ -192,6 +282,459 @@ class TranslationModeTests(unittest.TestCase):
             with self.assertRaises(AzureFreeQuotaExceededError):
                 translator.translate_text("水泥结构", "zh_to_en")
 
+    def test_key_pool_moves_to_next_key_when_azure_quota_is_spent(self):
+        calls = []
+
+        def translate(self, text, source, target):
+            calls.append(self.key)
+            if self.key == "spent":
+                raise AzureFreeQuotaExceededError("Azure Translator F0 免费额度已用尽")
+            return "cement structure"
+
+        translator = CADChineseTranslator(log_callback=lambda *args, **kwargs: None)
+        translator.configure_azure("spent", "eastus")
+        pool = KeyPool("azure", ["spent", "fresh"])
+        translator.configure_key_pool(pool, "spent")
+        with patch.object(AzureTranslator, "translate_text", translate):
+            self.assertEqual(translator.translate_text("水泥结构", "zh_to_en"), "cement structure")
+        self.assertEqual(calls, ["spent", "fresh"])
+        self.assertTrue(pool.snapshot()[0]["exhausted"])
+
+    def test_preflight_estimate_counts_only_provider_bound_text(self):
+        translator = CADChineseTranslator(log_callback=lambda *args, **kwargs: None)
+        translator.language_assets.record_memory("外墙保温", "external wall insulation", "zh_to_en", "", "deepl")
+        items = [
+            {"original_text": text, "layer": "0"}
+            for text in ("天花图", "外墙保温", "新风机房", "新风机房", "1200")
+        ]
+        self.assertEqual(translator.estimate_provider_characters(items, "zh_to_en"), {"items": 5, "unique": 1, "characters": 4})
+        self.assertEqual(self.assets.list_memory()[0]["hit_count"], 0)  # a dry run must not count memory hits
+        gate = []
+        translator.quota_gate = gate.append
+        with tempfile.TemporaryDirectory() as tmp:
+            doc = ezdxf.new()
+            doc.modelspace().add_text("天花图")
+            doc.saveas(f"{tmp}/plan.dxf")
+            translator._translate_cad_file_dxf(f"{tmp}/plan.dxf", f"{tmp}/out.dxf", "zh_to_en")
+        self.assertEqual(gate, [{"items": 1, "unique": 0, "characters": 0}])
+        self.assertEqual(set(translator.timings), {"parse", "translate", "write"})
+
+    def test_azure_quota_gates_only_keys_known_or_configured_as_f0(self):
+        self.assets.record_usage("azure", 500, key_id=key_fingerprint("free"))
+        self.assets.record_usage("azure", 0, quota_exceeded=True, key_id=key_fingerprint("spent"))
+        with patch.object(service, "language_assets", self.assets), patch.object(service, "load_config", return_value={"azure_tier": ""}):
+            self.assertIsNone(service.key_remaining("azure", "free"))  # paid tiers are never deferred locally
+            self.assertEqual(service.key_remaining("azure", "spent"), 0)
+        with patch.object(service, "language_assets", self.assets), patch.object(service, "load_config", return_value={"azure_tier": "F0"}):
+            self.assertEqual(service.key_remaining("azure", "free"), AZURE_F0_MONTHLY_CHARACTER_LIMIT - 500)
+
+    def test_quota_reservation_shrinks_as_characters_are_billed(self):
+        pool = KeyPool("deepl", ["key"])
+        pool.refresh_quota(lambda key: 200, force=True)
+        first, second = {"id": "first"}, {"id": "second"}
+        with patch.object(service, "key_pool", return_value=pool), patch.dict(service._quota_reserved, clear=True):
+            service.reserve_quota(first, "deepl", {"characters": 150})
+            with self.assertRaises(QuotaDeferredError):
+                service.reserve_quota(second, "deepl", {"characters": 51})
+            pool.record("key", 100)
+            service.release_quota(first, 100)
+            service.reserve_quota(second, "deepl", {"characters": 50})  # 100 left, 50 still reserved for the first drawing
+            with self.assertRaises(QuotaDeferredError):
+                service.reserve_quota({"id": "third"}, "deepl", {"characters": 1})
+
+    def test_interrupted_drawing_resumes_from_checkpoint(self):
+        calls = []
+
+        class Translator:
+            def translate_text(self, text, **kwargs):
+                if len(calls) == 2:
+                    raise deepl.exceptions.AuthorizationException("key revoked")
+                calls.append(text)
+                return SimpleNamespace(text=f"EN {text}")
+
+        with tempfile.TemporaryDirectory() as tmp:
+            doc = ezdxf.new()
+            for text in ("墙体一", "墙体二", "墙体三"):
+                doc.modelspace().add_text(text)
+            doc.saveas(f"{tmp}/plan.dxf")
+            translator = CADChineseTranslator(log_callback=lambda *args, **kwargs: None)
+            translator.deepl_translator = Translator()
+            translator.checkpoint_path = f"{tmp}/checkpoint.json"
+            with patch("backend.translator.time.sleep"), self.assertRaises(RuntimeError):
+                translator.translate_cad_file(f"{tmp}/plan.dxf", f"{tmp}/out.dxf", "zh_to_en")
+            self.assertEqual(len(json.load(open(f"{tmp}/checkpoint.json", encoding="utf-8"))["resolved"]), 2)
+
+            for row in self.assets.list_memory():
+                self.assets.delete_memory(row["id"])
+            calls[:] = ["resumed"]
+            resumed = CADChineseTranslator(log_callback=lambda *args, **kwargs: None)
+            resumed.deepl_translator = Translator()
+            resumed.checkpoint_path = f"{tmp}/checkpoint.json"
+            with patch("backend.translator.time.sleep"):
+                resumed.translate_cad_file(f"{tmp}/plan.dxf", f"{tmp}/out.dxf", "zh_to_en")
+            self.assertEqual(calls, ["resumed", "墙体三"])
+            self.assertEqual([entity.dxf.text for entity in ezdxf.readfile(f"{tmp}/out.dxf").modelspace()], ["EN 墙体一", "EN 墙体二", "EN 墙体三"])
+            self.assertFalse(os.path.exists(f"{tmp}/checkpoint.json"))  # discarded once the output is published
+
+    def test_revised_drawing_only_resolves_new_and_changed_texts(self):
+        calls = []
+
+        class Translator:
+            def translate_text(self, text, **kwargs):
+                calls.append(text)
+                return SimpleNamespace(text=f"EN {text}")
+
+        with tempfile.TemporaryDirectory() as tmp:
+            doc = ezdxf.new()
+            kept, changed, removed = (doc.modelspace().add_text(text) for text in ("墙体一", "墙体二", "墙体三"))
+            doc.saveas(f"{tmp}/plan.dxf")
+
+            def run(basis="v1", checkpoint=None):
+                calls.clear()
+                translator = CADChineseTranslator(log_callback=lambda *args, **kwargs: None)
+                translator.deepl_translator = Translator()
+                translator.manifest_path, translator.manifest_basis = f"{tmp}/manifest.json", basis
+                translator.checkpoint_path = checkpoint
+                with patch("backend.translator.time.sleep"):
+                    translator.translate_cad_file(f"{tmp}/plan.dxf", f"{tmp}/out.dxf", "zh_to_en")
+                for row in self.assets.list_memory():
+                    self.assets.delete_memory(row["id"])
+                return translator.incremental_summary
+
+            self.assertEqual(run(), {"added": 3, "changed": 0, "removed": 0, "reused": 0, "refreshed": 0})
+            changed.dxf.text = "墙体二改"
+            doc.modelspace().delete_entity(removed)
+            doc.modelspace().add_text("墙体四")
+            doc.saveas(f"{tmp}/plan.dxf")
+            self.assertEqual(run(), {"added": 1, "changed": 1, "removed": 1, "reused": 1, "refreshed": 0})
+            self.assertEqual(calls, ["墙体二改", "墙体四"])
+            self.assertEqual(sorted(entity.dxf.text for entity in ezdxf.readfile(f"{tmp}/out.dxf").modelspace()), ["EN 墙体一", "EN 墙体二改", "EN 墙体四"])
+            self.assertEqual(run("v2")["refreshed"], 3)  # edited terms or memory: nothing is reused from the manifest
+            self.assertEqual(len(calls), 3)
+
+            # Texts the checkpoint already holds are not diffed against the manifest.
+            with patch("backend.translator.TranslationCheckpoint.get", return_value="EN 续译"), patch("backend.translator.DrawingManifest.resolve") as resolve:
+                run(checkpoint=f"{tmp}/checkpoint.json")
+            self.assertEqual((resolve.call_count, calls), (0, []))
+
+            # Incremental translation can be switched off per batch; its translators then keep no manifest.
+            task = {"id": "full", "input_file": f"{tmp}/plan.dxf", "translation_mode": "zh_to_en", "translate_blocks": False, "incremental_translation": False}
+            with patch.object(service, "key_pool", return_value=KeyPool("deepl")):
+                self.assertIsNone(service._batch_translator(task, "zh_to_en", "deepl", "key", {}, "", print, "", "").manifest_path)
+
+    def test_unchanged_drawing_is_served_from_output_cache(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            drawing = f"{tmp}/plan.dxf"
+            ezdxf.new().saveas(drawing)
+            task = {"id": "cached-task", "input_file": drawing, "output_dir": tmp, "output_format": "source", "output_version": "", "translation_mode": "zh_to_fr", "translate_blocks": False}
+            config = {"deepl_key": "key", "project_package_path": "", "output_cache_limit_mb": 1}
+
+            def translate(_self, _input, output, *args):
+                translations.append(output)
+                with open(output, "w", encoding="utf-8") as stream:
+                    stream.write(f"translated {len(translations)}")
+
+            def run():
+                logs = []
+                task.pop("_output_path", None)
+                return service._run_batch(dict(task), logs.append, threading.Event(), threading.Event()), logs
+
+            translations = []
+            with (
+                patch.object(service, "output_cache", OutputCache(f"{tmp}/cache")),
+                patch.object(service, "language_assets", self.assets),
+                patch.object(service, "load_config", return_value=config),
+                patch.object(service, "key_pool", return_value=KeyPool("deepl")),
+                patch.object(CADChineseTranslator, "translate_cad_file", translate),
+            ):
+                first, _ = run()
+                second, logs = run()
+                self.assertEqual(len(translations), 1)
+                self.assertTrue(any("cache hit" in line for line in logs))
+                with open(second, encoding="utf-8") as stream:
+                    self.assertEqual(stream.read(), "translated 1")
+                self.assertNotEqual(first, second)
+
+                self.assets.upsert_memory("zh_to_fr", "平面图", "plan corrigé")
+                run()
+                self.assertEqual(len(translations), 2)  # a user edit to the memory invalidates cached outputs
+
+                # The input is hashed, and the translation basis computed, once per task however many modes and targets.
+                task.update(translation_modes=["zh_to_fr", "zh_to_en"], output_version=["", "ACAD2013"])
+                with (
+                    patch("backend.api.file_fingerprint", wraps=file_fingerprint) as fingerprint,
+                    patch.object(service, "translation_basis", wraps=service.translation_basis) as basis,
+                    patch.object(CADChineseTranslator, "translate_cad_file_modes"),
+                ):
+                    run()
+                self.assertEqual((fingerprint.call_count, basis.call_count), (1, 1))
+
+    def test_streaming_scanner_matches_full_extraction(self):
+        doc = ezdxf.new()
+        msp = doc.modelspace()
+        msp.add_text("楼梯间", dxfattribs={"layer": "A-TEXT"})
+        msp.add_mtext("消防\\P通道")
+        msp.add_linear_dim(base=(0, 5), p1=(0, 0), p2=(10, 0), text="净高说明").render()
+        frame = doc.blocks.new("FRAME")
+        frame.add_text("图框标题")
+        frame.add_attdef("DRAWING_NO", text="图号", dxfattribs={"prompt": "请输入图号"})
+        doc.blocks.new("UNUSED").add_text("未引用块文字")
+        msp.add_blockref("FRAME", (0, 0)).add_auto_attribs({"DRAWING_NO": "一号楼"})
+        translator = CADChineseTranslator(log_callback=lambda *args, **kwargs: None)
+        with tempfile.TemporaryDirectory() as tmp:
+            doc.saveas(f"{tmp}/plan.dxf")
+            for include_blocks in (False, True):
+                streamed = translator.scan_text_items(f"{tmp}/plan.dxf", include_blocks)
+                loaded = translator.extract_text_entities(ezdxf.readfile(f"{tmp}/plan.dxf"), "zh_to_fr", include_blocks)
+                self.assertEqual(
+                    {(item["original_text"], item["layer"]) for item in streamed},
+                    {(item["original_text"], item["layer"]) for item in loaded},
+                )
+                self.assertEqual("未引用块文字" in {item["original_text"] for item in streamed}, include_blocks)
+            self.assertEqual(
+                translator.estimate_cad_file(f"{tmp}/plan.dxf", "zh_to_fr"),
+                translator.estimate_provider_characters(translator.extract_text_entities(ezdxf.readfile(f"{tmp}/plan.dxf"), "zh_to_fr"), "zh_to_fr"),
+            )
+
+    def test_block_definitions_are_scanned_once_per_document(self):
+        doc = ezdxf.new()
+        logo = doc.blocks.new("LOGO")
+        logo.add_text("公司标志")
+        frame = doc.blocks.new("FRAME")
+        frame.add_text("图框标题")
+        frame.add_blockref("LOGO", (0, 0))
+        for index in range(40):
+            doc.modelspace().add_blockref("FRAME", (index * 10, 0))
+        doc.layouts.new("A1").add_blockref("FRAME", (0, 0))
+        doc.layouts.get("Layout1").add_blockref("LOGO", (0, 0))
+        translator = CADChineseTranslator(log_callback=lambda *args, **kwargs: None)
+        with patch.object(translator, "collect_entity_text_items", wraps=translator.collect_entity_text_items) as collect:
+            items = translator.extract_text_entities(doc, "zh_to_fr")
+        self.assertEqual(sorted(item["original_text"] for item in items), ["公司标志", "图框标题"])
+        self.assertEqual(collect.call_count, 2)
+        self.assertEqual({item["location"] for item in items}, {"Model|块:FRAME", "Model|块:FRAME>LOGO"})
+
+    def test_attrib_tag_sync_uses_the_document_index(self):
+        doc = ezdxf.new()
+        frame = doc.blocks.new("FRAME")
+        frame.add_attdef("图纸编号", text="")
+        for index in range(30):
+            doc.modelspace().add_blockref("FRAME", (index, 0)).add_auto_attribs({"图纸编号": f"{index}号"})
+        translator = CADChineseTranslator(log_callback=lambda *args, **kwargs: None)
+        items = translator.extract_text_entities(doc, "zh_to_fr", include_blocks=True)
+        attdef_tag = next(item for item in items if item["type"] == "ATTDEF" and item["field"] == "tag")
+        with patch.object(doc, "modelspace", side_effect=AssertionError("layouts must not be rescanned")):
+            translator.write_back_translation(attdef_tag["entity"], "numéro de plan", "tag")
+            translator._sync_attrib_tags(doc, attdef_tag["raw_source"], "numéro de plan")
+            translator._sync_attrib_tags(doc, "numéro de plan", "N° de plan")
+        self.assertEqual({attrib.dxf.tag for insert in doc.modelspace().query("INSERT") for attrib in insert.attribs}, {"N° de plan"})
+        self.assertIs(translator._document_index.entities[attdef_tag["entity"].dxf.handle], attdef_tag["entity"])
+
+    def test_block_translations_are_reused_across_drawings(self):
+        def drawing(path, note):
+            doc = ezdxf.new()
+            frame = doc.blocks.new("TITLE")
+            frame.add_text("设计单位")
+            frame.add_text("审核")
+            doc.blocks.new("STAMP").add_text("盖章")
+            doc.blocks.new_anonymous_block("T").add_text("图签")  # renumbered per drawing, never cached
+            doc.modelspace().add_blockref("TITLE", (0, 0))
+            doc.modelspace().add_blockref("STAMP", (0, 0))
+            doc.modelspace().add_text(note)
+            doc.saveas(path)
+
+        translator = CADChineseTranslator(log_callback=lambda *args, **kwargs: None)
+        with tempfile.TemporaryDirectory() as tmp:
+            drawing(f"{tmp}/a.dxf", "一层平面")
+            drawing(f"{tmp}/b.dxf", "二层平面")
+            with patch.object(translator, "translate_text", side_effect=lambda text, *args: f"FR {text}") as translate:
+                translator._translate_cad_file_dxf(f"{tmp}/a.dxf", f"{tmp}/a_out.dxf", "zh_to_fr")
+                self.assertEqual(translate.call_count, 5)
+                translate.reset_mock()
+                # Every block definition is looked up in one query and stored in one write.
+                with patch.object(self.assets, "lookup_blocks", wraps=self.assets.lookup_blocks) as lookup, patch.object(self.assets, "record_blocks", wraps=self.assets.record_blocks) as record:
+                    translator._translate_cad_file_dxf(f"{tmp}/b.dxf", f"{tmp}/b_out.dxf", "zh_to_fr")
+                self.assertEqual([call.args[0] for call in translate.call_args_list], ["二层平面", "图签"])
+                self.assertEqual((lookup.call_count, len(lookup.call_args.args[0]), record.call_count), (1, 2, 1))
+            texts = {entity.dxf.text for entity in ezdxf.readfile(f"{tmp}/b_out.dxf").blocks.get("TITLE").query("TEXT")}
+            self.assertEqual(texts, {"FR 设计单位", "FR 审核"})
+            self.assets.upsert_term("global", "zh_to_fr", "审核", "vérifié")
+            with patch.object(translator, "translate_text", side_effect=lambda text, *args: f"FR {text}") as translate:
+                translator._translate_cad_file_dxf(f"{tmp}/b.dxf", f"{tmp}/b_out.dxf", "zh_to_fr")
+                self.assertEqual(translate.call_count, 5)
+
+    def test_text_items_are_compact_records(self):
+        doc = ezdxf.new()
+        for index in range(3):
+            doc.modelspace().add_text(f"  房间{index}  ", dxfattribs={"layer": "A-TEXT"})
+        translator = CADChineseTranslator(log_callback=lambda *args, **kwargs: None)
+        items = list(translator.iter_text_entities(doc, "zh_to_fr"))
+        self.assertFalse(hasattr(items[0], "__dict__"))
+        self.assertIs(items[0]["location"], items[2]["location"])
+        self.assertEqual((items[0]["raw_source"], items[0]._raw_source), ("房间0", None))
+        self.assertEqual(items[0].get("translated_text", "-"), "-")
+        items[0]["translated_text"] = "pièce 0"
+        self.assertIn("translated_text", items[0])
+        items[0].release()
+        self.assertIsNone(items[0]["entity"])
+
+    def test_text_validity_is_checked_once_per_text_with_a_bounded_memo(self):
+        translator = CADChineseTranslator(log_callback=lambda *args, **kwargs: None)
+        self.assertEqual([translator.is_valid_text_for_translation(text) for text in ("二层平面布置图", "1200x600", "��")], [True, True, False])
+        with patch.object(translator, "_check_text_validity", side_effect=AssertionError("validity is cached")):
+            self.assertTrue(translator.is_valid_text_for_translation("二层平面布置图"))
+        with patch("backend.translator.TEXT_VALIDITY_CACHE_LIMIT", 3):
+            translator.is_valid_text_for_translation("天花")
+        self.assertEqual(translator._text_validity, {"天花": True})
+
+    def test_unique_texts_are_classified_once_and_repeats_skip_the_local_checks(self):
+        translator = CADChineseTranslator(log_callback=lambda *args, **kwargs: None)
+        verdicts = {text: translator.classify_text(text, "zh_to_fr").verdict for text in ("1200x600", "A-01", "天花", "二层平面布置图")}
+        self.assertEqual(verdicts, {"1200x600": "skip", "A-01": "skip", "天花": "glossary", "二层平面布置图": "provider"})
+
+        doc = ezdxf.new()
+        for index in range(20):
+            for text in ("1200x600", "天花", "二层平面布置图", "一层平面布置图"):
+                doc.modelspace().add_text(text, dxfattribs={"insert": (index, 0)})
+        with tempfile.TemporaryDirectory() as tmp:
+            doc.saveas(f"{tmp}/plan.dxf")
+            with (
+                patch.object(translator, "_classify_text", wraps=translator._classify_text) as classify,
+                patch.object(translator, "translate_text", wraps=translator.translate_text) as translate,
+                patch.object(translator, "_provider_translate_with_retry", return_value=("plan du deuxième étage", "")),
+            ):
+                translator._translate_cad_file_dxf(f"{tmp}/plan.dxf", f"{tmp}/plan_out.dxf", "zh_to_fr")
+        self.assertEqual(classify.call_args_list, [call("一层平面布置图", "zh_to_fr")])  # once for the new string, never for repeats
+        self.assertEqual({call.args[0] for call in translate.call_args_list}, {"天花", "二层平面布置图", "一层平面布置图"})  # skipped strings never reach translate_text
+
+    def test_dxf_output_is_streamed_by_patching_only_text_tags(self):
+        doc = ezdxf.new()
+        msp = doc.modelspace()
+        msp.add_line((0, 0), (12.5, 7.25), dxfattribs={"layer": "A-WALL"})
+        msp.add_text("楼梯间", dxfattribs={"layer": "A-TEXT"})
+        msp.add_mtext("消防通道" * 80)
+        frame = doc.blocks.new("FRAME")
+        frame.add_attdef("图纸编号", text="", dxfattribs={"prompt": "请输入图号"})
+        msp.add_blockref("FRAME", (0, 0)).add_auto_attribs({"图纸编号": "一号楼"})
+        logs = []
+        translator = CADChineseTranslator(log_callback=lambda message, *args, **kwargs: logs.append(message))
+        translator.stream_rewrite_min_bytes = 0
+        with tempfile.TemporaryDirectory() as tmp, patch.object(translator, "translate_text", side_effect=lambda text, *args: f"EN {text}"):
+            doc.saveas(f"{tmp}/plan.dxf")
+            translator._translate_cad_file_dxf(f"{tmp}/plan.dxf", f"{tmp}/out.dxf", "zh_to_en")
+            source = Path(f"{tmp}/plan.dxf").read_text(encoding="utf-8").splitlines()
+            output = Path(f"{tmp}/out.dxf").read_text(encoding="utf-8").splitlines()
+            self.assertTrue(any("流式改写" in message for message in logs))
+            self.assertTrue(set(line for line in source if line not in output) <= {"楼梯间", "消防通道" * 80, "图纸编号", "请输入图号", "一号楼"} | {line for line in source if "消防通道" in line})
+            result = ezdxf.readfile(f"{tmp}/out.dxf")
+            line = result.modelspace().query("LINE").first
+            self.assertEqual((tuple(line.dxf.end), line.dxf.layer), ((12.5, 7.25, 0), "A-WALL"))
+            self.assertEqual(result.modelspace().query("TEXT").first.dxf.text, "EN 楼梯间")
+            self.assertIn("EN " + "消防通道" * 80, result.modelspace().query("MTEXT").first.text)
+            attrib = result.modelspace().query("INSERT").first.attribs[0]
+            self.assertEqual((attrib.dxf.tag, attrib.dxf.text), ("EN 图纸编号", "EN 一号楼"))
+            self.assertEqual(result.blocks.get("FRAME").query("ATTDEF").first.dxf.prompt, "EN 请输入图号")
+
+            logs.clear()
+            translator._translate_cad_file_dxf(f"{tmp}/plan.dxf", f"{tmp}/out.dxf", "zh_to_en", output_version="AC1024")
+            self.assertFalse(any("流式改写" in message for message in logs))
+            self.assertEqual(ezdxf.readfile(f"{tmp}/out.dxf").modelspace().query("TEXT").first.dxf.text, "EN 楼梯间")
+
+            logs.clear()
+            translator.stream_rewrite_min_bytes = Path(f"{tmp}/plan.dxf").stat().st_size + 1
+            translator._translate_cad_file_dxf(f"{tmp}/plan.dxf", f"{tmp}/out.dxf", "zh_to_en")
+            self.assertFalse(any("流式改写" in message for message in logs))  # only large drawings are streamed
+
+    def test_streamed_rewrite_matches_full_load_output(self):
+        self.maxDiff = None
+        def texts(path):
+            doc = ezdxf.readfile(path)
+            values = {}
+            for entity in doc.entitydb.values():
+                if entity.dxftype() == "ACAD_TABLE":
+                    values[entity.dxf.handle] = [tag.value for tag in entity.xtags.get_subclass("AcDbTable") if tag.code == 302]
+                elif entity.dxftype() == "MTEXT":
+                    values[entity.dxf.handle] = ("MTEXT", entity.text)
+                elif entity.dxftype() in ("TEXT", "ATTRIB", "ATTDEF"):
+                    values[entity.dxf.handle] = (entity.dxftype(), *(entity.dxf.get(name, "") for name in ("text", "tag", "prompt") if entity.dxf.is_supported(name)))
+            return values
+
+        for dxfversion, codepage in (("R2000", "ANSI_936"), ("R2010", "")):
+            doc = ezdxf.new(dxfversion)
+            if codepage:
+                doc.header["$DWGCODEPAGE"], doc.encoding = codepage, "gbk"
+            msp = doc.modelspace()
+            msp.add_text("楼梯间")
+            msp.add_mtext("消防\\P通道")
+            frame = doc.blocks.new("FRAME")
+            frame.add_text("图框标题")
+            frame.add_attdef("图纸编号", text="", dxfattribs={"prompt": "请输入图号"})
+            msp.add_blockref("FRAME", (0, 0)).add_auto_attribs({"图纸编号": "一号楼"})
+            doc.layouts.get("Layout1").add_blockref("FRAME", (0, 0)).add_auto_attribs({"图纸编号": "二号楼"})
+            doc.layouts.new("A1").add_blockref("FRAME", (0, 0)).add_auto_attribs({"图纸编号": "三号楼"})
+            # An unreferenced block's ATTRIBs are neither extracted nor retagged by the full-load path.
+            doc.blocks.new("SPARE").add_blockref("FRAME", (0, 0)).add_auto_attribs({"图纸编号": "备用"})
+            table_handle = doc.entitydb.next_handle()
+            translator = CADChineseTranslator(log_callback=lambda *args, **kwargs: None)
+            with self.subTest(dxfversion=dxfversion), tempfile.TemporaryDirectory() as tmp, patch.object(translator, "translate_text", side_effect=lambda text, *args: f"EN {text} é"):
+                doc.saveas(f"{tmp}/plan.dxf")
+                if not codepage:
+                    insert_acad_table(f"{tmp}/plan.dxf", msp.block_record_handle, table_handle, ["楼层表", "备注"])
+                translator.stream_rewrite_min_bytes = 0
+                translator._translate_cad_file_dxf(f"{tmp}/plan.dxf", f"{tmp}/streamed.dxf", "zh_to_en")
+                translator.stream_rewrite_min_bytes = 1 << 40
+                translator._translate_cad_file_dxf(f"{tmp}/plan.dxf", f"{tmp}/loaded.dxf", "zh_to_en")
+                streamed, loaded = texts(f"{tmp}/streamed.dxf"), texts(f"{tmp}/loaded.dxf")
+                self.assertEqual(streamed, loaded)
+                self.assertIn(("TEXT", "EN 楼梯间 é"), streamed.values())
+                self.assertEqual(streamed.get(table_handle, ["EN 楼层表 é", "EN 备注 é"]), ["EN 楼层表 é", "EN 备注 é"])
+
+    def test_one_extraction_fans_out_to_several_translation_modes(self):
+        doc = ezdxf.new()
+        msp = doc.modelspace()
+        msp.add_text("楼梯间", dxfattribs={"layer": "A-TEXT"})
+        frame = doc.blocks.new("FRAME")
+        frame.add_attdef("图纸编号", text="", dxfattribs={"prompt": "请输入图号"})
+        msp.add_blockref("FRAME", (0, 0)).add_auto_attribs({"图纸编号": "一号楼"})
+        table_handle = doc.entitydb.next_handle()
+        coordinator = CADChineseTranslator()
+        coordinator.stream_rewrite_min_bytes = 0
+        translators = {"zh_to_fr": CADChineseTranslator(), "zh_to_en": CADChineseTranslator()}
+        leases = []
+
+        @contextmanager
+        def stage(name):
+            leases.append(name)
+            yield f"key-{len(leases)}"
+
+        for mode_translator in translators.values():
+            mode_translator.pipeline_stage = stage
+        with tempfile.TemporaryDirectory() as tmp, ExitStack() as stack:
+            doc.saveas(f"{tmp}/plan.dxf")
+            insert_acad_table(f"{tmp}/plan.dxf", msp.block_record_handle, table_handle, ["楼层表"])
+            for mode, mode_translator in translators.items():
+                stack.enter_context(patch.object(mode_translator, "translate_text", side_effect=lambda text, _mode, *args: f"{_mode[-2:].upper()} {text}"))
+            scan = stack.enter_context(patch.object(coordinator, "scan_text_items", wraps=coordinator.scan_text_items))
+            extract = stack.enter_context(patch.object(coordinator, "extract_text_entities", wraps=coordinator.extract_text_entities))
+            jobs = {mode: (mode_translator, f"{tmp}/{mode}.dxf") for mode, mode_translator in translators.items()}
+            coordinator._translate_cad_file_dxf_modes(f"{tmp}/plan.dxf", jobs, False, None, None, None)
+            with patch.object(coordinator, "_streamable_text_items", return_value=None):
+                coordinator._translate_cad_file_dxf_modes(f"{tmp}/plan.dxf", {mode: (mode_translator, f"{tmp}/full_{mode}.dxf") for mode, (mode_translator, _) in jobs.items()}, False, None, None, None)
+            self.assertEqual((scan.call_count, extract.call_count), (1, 1))
+            # Each mode calls the provider under its own translate slot and key.
+            self.assertEqual(leases, ["translate"] * 4)
+            self.assertNotEqual(*(mode_translator.pool_preferred_key for mode_translator in translators.values()))
+            for prefix in ("", "full_"):
+                for mode in translators:
+                    result = ezdxf.readfile(f"{tmp}/{prefix}{mode}.dxf")
+                    label = mode[-2:].upper()
+                    attrib = result.modelspace().query("INSERT").first.attribs[0]
+                    self.assertEqual(result.modelspace().query("TEXT").first.dxf.text, f"{label} 楼梯间")
+                    self.assertEqual((attrib.dxf.tag, attrib.dxf.text), (f"{label} 图纸编号", f"{label} 一号楼"))
+                    self.assertEqual(result.blocks.get("FRAME").query("ATTDEF").first.dxf.prompt, f"{label} 请输入图号")
+                    # Every mode's table cells come from its own re-read document, not the first one's.
+                    self.assertEqual(result.entitydb.get(table_handle).xtags.get_subclass("AcDbTable")[-1].value, f"{label} 楼层表")
+
     def test_single_file_api_rejects_unknown_translation_mode(self):
         with tempfile.TemporaryDirectory() as tmp:
             drawing = f"{tmp}/drawing.dxf"
@@ -0,0 +1,191 @@
+"""Local stand-in for DeepL and Azure Translator used for offline load tests.
+
+Point the backend at it with::
+
+    CAD_DEEPL_SERVER_URL=http://127.0.0.1:8770
+    CAD_AZURE_ENDPOINT=http://127.0.0.1:8770/translate
+
+Translations are deterministic (``[FR] 原文``), so repeated runs produce the
+same drawings.  Latency, 429/503 injection and per-key quota exhaustion are
+configurable; ``GET /stats`` reports request counts and peak concurrency.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import random
+import threading
+import time
+import urllib.parse
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+DEFAULT_QUOTA = 500_000
+AZURE_LANGUAGES = {"zh-Hans": "ZH", "en": "EN", "fr": "FR"}
+
+
+def pseudo_translate(text: str, target: str) -> str:
+    return f"[{target.upper()}] {text}"
+
+
+def parse_latency(spec: str):
+    """``fixed:S``, ``uniform:LOW,HIGH``, ``exp:MEAN`` or ``lognormal:MU,SIGMA`` seconds."""
+    kind, _, values = (spec or "fixed:0").partition(":")
+    numbers = [float(value) for value in values.split(",") if value.strip()] or [0.0]
+    if kind == "fixed":
+        return lambda rng: numbers[0]
+    if kind == "uniform":
+        return lambda rng: rng.uniform(numbers[0], numbers[-1])
+    if kind == "exp":
+        return lambda rng: rng.expovariate(1 / numbers[0]) if numbers[0] > 0 else 0.0
+    if kind == "lognormal":
+        return lambda rng: rng.lognormvariate(numbers[0], numbers[-1])
+    raise ValueError(f"unknown latency distribution: {spec}")
+
+
+class MockProviderServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address=("127.0.0.1", 0), latency: str = "fixed:0", rate_429: float = 0.0, rate_503: float = 0.0, quota: int = DEFAULT_QUOTA, seed: int = 0):
+        super().__init__(address, _Handler)
+        self.latency = parse_latency(latency)
+        self.rate_429, self.rate_503, self.quota = rate_429, rate_503, quota
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+        self.used: dict[str, int] = {}
+        self.stats = {"requests": 0, "characters": 0, "errors": {}, "in_flight": 0, "peak_in_flight": 0}
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def admit(self, key: str, characters: int) -> int | None:
+        """Return an injected HTTP error status, or account the characters and return None."""
+        with self.lock:
+            self.stats["requests"] += 1
+            delay = max(0.0, self.latency(self.random))
+            roll = self.random.random()
+            status = 429 if roll < self.rate_429 else 503 if roll < self.rate_429 + self.rate_503 else None
+            if status is None and self.used.get(key, 0) + characters > self.quota:
+                status = 456
+            if status is None:
+                self.used[key] = self.used.get(key, 0) + characters
+                self.stats["characters"] += characters
+            else:
+                self.stats["errors"][str(status)] = self.stats["errors"].get(str(status), 0) + 1
+        time.sleep(delay)
+        return status
+
+
+class _Handler(BaseHTTPRequestHandler):
+    server: MockProviderServer
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send(self, status: int, payload) -> None:
+        body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _body(self) -> bytes:
+        return self.rfile.read(int(self.headers.get("Content-Length") or 0))
+
+    def _tracked(self, handler) -> None:
+        with self.server.lock:
+            self.server.stats["in_flight"] += 1
+            self.server.stats["peak_in_flight"] = max(self.server.stats["peak_in_flight"], self.server.stats["in_flight"])
+        try:
+            handler()
+        finally:
+            with self.server.lock:
+                self.server.stats["in_flight"] -= 1
+
+    def do_GET(self):
+        path = urllib.parse.urlsplit(self.path).path
+        if path == "/stats":
+            with self.server.lock:
+                self._send(200, {**self.server.stats, "used": dict(self.server.used)})
+        elif path == "/v2/usage":
+            self._deepl_usage()
+        else:
+            self._send(404, {"message": "not found"})
+
+    def do_POST(self):
+        path = urllib.parse.urlsplit(self.path).path
+        if path == "/v2/translate":
+            self._tracked(self._deepl_translate)
+        elif path == "/v2/usage":
+            self._body()
+            self._deepl_usage()
+        elif path == "/translate":
+            self._tracked(self._azure_translate)
+        else:
+            self._body()
+            self._send(404, {"message": "not found"})
+
+    def _deepl_key(self) -> str:
+        return self.headers.get("Authorization", "").removeprefix("DeepL-Auth-Key ").strip()
+
+    def _deepl_usage(self) -> None:
+        with self.server.lock:
+            used = self.server.used.get(self._deepl_key(), 0)
+        self._send(200, {"character_count": used, "character_limit": self.server.quota})
+
+    def _deepl_translate(self) -> None:
+        raw = self._body()
+        if "json" in self.headers.get("Content-Type", ""):
+            request = json.loads(raw.decode("utf-8") or "{}")
+        else:
+            request = {key: values if key == "text" else values[0] for key, values in urllib.parse.parse_qs(raw.decode("utf-8")).items()}
+        texts = request.get("text") or []
+        texts = [texts] if isinstance(texts, str) else texts
+        status = self.server.admit(self._deepl_key(), sum(len(text) for text in texts))
+        if status == 456:
+            self._send(456, {"message": "Quota exceeded"})
+        elif status:
+            self._send(status, {"message": "Too many requests" if status == 429 else "Service unavailable"})
+        else:
+            source = (request.get("source_lang") or "ZH").upper()
+            target = request.get("target_lang") or "EN-US"
+            self._send(200, {"translations": [{"detected_source_language": source, "text": pseudo_translate(text, target), "billed_characters": len(text)} for text in texts]})
+
+    def _azure_translate(self) -> None:
+        query = urllib.parse.parse_qs(urllib.parse.urlsplit(self.path).query)
+        texts = [entry.get("Text", "") for entry in json.loads(self._body().decode("utf-8") or "[]")]
+        target = query.get("to", ["en"])[0]
+        status = self.server.admit(self.headers.get("Ocp-Apim-Subscription-Key", ""), sum(len(text) for text in texts))
+        if status == 456:
+            self._send(403, {"error": {"code": 403001, "message": "The operation is not allowed because the subscription has exceeded its free quota."}})
+        elif status:
+            self._send(status, {"error": {"code": status * 1000, "message": "Too many requests" if status == 429 else "Service unavailable"}})
+        else:
+            self._send(200, [{"translations": [{"text": pseudo_translate(text, AZURE_LANGUAGES.get(target, target)), "to": target}]} for text in texts])
+
+
+def start_mock_server(**options) -> MockProviderServer:
+    """Start a background server on an ephemeral port; call ``shutdown()`` when done."""
+    server = MockProviderServer(**options)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8770)
+    parser.add_argument("--latency", default="fixed:0.05", help="fixed:S | uniform:LOW,HIGH | exp:MEAN | lognormal:MU,SIGMA")
+    parser.add_argument("--rate-429", type=float, default=0.0)
+    parser.add_argument("--rate-503", type=float, default=0.0)
+    parser.add_argument("--quota", type=int, default=DEFAULT_QUOTA, help="characters per key before DeepL 456 / Azure 403001")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    mock = MockProviderServer((args.host, args.port), args.latency, args.rate_429, args.rate_503, args.quota, args.seed)
+    print(f"Mock DeepL/Azure server on {mock.base_url}  (CAD_DEEPL_SERVER_URL={mock.base_url}  CAD_AZURE_ENDPOINT={mock.base_url}/translate)")
+    mock.serve_forever()
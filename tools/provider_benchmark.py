@@ -0,0 +1,60 @@
+"""Time ``translate_cad_file`` end to end against a recorded provider journal.
+
+Record once against the real (or mock) provider, then replay as often as
+needed without quota or network jitter::
+
+    python -m tools.provider_benchmark record journal.jsonl drawing.dwg --mode zh_to_fr
+    python -m tools.provider_benchmark replay journal.jsonl drawing.dwg --mode zh_to_fr --fast
+
+DeepL uses ``DEEPL_API_KEY``; pass ``--azure-key`` to record Azure instead.
+Every run starts from an empty translation memory so the provider-bound work
+is the same each time.
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+import tempfile
+import time
+from pathlib import Path
+
+from backend.language_assets import LanguageAssets
+from backend.providers.journal import JOURNAL_ENV
+
+
+def run(action: str, journal: Path, drawings: list[Path], mode: str, include_blocks: bool, azure_key: str = "", azure_region: str = "") -> list[dict]:
+    from backend.translator import CADChineseTranslator
+
+    os.environ[JOURNAL_ENV] = f"{action}:{journal}"
+    results = []
+    with tempfile.TemporaryDirectory() as work:
+        for drawing in drawings:
+            translator = CADChineseTranslator(log_callback=lambda *args, **kwargs: None)
+            translator.language_assets = LanguageAssets(Path(work) / f"{drawing.stem}.sqlite3")
+            if azure_key:
+                translator.configure_azure(azure_key, azure_region)
+            started = time.perf_counter()
+            translator.translate_cad_file(str(drawing), str(Path(work) / drawing.name), mode, include_blocks)
+            replay = translator.provider_replay
+            results.append({"drawing": drawing.name, "seconds": round(time.perf_counter() - started, 3), "requests": replay.requests if replay else None})
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("action", choices=["record", "replay"])
+    parser.add_argument("journal", type=Path)
+    parser.add_argument("drawings", type=Path, nargs="+")
+    parser.add_argument("--mode", default="zh_to_fr", choices=["zh_to_fr", "fr_to_zh", "zh_to_en", "en_to_zh"])
+    parser.add_argument("--blocks", action="store_true", help="also translate block definitions")
+    parser.add_argument("--fast", action="store_true", help="replay without the recorded provider latency")
+    parser.add_argument("--azure-key", default="")
+    parser.add_argument("--azure-region", default="")
+    args = parser.parse_args()
+    action = "replay-fast" if args.action == "replay" and args.fast else args.action
+    total = 0.0
+    for result in run(action, args.journal, args.drawings, args.mode, args.blocks, args.azure_key, args.azure_region):
+        total += result["seconds"]
+        print(f"{result['drawing']}: {result['seconds']:.3f}s" + (f"  ({result['requests']} replayed requests)" if result["requests"] is not None else ""))
+    print(f"total: {total:.3f}s")